@@ -1,32 +1,336 @@
 # projectdoctor/analyzer.py
+import contextlib
+import functools
 import os
 import sys
-from .detectors import file_size, long_function, duplicate_code, circular_import, complexity, structure, dead_code
+from collections import Counter
+from . import budget, changes, discovery
+from .budget import quarantined
+from .cache import AnalysisCache, SharedCache, content_hash
+from .config import load_config
+from .corpus import Corpus, read_bytes
+from .issue import as_issue, merge_issues
+from .partial import shard_of
+from .profiling import Profiler, merge_timings
+from .score import score_from_counts
+from .spill import SpillStore, SpilledRecords
+from .detectors import collect_record, cost_stages, select_detectors, circular_import
+
+# Stands in for the content hash of a file quarantined for its size, which is never read.
+OVERSIZED = 'oversized'
+
+def _collect_chunk(collectors, chunk, thresholds, corpus=None, timings=None, profiles=None, shared=None):
+    """
+    Collects records for `(path, cached_hash)` pairs. Runs in worker processes.
+    Returns `(path, content_hash, record)` triples; the record is None when
+    the content hash equals the cached one and the cached record can be reused.
+    With a `SharedCache`, detectors' parts found there are not collected again.
+    """
+    return list(_iter_chunk(collectors, chunk, thresholds, corpus or Corpus(), timings, profiles, shared))
+
+def _iter_chunk(collectors, chunk, thresholds, corpus, timings=None, profiles=None, shared=None):
+    """`_collect_chunk` as a generator, so in-process runs hold one file's data at a time."""
+    cached_hashes = dict(chunk)
+    # Files over the size budget are quarantined from a stat alone, without being read.
+    oversized = {path for path in cached_hashes if budget.oversized(path, thresholds) is not None}
+    for file_path in oversized:
+        yield file_path, OVERSIZED, collect_record(collectors, corpus, file_path, thresholds)
+    for file_path in corpus.prefetch(path for path in cached_hashes if path not in oversized):
+        cached_hash = cached_hashes[file_path]
+        try:
+            digest = content_hash(corpus.get(file_path).raw)
+        except OSError:
+            digest = None
+        if digest is not None and digest == cached_hash:
+            yield file_path, digest, None
+        elif digest is not None and shared is not None:
+            yield file_path, digest, _collect_shared(shared, collectors, corpus, file_path, digest, thresholds, timings, profiles)
+        else:
+            yield file_path, digest, collect_record(collectors, corpus, file_path, thresholds, timings, profiles)
+
+def _collect_shared(shared, collectors, corpus, file_path, digest, thresholds, timings=None, profiles=None):
+    """`collect_record` that takes shared detectors' parts from `shared` and runs only the detectors it misses."""
+    entries = {name: shared.load(digest, name) for name in collectors if shared.shares(name)}
+    missing = {name: collect for name, collect in collectors.items() if entries.get(name) is None}
+    record = collect_record(missing, corpus, file_path, thresholds, timings, profiles)
+    if 'error' in record or 'quarantine' in record:
+        return record
+    for name in missing:
+        if shared.shares(name):
+            shared.store(digest, name, {'part': record[name]} if name in record else {})
+    for name, entry in entries.items():
+        if name not in missing and 'part' in entry:
+            record[name] = entry['part']
+    return record
+
+def _merged(records, stage_records):
+    """Adds a later stage's per-file data to `records`, which keeps its type (e.g. `SpilledRecords`)."""
+    if not records:
+        return stage_records
+    for file_path, record in stage_records.items():
+        dict.__setitem__(records, file_path, {**records[file_path], **record})
+    return records
+
+def _collect_one(item, collectors, thresholds, profiled, shared=None):
+    """Collects one `(path, cached_hash)` pair in a `KillablePool` worker."""
+    if profiled:
+        return _profile_chunk(collectors, [item], thresholds, shared)
+    return _collect_chunk(collectors, [item], thresholds, shared=shared)
+
+def _profile_chunk(collectors, chunk, thresholds, shared=None):
+    """`_collect_chunk` for profiled runs; also returns the worker's I/O counters and collect timings."""
+    corpus, timings = Corpus(), {}
+    results = _collect_chunk(collectors, chunk, thresholds, corpus, timings, shared=shared)
+    return results, {'reads': corpus.reads, 'bytes_read': corpus.bytes_read, 'parses': corpus.parses, 'timings': timings}
 
 class Analyzer:
-    def __init__(self, project_path, thresholds=None):
+    # Files per task handed to a worker; small enough to balance, large enough to amortize pickling.
+    CHUNK_SIZE = 64
+
+    def __init__(self, project_path, thresholds=None, cache_dir=None, jobs=1, since=None, profile=False, profile_dir=None, exclude=(),
+                 only=None, skip=(), shard=None, max_memory=None, shared_cache=None, profile_memory=False):
         self.project_path = project_path
         self.thresholds = thresholds or {}
-        self.python_files = self._get_python_files()
-    def run(self):
+        # Gitignore-style patterns from `[tool.projectdoctor] exclude` in pyproject.toml, then `exclude`.
+        self.excludes = list(load_config(project_path).get('exclude', [])) + list(exclude)
+        # Detector modules are imported here, and only the selected ones; raises ValueError for unknown names.
+        self.detectors = select_detectors(only, skip)
+        # With `profile` (or a `profile_dir` for cProfile dumps, or `profile_memory` for tracemalloc peaks),
+        # results gain a "timings" section.
+        self.profiler = Profiler(profile_dir, profile_memory) if profile or profile_dir or profile_memory else None
+        if self.profiler:
+            self.profiler.start()
+        with self._stage('discovery'):
+            self.python_files = self.all_python_files = self._get_python_files()
+        # With `max_memory` (bytes), `stream` spills bulky cross-file state to sorted runs on disk.
+        # The cache, which keeps every record in memory, is not used.
+        self.max_memory = max_memory
+        if max_memory:
+            cache_dir = None
+        # Records hold everything the reductions need, so each source and its AST are freed once the next file is read.
+        self.corpus = Corpus(retain=False)
+        self.cache = AnalysisCache(cache_dir, project_path, self.thresholds, [d for d in self.detectors if hasattr(d, 'collect')]) if cache_dir else None
+        # A `shared_cache` directory serves detector results by file content, across projects and machines.
+        self.shared = SharedCache(shared_cache, self.detectors, self.thresholds) if shared_cache else None
+        self.jobs = max(1, jobs or 1)
+        self._worker_counts = Counter()
+        # With `since`, only the issues of the affected files are reported. Every file's record goes
+        # into the cross-file reductions and the score, so their results match a full run, but the
+        # per-file detectors only run on the affected files.
+        self.affected = None
+        self._tree_records = {}
+        if since is not None:
+            with self._stage('since'):
+                self.python_files = self._files_since(since)
+            self.affected = set(self.python_files)
+        # `(index, count)`: analyze only the files of one shard, e.g. to emit partial results.
+        self.shard = shard
+        if shard is not None:
+            index, count = shard
+            self.python_files = [path for path in self.python_files if shard_of(self.relative_path(path), count) == index]
+    def run(self, gate=None):
+        results = self.stream(gate)
+        results["issues"] = list(results["issues"])
+        return results
+    def stream(self, gate=None):
+        """
+        Like `run`, but "issues" is a lazy iterator: each detector's issues are sorted
+        on their own and k-way merged in severity order as they are consumed.
+        "severity_counts" is tallied as each detector finishes, so the score needs no second pass.
+
+        With a `gate.Gate`, detectors are collected and reduced in stages from the cheapest
+        (see `detectors.cost_stages`), and the run stops as soon as the issues found so far
+        fail the gate. Results then gain "gate": its failures and the detectors left unrun.
+        """
         sys.path.insert(0, self.project_path)
-        all_issues = []
+        streams, severity_counts = [], Counter()
+        spill = SpillStore(self.max_memory) if self.max_memory else None
+        stages = cost_stages(self.detectors) if gate else [self.detectors]
+        records, failures, finished, total_loc = {}, [], [], 0
         try:
-            detectors = [file_size, long_function, duplicate_code, circular_import, complexity, structure, dead_code]
-            for detector in detectors:
-                issues = detector.analyze(self.project_path, self.thresholds, self.python_files)
-                all_issues.extend(issues)
+            for stage in stages:
+                with self._stage('collect'):
+                    records = _merged(records, self._collect_stage(stage, spill))
+                # Every stage's records hold each file's line count, so the total is final after the first.
+                total_loc = sum(record.get('loc', 0) for record in records.values())
+                for detector in stage:
+                    with self._stage('reduce', detector.NAME):
+                        issues = self.reduce(detector, records)
+                    severity_counts.update(issue.severity.name for issue in issues)
+                    if self.affected is not None:
+                        issues = [issue for issue in issues if issue.file in self.affected]
+                    streams.append(issues)
+                    finished.append(detector.NAME)
+                    failures = gate.failures(severity_counts, total_loc) if gate else []
+                    if failures:
+                        break
+                if failures:
+                    break
         finally:
             sys.path.pop(0)
-        return {"issues": sorted(all_issues, key=lambda i: (self._severity_order(i['severity']), str(i.get('file')))), "python_files": self.python_files}
+            if spill:
+                spill.close()
+        results = {"issues": merge_issues(streams), "python_files": self.python_files, "corpus": self.corpus, "total_loc": total_loc,
+                   "severity_counts": severity_counts, "records": records, "project_path": self.project_path,
+                   "quarantine": quarantined(records)}
+        if self.affected is not None:
+            # The score is the whole project's; the counts are those of the reported issues.
+            results["score"] = score_from_counts(severity_counts, total_loc)
+            results["severity_counts"] = Counter(issue.severity.name for issues in streams for issue in issues)
+        if gate:
+            results["gate"] = {"passed": not failures, "failures": failures,
+                               "skipped_detectors": [d.NAME for d in self.detectors if d.NAME not in finished]}
+        if self.profiler:
+            results["timings"] = self._finish_profile()
+        return results
+    def collect(self, detectors=None, paths=None):
+        """
+        Returns the per-file records of `paths` (default: `python_files`) for `detectors`
+        (default: all selected ones), keyed by path.
+        """
+        return self._collect(self.detectors if detectors is None else detectors, paths=paths)
+    def reduce(self, detector, records):
+        """Runs one detector's cross-file step over the records; returns its issues as `Issue`s."""
+        if hasattr(detector, 'reduce'):
+            issues = detector.reduce(self.project_path, self.thresholds, records)
+        else:
+            issues = detector.analyze(self.project_path, self.thresholds, self._reduced_files(), self.corpus)
+        return [as_issue(issue, detector.NAME) for issue in issues]
+    def _reduced_files(self):
+        """The files whose records the reductions see: every file with `since`, else `python_files`."""
+        return self.all_python_files if self.affected is not None else self.python_files
+    def _stage(self, name, detector=None):
+        return self.profiler.stage(name, detector) if self.profiler else contextlib.nullcontext()
+    def _finish_profile(self):
+        corpus, counts = self.corpus, self._worker_counts
+        self.profiler.count('collect', files=len(self.python_files), reads=corpus.reads + counts['reads'],
+                            bytes_read=corpus.bytes_read + counts['bytes_read'], parses=corpus.parses + counts['parses'],
+                            cache_hits=self.cache.hits if self.cache else 0, cache_misses=self.cache.misses if self.cache else 0)
+        return self.profiler.finish()
+    def _collect_stage(self, detectors, spill):
+        """
+        The records of one stage's detectors. With `since`, the cross-file detectors' records
+        of the whole tree were collected along with the import lists (see `_files_since`), so
+        only the per-file detectors run here, on the affected files.
+        """
+        if self.affected is None:
+            return self._collect(detectors, spill)
+        tree_records, self._tree_records = self._tree_records, {}
+        if spill and tree_records:
+            spilled = SpilledRecords(spill, {d.NAME: d.spill for d in self.detectors if hasattr(d, 'spill')})
+            for file_path, record in tree_records.items():
+                spilled[file_path] = record
+            tree_records = spilled
+        per_file = [d for d in detectors if getattr(d, 'PER_FILE', False) and hasattr(d, 'collect')]
+        if not per_file:
+            return tree_records
+        return _merged(tree_records, self._collect(per_file, spill))
+    def _collect(self, detectors, spill=None, paths=None):
+        """
+        Builds the per-file records of `paths` (default: `python_files`), reusing cached ones
+        for files that did not change. With a `SpillStore`, returns `SpilledRecords` whose
+        detectors' bulky data went to `spill`.
+        """
+        paths = self.python_files if paths is None else paths
+        collectors = {d.NAME: d.collect for d in detectors if hasattr(d, 'collect')}
+        records = SpilledRecords(spill, {d.NAME: d.spill for d in detectors if hasattr(d, 'spill')}) if spill else {}
+        stats, pending = {}, []
+        for file_path in paths:
+            record = self._lookup_cached(file_path, stats, list(collectors))
+            if record is not None:
+                records[file_path] = record
+            else:
+                pending.append((file_path, self.cache.cached_hash(file_path, list(collectors)) if file_path in stats else None))
+
+        for file_path, digest, record in self._collect_pending(collectors, pending):
+            stat = stats.get(file_path)
+            if record is None:
+                record = self.cache.refresh(file_path, stat)
+            elif self.cache and stat and digest:
+                self.cache.store(file_path, stat, digest, record, list(collectors))
+            records[file_path] = record
+        if self.cache:
+            self.cache.save(self.all_python_files)
+        if spill:
+            return records.ordered(paths)
+        return {file_path: records[file_path] for file_path in paths}
+    def _lookup_cached(self, file_path, stats, detectors):
+        """Returns the cached record of an unchanged file, remembering its stat for the cache update."""
+        if not self.cache:
+            return None
+        try:
+            stats[file_path] = os.stat(file_path)
+        except OSError:
+            return None
+        return self.cache.lookup(file_path, stats[file_path], detectors)
+    def _collect_pending(self, collectors, pending):
+        """
+        Runs `_collect_chunk` in-process, or split into chunks across a process pool when `jobs` > 1.
+        With per-file time budgets, files go one by one to workers that can be killed instead.
+        cProfile dumps need every collect step in this process, so they force the in-process path.
+        """
+        profiler = self.profiler
+        timeout = budget.file_timeout(self.thresholds, ['parse', 'visitor', *collectors])
+        if timeout and pending and not (profiler and profiler.profile_dir):
+            return self._collect_killable(collectors, pending, timeout)
+        if self.jobs == 1 or len(pending) <= 1 or (profiler and profiler.profile_dir):
+            if not profiler:
+                return _iter_chunk(collectors, pending, self.thresholds, self.corpus, shared=self.shared)
+            profiles = {name: profiler.profile(name) for name in collectors}
+            return _iter_chunk(collectors, pending, self.thresholds, self.corpus, profiler.collect_timings, profiles, self.shared)
+        return self._collect_in_pool(collectors, pending)
+    def _collect_killable(self, collectors, pending, timeout):
+        """
+        Collects each file in a `KillablePool` worker. A step that overruns its budget is stopped
+        inside the worker; a worker still stuck `timeout` seconds into a file (e.g. in C code) is
+        killed, and the file is quarantined.
+        """
+        profiler = self.profiler
+        pool = budget.KillablePool(_collect_one, (collectors, self.thresholds, bool(profiler), self.shared), self.jobs, timeout)
+        for (file_path, _), results in pool.map(pending):
+            if results is None:
+                try:
+                    digest = content_hash(read_bytes(file_path))
+                except OSError:
+                    digest = None
+                yield file_path, digest, budget.quarantine(f"analysis was killed after {timeout:g}s")
+                continue
+            if profiler:
+                results, counts = results
+                merge_timings(profiler.collect_timings, counts.pop('timings'))
+                self._worker_counts.update(counts)
+            yield from results
+    def _collect_in_pool(self, collectors, pending):
+        """Yields the results of `_collect_chunk` run over chunks of `pending` in worker processes, in order."""
+        profiler = self.profiler
+        from concurrent.futures import ProcessPoolExecutor
+        chunk_size = max(1, min(self.CHUNK_SIZE, -(-len(pending) // self.jobs)))
+        chunks = [pending[i:i + chunk_size] for i in range(0, len(pending), chunk_size)]
+        worker = functools.partial(_profile_chunk if profiler else _collect_chunk, shared=self.shared)
+        with ProcessPoolExecutor(max_workers=min(self.jobs, len(chunks))) as executor:
+            for chunk_results in executor.map(worker, [collectors] * len(chunks), chunks, [self.thresholds] * len(chunks)):
+                if profiler:
+                    chunk_results, counts = chunk_results
+                    merge_timings(profiler.collect_timings, counts.pop('timings'))
+                    self._worker_counts.update(counts)
+                yield from chunk_results
+    def _files_since(self, ref):
+        """
+        The files changed since the git `ref`, plus the modules that import them or share
+        an import cycle with them. Raises `changes.GitError`.
+        """
+        changed_paths = changes.changed_files(self.project_path, ref)
+        changed = {path for path in self.python_files if os.path.realpath(path) in changed_paths}
+        # The cross-file detectors need every file's record anyway. Collecting them here, with the
+        # import lists, reads each file once; `_collect_stage` hands the records over to `stream`.
+        cross_file = [d for d in self.detectors if hasattr(d, 'collect') and not getattr(d, 'PER_FILE', False)]
+        if circular_import not in cross_file:
+            cross_file.append(circular_import)
+        self._tree_records = self._collect(cross_file)
+        imports_by_path = {path: record.get(circular_import.NAME, ()) for path, record in self._tree_records.items()}
+        affected = changes.affected_files(self.project_path, imports_by_path, changed)
+        return [path for path in self.python_files if path in affected]
+    def relative_path(self, file_path):
+        return os.path.relpath(file_path, self.project_path).replace("\\", "/")
     def _get_python_files(self):
-        python_files, excluded_dirs = [], {'venv', '.venv', 'env', '__pycache__', 'node_modules', '.git'}
-        for root, dirs, files in os.walk(self.project_path, topdown=True):
-            dirs[:] = [d for d in dirs if d not in excluded_dirs]
-            for file in files:
-                if file.endswith('.py'):
-                    python_files.append(os.path.join(root, file))
-        return python_files
-    @staticmethod
-    def _severity_order(severity):
-        return {'HIGH': 0, 'MEDIUM': 1, 'LOW': 2}.get(severity, 3)
\ No newline at end of file
+        return discovery.discover(self.project_path, self.excludes)
@@ -0,0 +1,140 @@
+# projectdoctor/bench.py
+import importlib
+import json
+import os
+import platform
+import random
+import time
+
+try:
+    import resource
+except ImportError: # Not available on Windows; peak RSS is then reported as None.
+    resource = None
+
+IMPORT_SHAPES = ('none', 'chain', 'tree', 'random', 'cycles')
+
+def _imports_for(index, files, shape, rng):
+    if shape == 'chain':
+        targets = [index + 1] if index + 1 < files else []
+    elif shape == 'tree':
+        targets = [(index - 1) // 2] if index else []
+    elif shape == 'random':
+        targets = rng.sample(range(files), min(3, files))
+    elif shape == 'cycles':
+        # Rings of five modules, each importing the next one in its ring.
+        base = index - index % 5
+        targets = [base + (index + 1 - base) % min(5, files - base)]
+    else:
+        targets = []
+    return sorted({t for t in targets if t != index})
+
+def _function(name, index, length, branch_density, rng):
+    lines = [f"def {name}(x):"]
+    for j in range(length - 2):
+        if rng.random() < branch_density:
+            lines.append(f"    if x > {index * 1000 + j}: x -= {j + 1}")
+        else:
+            lines.append(f"    x = x * {j % 7 + 2} + {index * 1000 + j}")
+    lines.append("    return x")
+    return "\n".join(lines) + "\n"
+
+def generate_project(root, files=100, functions_per_file=3, function_lines=20, branch_density=0.2,
+                     import_shape='random', duplicate_ratio=0.1, seed=0):
+    """
+    Writes a synthetic project under `root`: a `synthetic` package of `files` modules with
+    tunable function length and branch density, an import graph of the given shape
+    (see `IMPORT_SHAPES`; 'cycles' builds rings of five modules) and a share of modules
+    that paste in one of a few common blocks. Returns the project path.
+    """
+    if import_shape not in IMPORT_SHAPES:
+        raise ValueError(f"Unknown import shape '{import_shape}', expected one of {', '.join(IMPORT_SHAPES)}.")
+    rng = random.Random(seed)
+    package = os.path.join(root, 'synthetic')
+    os.makedirs(package, exist_ok=True)
+    os.makedirs(os.path.join(root, 'tests'), exist_ok=True)
+    with open(os.path.join(root, 'pyproject.toml'), 'w', encoding='utf-8') as f:
+        f.write("[project]\nname = \"synthetic\"\n")
+    with open(os.path.join(package, '__init__.py'), 'w', encoding='utf-8') as f:
+        f.write("")
+
+    shared_blocks = [_function(f"shared_helper_{k}", -k - 1, 15, branch_density, random.Random(k)) for k in range(max(1, files // 20))]
+    for index in range(files):
+        parts = [f"import synthetic.mod_{target:06}\n" for target in _imports_for(index, files, import_shape, rng)]
+        parts.append("\n")
+        for k in range(functions_per_file):
+            parts.append(_function(f"func_{index}_{k}", index * functions_per_file + k, function_lines, branch_density, rng) + "\n")
+        if rng.random() < duplicate_ratio:
+            parts.append(rng.choice(shared_blocks))
+        with open(os.path.join(package, f"mod_{index:06}.py"), 'w', encoding='utf-8') as f:
+            f.write("".join(parts))
+    return root
+
+def _peak_rss_kb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if platform.system() == 'Darwin' else peak # macOS reports bytes, Linux KiB.
+
+def _measure(target, project_path, thresholds, jobs):
+    """Times one detector's `analyze` (or the whole `Analyzer.run` for 'analyzer') in a fresh process."""
+    from .analyzer import Analyzer
+    analyzer = Analyzer(project_path, thresholds, jobs=jobs)
+    python_files = analyzer.python_files
+    start_wall, start_cpu = time.perf_counter(), time.process_time()
+    if target == 'analyzer':
+        issues = analyzer.run()['issues']
+    else:
+        detector = importlib.import_module(f'.detectors.{target}', __package__)
+        issues = detector.analyze(project_path, thresholds, python_files)
+    wall = time.perf_counter() - start_wall
+    return {
+        'wall_seconds': round(wall, 4),
+        'cpu_seconds': round(time.process_time() - start_cpu, 4),
+        'files': len(python_files),
+        'files_per_sec': round(len(python_files) / wall, 1) if wall else None,
+        'issues': len(issues),
+        'peak_rss_kb': _peak_rss_kb(),
+    }
+
+def run_benchmark(project_path, thresholds=None, jobs=1, targets=None):
+    """
+    Measures every detector and the whole analyzer, each in its own process so that
+    peak RSS is attributable. Returns `{target: measurement}`.
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    from .detectors import BUILTIN_DETECTORS
+    targets = targets or list(BUILTIN_DETECTORS) + ['analyzer']
+    context = multiprocessing.get_context('spawn')
+    results = {}
+    for target in targets:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            results[target] = executor.submit(_measure, target, project_path, thresholds or {}, jobs).result()
+    return results
+
+def make_baseline(results, **workload):
+    return {'workload': workload, 'python': platform.python_version(), 'results': results}
+
+def save_baseline(baseline, filename):
+    with open(filename, 'w', encoding='utf-8') as f:
+        json.dump(baseline, f, indent=2)
+
+def load_baseline(filename):
+    with open(filename, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def compare(baseline, results, tolerance=0.10):
+    """
+    Flags each target whose wall time or peak RSS grew by more than `tolerance`
+    (a fraction) over the baseline. Returns `(target, metric, baseline, current)` tuples.
+    """
+    regressions = []
+    for target, current in results.items():
+        previous = baseline.get('results', {}).get(target)
+        if not previous:
+            continue
+        for metric in ('wall_seconds', 'peak_rss_kb'):
+            before, after = previous.get(metric), current.get(metric)
+            if before and after and after > before * (1 + tolerance):
+                regressions.append((target, metric, before, after))
+    return regressions
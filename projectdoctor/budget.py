@@ -0,0 +1,166 @@
+# projectdoctor/budget.py
+import contextlib
+import os
+import signal
+import time
+
+# Thresholds key holding the per-file budgets, e.g. {"budget": {"max_file_size": 2000000, "timeout": 10}}.
+# A detector's own "timeout" key (e.g. {"dead_code": {"timeout": 30}}) overrides the default for its step.
+BUDGET_KEY = 'budget'
+
+# Seconds a worker may run past a file's total budget before it is killed.
+KILL_GRACE = 2.0
+
+class StepTimeout(BaseException):
+    """
+    Raised inside a collect step that ran out of time. Derived from BaseException so
+    that the `except Exception` in detectors and third-party code does not swallow it.
+    """
+
+    def __init__(self, step, seconds):
+        super().__init__(step, seconds)
+        self.step = step
+        self.seconds = seconds
+
+def max_file_size(thresholds):
+    """The largest file, in bytes, that is analyzed; None for no limit."""
+    return thresholds.get(BUDGET_KEY, {}).get('max_file_size')
+
+def step_timeout(thresholds, step):
+    """Wall-clock seconds one step (a detector's collect, 'parse' or 'visitor') may take on one file; None for no limit."""
+    timeout = thresholds.get(step, {}).get('timeout') if isinstance(thresholds.get(step), dict) else None
+    return timeout if timeout is not None else thresholds.get(BUDGET_KEY, {}).get('timeout')
+
+def oversized(path, thresholds):
+    """The size of `path` if it is larger than `max_file_size`, else None. Only stats the file."""
+    limit = max_file_size(thresholds)
+    if limit is None:
+        return None
+    try:
+        size = os.stat(path).st_size
+    except OSError:
+        return None
+    return size if size > limit else None
+
+def quarantine(reason, loc=None):
+    """The record of a file left out of the analysis; it is cached like any record, so later runs skip the file."""
+    record = {'quarantine': reason}
+    if loc is not None:
+        record['loc'] = loc
+    return record
+
+def quarantined(records):
+    """The quarantined files of a run, as `{'file': path, 'reason': reason}` dicts in record order."""
+    return [{'file': path, 'reason': record['quarantine']} for path, record in records.items() if 'quarantine' in record]
+
+def file_timeout(thresholds, steps):
+    """The hard limit for one file: every step's budget plus `KILL_GRACE`; None when no step has one."""
+    timeouts = [step_timeout(thresholds, step) for step in steps]
+    if not any(timeouts):
+        return None
+    return sum(timeout for timeout in timeouts if timeout) + KILL_GRACE
+
+@contextlib.contextmanager
+def deadline(seconds, step):
+    """
+    Raises `StepTimeout` in the block once `seconds` have passed. Uses SIGALRM, so it
+    only applies in a main thread on platforms that have it; elsewhere the worker's
+    hard limit still applies.
+    """
+    if not seconds or not hasattr(signal, 'setitimer'):
+        yield
+        return
+
+    def expired(signum, frame):
+        raise StepTimeout(step, seconds)
+    try:
+        previous = signal.signal(signal.SIGALRM, expired)
+    except ValueError: # Not the main thread.
+        yield
+        return
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+def _serve(connection, function, args):
+    while True:
+        item = connection.recv()
+        if item is None:
+            return
+        connection.send(function(item, *args))
+
+class KillablePool:
+    """
+    Runs `function(item, *args)` for each item in `workers` processes, one item at a time,
+    and kills any worker still busy with an item after `timeout` seconds, replacing it
+    with a fresh one. Unlike a `ProcessPoolExecutor`, a stuck item costs at most its timeout.
+    """
+
+    def __init__(self, function, args, workers, timeout):
+        self.function = function
+        self.args = args
+        self.workers = max(1, workers)
+        self.timeout = timeout
+
+    def _start(self, context):
+        parent, child = context.Pipe()
+        process = context.Process(target=_serve, args=(child, self.function, self.args), daemon=True)
+        process.start()
+        child.close()
+        return {'process': process, 'connection': parent, 'item': None, 'started': None}
+
+    def map(self, items):
+        """Yields `(item, result)` as items finish, in no particular order; result is None for killed items."""
+        import multiprocessing
+        from multiprocessing.connection import wait
+        context = multiprocessing.get_context()
+        items = list(items)
+        workers = [self._start(context) for _ in range(min(self.workers, len(items)))]
+        queue = iter(items)
+        remaining = len(items)
+        try:
+            while remaining:
+                for worker in workers:
+                    if worker['item'] is None:
+                        item = next(queue, None)
+                        if item is not None:
+                            worker['connection'].send(item)
+                            worker['item'], worker['started'] = item, time.monotonic()
+                busy = [worker for worker in workers if worker['item'] is not None]
+                now = time.monotonic()
+                wait_for = max(0.0, min(worker['started'] + self.timeout - now for worker in busy))
+                ready = wait([worker['connection'] for worker in busy], wait_for)
+                for index, worker in enumerate(workers):
+                    if worker['item'] is None:
+                        continue
+                    if worker['connection'] in ready:
+                        try:
+                            result = worker['connection'].recv()
+                        except EOFError: # The worker died, e.g. out of memory.
+                            result = None
+                    elif time.monotonic() - worker['started'] >= self.timeout:
+                        result = None
+                    else:
+                        continue
+                    item = worker['item']
+                    if result is None:
+                        worker['process'].kill()
+                        worker['process'].join()
+                        worker['connection'].close()
+                        workers[index] = worker = self._start(context)
+                    worker['item'] = None
+                    remaining -= 1
+                    yield item, result
+        finally:
+            for worker in workers:
+                if worker['item'] is None:
+                    with contextlib.suppress(OSError):
+                        worker['connection'].send(None)
+                else:
+                    worker['process'].kill()
+            for worker in workers:
+                worker['process'].join()
+                worker['connection'].close()
@@ -0,0 +1,193 @@
+# projectdoctor/cache.py
+import contextlib
+import hashlib
+import json
+import os
+import sys
+import tempfile
+from .budget import BUDGET_KEY
+
+CACHE_DIR_NAME = '.projectdoctor_cache'
+CACHE_VERSION = 6
+
+def content_hash(raw):
+    return hashlib.sha1(raw).hexdigest()
+
+def _split_budgets(thresholds):
+    """
+    Splits thresholds into the part records depend on and the per-file budgets (the
+    budget section and each step's `timeout`), which only decide what is quarantined.
+    """
+    config, budgets = {}, {BUDGET_KEY: thresholds.get(BUDGET_KEY)}
+    for name, section in thresholds.items():
+        if name == BUDGET_KEY:
+            continue
+        if isinstance(section, dict) and 'timeout' in section:
+            budgets[name] = section['timeout']
+            section = {key: value for key, value in section.items() if key != 'timeout'}
+            if not section:
+                continue
+        config[name] = section
+    return json.dumps(config, sort_keys=True), json.dumps(budgets, sort_keys=True)
+
+class AnalysisCache:
+    """
+    Per-project store of each file's collected record, keyed by its path
+    relative to the project and validated by size, mtime and content hash.
+    The whole cache is dropped when the version or the thresholds change; a change of
+    the per-file budgets only drops the records of quarantined files. Each entry maps
+    the detectors its record was collected for to their `VERSION`s, and only serves runs
+    whose `detectors` are among them at the same version (e.g. not a full run after an
+    `--only` run). Methods take the names of the detectors a lookup needs, or that a
+    record was collected for, when these are fewer than the run's (e.g. one stage of a
+    gated run).
+    """
+
+    def __init__(self, cache_dir, project_path, thresholds, detectors=()):
+        self.cache_dir = cache_dir
+        self.project_path = project_path
+        self.config, self.budgets = _split_budgets(thresholds)
+        self.versions = {d.NAME: getattr(d, 'VERSION', None) for d in detectors}
+        self.detectors = sorted(self.versions)
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._load()
+
+    @property
+    def cache_file(self):
+        return os.path.join(self.cache_dir, 'files.json')
+
+    def _load(self):
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get('version') == CACHE_VERSION and data.get('config') == self.config:
+            self._entries = data.get('files', {})
+            if data.get('budgets') != self.budgets:
+                self._entries = {key: entry for key, entry in self._entries.items() if 'quarantine' not in entry['record']}
+
+    def _key(self, file_path):
+        return os.path.relpath(file_path, self.project_path).replace("\\", "/")
+
+    def _entry(self, file_path, detectors=None):
+        entry = self._entries.get(self._key(file_path))
+        if entry and all(name in entry['detectors'] and entry['detectors'][name] == self.versions.get(name)
+                         for name in (self.detectors if detectors is None else detectors)):
+            return entry
+        return None
+
+    def lookup(self, file_path, stat, detectors=None):
+        """Returns the cached record if the file's size and mtime are unchanged, without reading it."""
+        record = self.peek(file_path, stat, detectors)
+        if record is not None:
+            self.hits += 1
+        return record
+
+    def peek(self, file_path, stat, detectors=None):
+        """Like `lookup`, but does not count as a cache hit."""
+        entry = self._entry(file_path, detectors)
+        if entry and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime_ns:
+            return entry['record']
+        return None
+
+    def cached_hash(self, file_path, detectors=None):
+        """The content hash the cached record was built from, if any."""
+        entry = self._entry(file_path, detectors)
+        return entry['sha1'] if entry else None
+
+    def refresh(self, file_path, stat):
+        """Returns the cached record for a file whose content hash still matches (e.g. after a touch or checkout)."""
+        entry = self._entries[self._key(file_path)]
+        entry['size'], entry['mtime'] = stat.st_size, stat.st_mtime_ns
+        self.hits += 1
+        return entry['record']
+
+    def store(self, file_path, stat, digest, record, detectors=None):
+        """Caches a record; one for other detectors of the same content is merged into the existing entry."""
+        self.misses += 1
+        detectors = {name: self.versions.get(name) for name in (self.detectors if detectors is None else detectors)}
+        entry = self._entries.get(self._key(file_path))
+        if entry and entry['sha1'] == digest and not any(key in r for r in (record, entry['record']) for key in ('error', 'quarantine')):
+            record = {**entry['record'], **record}
+            detectors = {**entry['detectors'], **detectors}
+        self._entries[self._key(file_path)] = {
+            'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'sha1': digest, 'detectors': detectors, 'record': record,
+        }
+
+    def save(self, python_files):
+        """Writes the cache atomically, dropping entries for files no longer in `python_files`."""
+        keep = {self._key(file_path) for file_path in python_files}
+        files = {key: entry for key, entry in self._entries.items() if key in keep}
+        os.makedirs(self.cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({'version': CACHE_VERSION, 'config': self.config, 'budgets': self.budgets, 'files': files}, f)
+            os.replace(tmp_path, self.cache_file)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+class SharedCache:
+    """
+    Content-addressed store of per-file detector data that many checkouts, machines and CI
+    workers can share, e.g. on a network mount. Each detector's part of a record is one entry
+    keyed by the file's content hash, the detector's name and `VERSION`, its thresholds section
+    and the Python version. Entries hold no paths (records never do; issues get their file when
+    the records of a run are reduced), so identical files are analyzed once wherever they live.
+    Detectors without a `VERSION` are never shared.
+
+    Entries are written to a temporary file in their directory and renamed into place, so
+    concurrent writers cannot leave a torn entry behind. An unreadable entry is a miss.
+    """
+
+    def __init__(self, directory, detectors, thresholds):
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        self._salts = {
+            d.NAME: json.dumps([CACHE_VERSION, list(sys.version_info[:2]), d.NAME, d.VERSION, thresholds.get(d.NAME)], sort_keys=True)
+            for d in detectors if hasattr(d, 'collect') and getattr(d, 'VERSION', None) is not None
+        }
+
+    def shares(self, name):
+        return name in self._salts
+
+    def _entry_path(self, digest, name):
+        key = hashlib.sha256(f"{digest}\0{self._salts[name]}".encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, key[:2], key + '.json')
+
+    def load(self, digest, name):
+        """
+        The entry of detector `name` for content `digest`: `{'part': data}`, or `{}` when the
+        detector produced nothing for it (e.g. it does not parse); None on a miss.
+        """
+        try:
+            with open(self._entry_path(digest, name), 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            entry = None
+        if not isinstance(entry, dict):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry
+
+    def store(self, digest, name, entry):
+        """Writes an entry atomically. A read-only or full cache directory only costs the sharing."""
+        path = self._entry_path(digest, name)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.', suffix='.tmp')
+        except OSError:
+            return
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(entry, f, separators=(',', ':'))
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError):
+            with contextlib.suppress(OSError):
+                os.unlink(tmp_path)
@@ -0,0 +1,51 @@
+# projectdoctor/changes.py
+import os
+import subprocess
+from .detectors.circular_import import build_graph, _get_module_name, _strongly_connected_components
+
+class GitError(Exception):
+    """Raised when the local git repository cannot answer a query."""
+
+def _git(cwd, *args):
+    try:
+        result = subprocess.run(['git', *args], cwd=cwd, capture_output=True, text=True, check=True)
+    except FileNotFoundError:
+        raise GitError("git is not installed or not on PATH.")
+    except subprocess.CalledProcessError as e:
+        raise GitError(e.stderr.strip() or f"git {' '.join(args)} failed.")
+    return result.stdout
+
+def changed_files(project_path, ref):
+    """
+    Returns the absolute paths of the Python files under `project_path` that differ
+    from `ref` (`git diff --name-only`, working tree included) or are untracked.
+    """
+    top = _git(project_path, 'rev-parse', '--show-toplevel').strip()
+    names = _git(top, 'diff', '--name-only', '-z', ref, '--').split('\0')
+    names += _git(top, 'ls-files', '--others', '--exclude-standard', '-z').split('\0')
+    project_path = os.path.realpath(project_path)
+    changed = set()
+    for name in names:
+        if not name.endswith('.py'):
+            continue
+        path = os.path.realpath(os.path.join(top, name))
+        if os.path.commonpath([path, project_path]) == project_path:
+            changed.add(path)
+    return changed
+
+def affected_files(project_path, imports_by_path, changed):
+    """
+    Grows the `changed` paths with the modules that import them and with every module
+    sharing an import cycle with them, so cycles through changed code are still found.
+    `imports_by_path` maps every project file to its raw imports (`circular_import.collect`).
+    """
+    dependency_graph, module_map = build_graph(project_path, imports_by_path)
+    changed_modules = {_get_module_name(path, project_path) for path in changed}
+    affected = set(changed)
+    for module_name, imports in dependency_graph.items():
+        if imports & changed_modules:
+            affected.add(module_map[module_name])
+    for component in _strongly_connected_components(dependency_graph):
+        if len(component) > 1 and component & changed_modules:
+            affected.update(module_map[module_name] for module_name in component)
+    return affected
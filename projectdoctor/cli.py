@@ -1,7 +1,16 @@
 # projectdoctor/cli.py
+import os
+import sys
+import tempfile
 import click
 import json as json_lib
+from . import bench as bench_lib
 from .analyzer import Analyzer
+from .budget import BUDGET_KEY
+from .cache import CACHE_DIR_NAME
+from .gate import Gate, parse_max_issues
+from .changes import GitError
+from .partial import PartialError, merge_partials, parse_shard, write_partial
 from .reporter import Reporter
 
 @click.group(context_settings=dict(help_option_names=['-h', '--help']))
@@ -17,9 +26,9 @@ def cli():
 @click.argument('project_path', type=click.Path(exists=True, file_okay=False, resolve_path=True), default='.')
 @click.option(
     '--output',
-    type=click.Choice(['markdown', 'cli', 'json']),
+    type=click.Choice(['markdown', 'cli', 'json', 'jsonl']),
     default='cli',
-    help="The format for the final report. Can be 'cli', 'markdown', or 'json'."
+    help="The format for the final report. Can be 'cli', 'markdown', 'json', or 'jsonl' (one issue per line)."
 )
 @click.option(
     '--thresholds',
@@ -28,44 +37,418 @@ def cli():
     Example: '{"file_size": {"max_lines": 1000}, "long_function": {"max_lines": 75}}'
     """
 )
-def analyze(project_path, output, thresholds):
+@click.option(
+    '--no-cache',
+    is_flag=True,
+    help=f"Re-analyze every file instead of reusing unchanged results from '{CACHE_DIR_NAME}/'."
+)
+@click.option(
+    '--shared-cache',
+    type=click.Path(file_okay=False),
+    envvar='PROJECTDOCTOR_SHARED_CACHE',
+    metavar='DIR',
+    help="Share per-file results by file content through DIR (e.g. a network mount), so identical files "
+         "are analyzed once across checkouts and machines. Defaults to $PROJECTDOCTOR_SHARED_CACHE."
+)
+@click.option(
+    '--jobs', '-j',
+    type=click.IntRange(min=1),
+    default=os.cpu_count() or 1,
+    show_default=True,
+    help="Number of worker processes used for the per-file analysis."
+)
+@click.option(
+    '--max-memory',
+    type=click.IntRange(min=1),
+    metavar='MB',
+    help="Keep the analysis within roughly MB megabytes: drop each file's AST once it is analyzed and spill "
+         "duplicate hashes and dead-code name tables to sorted runs on disk. Disables the cache."
+)
+@click.option(
+    '--max-file-size',
+    type=click.IntRange(min=1),
+    metavar='KB',
+    help="Quarantine files larger than KB kilobytes instead of analyzing them."
+)
+@click.option(
+    '--file-timeout',
+    type=click.FloatRange(min=0, min_open=True),
+    metavar='SECONDS',
+    help="Quarantine a file once parsing it or any detector's step on it takes longer than SECONDS. "
+         "Override per detector with {\"<detector>\": {\"timeout\": SECONDS}} in --thresholds."
+)
+@click.option(
+    '--since',
+    metavar='GIT_REF',
+    help="Only analyze files changed since GIT_REF, plus the modules that import them."
+)
+@click.option(
+    '--only',
+    metavar='NAMES',
+    help="Comma-separated detectors to run, e.g. 'file_size,structure'. Other detectors are not even imported."
+)
+@click.option(
+    '--skip',
+    metavar='NAMES',
+    help="Comma-separated detectors to leave out."
+)
+@click.option(
+    '--shard',
+    metavar='INDEX/COUNT',
+    help="Analyze only one shard of the files, e.g. 2/4. Files are assigned by a hash of their path."
+)
+@click.option(
+    '--emit-partial',
+    type=click.Path(dir_okay=False),
+    metavar='FILE',
+    help="Write this shard's per-file results to FILE instead of a report; combine shards with 'projectdoctor merge'."
+)
+@click.option(
+    '--store',
+    type=click.Path(dir_okay=False),
+    metavar='DB',
+    help="Also record the run's issues, per-file line counts, score and timings in this SQLite database."
+)
+@click.option(
+    '--estimate',
+    is_flag=True,
+    help="Estimate the score from a stratified random sample of files instead of analyzing every file. "
+         "Duplicate code, import cycles and dead code are not part of the estimate."
+)
+@click.option(
+    '--tolerance',
+    type=click.FloatRange(min=0, min_open=True),
+    default=2.0,
+    show_default=True,
+    metavar='POINTS',
+    help="With --estimate: sample until the 95% confidence interval is within POINTS of the estimate."
+)
+@click.option(
+    '--fail-under',
+    type=click.IntRange(0, 100),
+    metavar='SCORE',
+    help="Exit with 1 if the score is below SCORE. Cheap detectors run first and the analysis stops "
+         "as soon as the score can no longer reach SCORE."
+)
+@click.option(
+    '--max-issues',
+    multiple=True,
+    metavar='SEVERITY=N',
+    help="Exit with 1 if there are more than N issues of SEVERITY, e.g. HIGH=0; repeatable. Stops early like --fail-under."
+)
+@click.option(
+    '--exclude',
+    multiple=True,
+    metavar='PATTERN',
+    help="Gitignore-style pattern of paths to skip; repeatable. Added to [tool.projectdoctor] exclude in pyproject.toml."
+)
+@click.option(
+    '--profile',
+    is_flag=True,
+    help="Report time and I/O per stage and per detector ('timings' in JSON output)."
+)
+@click.option(
+    '--profile-memory',
+    is_flag=True,
+    help="Also trace the peak memory per stage with tracemalloc (implies --profile; slows the run down several times)."
+)
+@click.option(
+    '--profile-dir',
+    type=click.Path(file_okay=False),
+    help="Also write a cProfile dump per detector to this directory (implies --profile; collects in-process)."
+)
+def analyze(project_path, output, thresholds, no_cache, shared_cache, jobs, max_memory, max_file_size, file_timeout, since, only, skip, shard, emit_partial, store, estimate, tolerance, fail_under, max_issues, exclude, profile, profile_memory, profile_dir):
     """
     Analyzes a Python project and generates a health report.
 
     PROJECT_PATH: The path to the project you want to analyze. Defaults to the current directory.
     """
-    click.echo(f"🩺 Analyzing project at: {project_path}")
+    # Keep stdout clean for machine-readable reports.
+    status_to_stderr = output in ('json', 'jsonl')
+    click.echo(f"🩺 Analyzing project at: {project_path}", err=status_to_stderr)
     
     custom_thresholds = {}
     if thresholds:
         try:
             custom_thresholds = json_lib.loads(thresholds)
         except json_lib.JSONDecodeError:
-            click.echo("Error: Invalid JSON format for --thresholds.", err=True)
-            return
+            raise click.BadParameter("Invalid JSON format.", param_hint="'--thresholds'")
+    if max_file_size or file_timeout:
+        file_budget = custom_thresholds.setdefault(BUDGET_KEY, {})
+        if max_file_size:
+            file_budget['max_file_size'] = max_file_size * 1024
+        if file_timeout:
+            file_budget['timeout'] = file_timeout
+
+    # Bad options fail the command (exit status 2), so a mistyped CI gate never passes.
+    try:
+        gate = Gate(fail_under, parse_max_issues(max_issues))
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="'--max-issues'")
+    if gate and (estimate or emit_partial):
+        raise click.UsageError("--fail-under and --max-issues need a full analysis; they cannot be used with --estimate or --emit-partial.")
+
+    cache_dir = None if no_cache else os.path.join(project_path, CACHE_DIR_NAME)
+    try:
+        analyzer = Analyzer(project_path, custom_thresholds, cache_dir=cache_dir, jobs=jobs, since=since,
+                            profile=profile, profile_dir=profile_dir, exclude=exclude,
+                            only=_names(only), skip=_names(skip) or (), shard=parse_shard(shard) if shard else None,
+                            max_memory=max_memory * 1024 * 1024 if max_memory else None, shared_cache=shared_cache,
+                            profile_memory=profile_memory)
+    except GitError as e:
+        raise click.ClickException(f"Could not determine changed files: {e}")
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    if estimate:
+        from .estimate import estimate_score
+        _report_estimate(estimate_score(analyzer, tolerance), output, status_to_stderr)
+        return
+    if emit_partial:
+        file_count = write_partial(analyzer, emit_partial)
+        click.echo(f"📦 Partial results for {file_count} files saved to: {emit_partial}", err=status_to_stderr)
+        return
+    results = analyzer.stream(gate)
+    _report(results, output, status_to_stderr, store)
+    if gate and not results['gate']['passed']:
+        if output != 'cli': # The CLI report already ends with the verdict.
+            click.echo(f"❌ Gate failed: {'; '.join(results['gate']['failures'])}.", err=True)
+        sys.exit(1)
+
+def _report(analysis_results, output, status_to_stderr, store=None):
+    run_id = None
+    if store:
+        from .store import ResultStore
+        result_store = ResultStore(store)
+        run_id, analysis_results = result_store.record(analysis_results)
+    reporter = Reporter(analysis_results)
 
-    analyzer = Analyzer(project_path, custom_thresholds)
-    analysis_results = analyzer.run()
-    
     file_count = len(analysis_results.get("python_files", []))
-    issue_count = len(analysis_results.get("issues", []))
-    
-    click.echo(f"✔ {file_count} files analyzed")
+    issue_count = reporter.issue_count
+
+    click.echo(f"✔ {file_count} files analyzed", err=status_to_stderr)
     if issue_count > 0:
-        click.echo(f"🟡 {issue_count} issues found")
+        click.echo(f"🟡 {issue_count} issues found", err=status_to_stderr)
     else:
-        click.echo("✅ No issues found!")
-
-    reporter = Reporter(analysis_results)
+        click.echo("✅ No issues found!", err=status_to_stderr)
 
     if output == 'markdown':
         report_filename = 'project_health_report.md'
         reporter.to_markdown(report_filename)
         click.echo(f"📄 Report saved to: {report_filename}")
     elif output == 'json':
-        click.echo(reporter.to_json())
+        reporter.write_json(sys.stdout)
+        click.echo()
+    elif output == 'jsonl':
+        reporter.write_jsonl(sys.stdout)
     else:
         reporter.to_cli()
 
+    if run_id is not None:
+        result_store.close()
+        click.echo(f"🗄  Run {run_id} saved to: {store}", err=status_to_stderr)
+
+def _report_estimate(result, output, status_to_stderr):
+    if output in ('json', 'jsonl'):
+        click.echo(json_lib.dumps(result, indent=2 if output == 'json' else None))
+        return
+    click.echo(f"✔ {result['sampled_files']} of {result['total_files']} files sampled", err=status_to_stderr)
+    low, high = result['interval']
+    click.echo(f"\n📊 Estimated Maintainability Score: {result['score']}/100 "
+               f"({result['confidence']:.0%} confidence interval: {low}-{high})")
+    counts = result['estimated_severity_counts']
+    click.echo(f"Estimated issues: {counts['HIGH']} high, {counts['MEDIUM']} medium, {counts['LOW']} low")
+    if result['skipped_detectors']:
+        click.echo(f"Not estimated (cross-file): {', '.join(result['skipped_detectors'])}")
+
+@cli.command()
+@click.argument('partials', nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+@click.option('--output', type=click.Choice(['markdown', 'cli', 'json', 'jsonl']), default='cli', help="The format for the final report, as for 'analyze'.")
+@click.option('--project-path', type=click.Path(file_okay=False, resolve_path=True), help="Report file paths under this directory instead of the path the first shard analyzed.")
+@click.option('--store', type=click.Path(dir_okay=False), metavar='DB', help="Also record the merged run in this SQLite database, as for 'analyze'.")
+def merge(partials, output, project_path, store):
+    """
+    Combines the partial results of 'analyze --shard I/N --emit-partial FILE' runs into one report.
+
+    Duplicate code, import cycles and dead code are found across all shards, as in a single run.
+    """
+    status_to_stderr = output in ('json', 'jsonl')
+    click.echo(f"🧩 Merging {len(partials)} partial results", err=status_to_stderr)
+    try:
+        analysis_results = merge_partials(partials, project_path)
+    except PartialError as e:
+        click.echo(f"Error: {e}", err=True)
+        return
+    _report(analysis_results, output, status_to_stderr, store)
+
+@cli.command()
+@click.option('--store', type=click.Path(exists=True, dir_okay=False), metavar='DB', required=True, help="The database written by 'analyze --store'.")
+@click.option('--limit', type=click.IntRange(min=1), default=20, show_default=True, help="Number of most recent runs to show.")
+@click.option('--file', 'file_path', metavar='PATH', help="Show the line and issue counts of one project-relative file instead.")
+def history(store, limit, file_path):
+    """
+    Shows the score and issue counts of the recorded runs, oldest first.
+    """
+    from .store import ResultStore
+    result_store = ResultStore(store)
+    try:
+        if file_path:
+            rows = result_store.file_history(file_path.replace(os.sep, '/'), limit)
+            if not rows:
+                click.echo(f"No recorded run analyzed '{file_path}'.")
+            for row in rows:
+                click.echo(f"#{row['run_id']:<5} {row['created_at']}  {row['loc'] or 0:>6} lines  {row['issue_count']:>4} issues")
+            return
+        rows = result_store.runs(limit)
+        if not rows:
+            click.echo("No runs recorded yet.")
+        for row in rows:
+            commit = (row['git_commit'] or '-')[:8]
+            click.echo(f"#{row['id']:<5} {row['created_at']}  {commit:<8}  score {row['score']:>3}/100  "
+                       f"{row['issue_count']:>4} issues ({row['high']} high, {row['medium']} medium, {row['low']} low)  {row['file_count']} files")
+    finally:
+        result_store.close()
+
+@cli.command()
+@click.argument('run_a', type=int, required=False)
+@click.argument('run_b', type=int, required=False)
+@click.option('--store', type=click.Path(exists=True, dir_okay=False), metavar='DB', required=True, help="The database written by 'analyze --store'.")
+@click.option('--severity', type=click.Choice(['HIGH', 'MEDIUM', 'LOW']), help="Only show issues of this severity.")
+def diff(run_a, run_b, store, severity):
+    """
+    Lists the issues that appeared and went away between two recorded runs.
+
+    RUN_A and RUN_B are run numbers from 'projectdoctor history'; they default to the
+    two most recent runs.
+    """
+    from .store import ResultStore, StoreError
+    result_store = ResultStore(store)
+    try:
+        run_b = run_b if run_b is not None else result_store.latest_run()
+        run_a = run_a if run_a is not None else result_store.latest_run(1)
+        if run_a is None or run_b is None:
+            click.echo("Error: Two runs are needed to compare.", err=True)
+            return
+        added, fixed = result_store.diff(run_a, run_b, severity)
+    except StoreError as e:
+        click.echo(f"Error: {e}", err=True)
+        return
+    finally:
+        result_store.close()
+    click.echo(f"Run {run_a} → {run_b}: {len(added)} new, {len(fixed)} fixed")
+    for issue in fixed:
+        click.echo(f"- fixed [{issue['severity']}] `{issue['file'] or 'Project-wide'}`: {issue['message']}")
+    for issue in added:
+        click.echo(f"+ [{issue['severity']}] `{issue['file'] or 'Project-wide'}`: {issue['message']}")
+
+def _names(value):
+    """Splits a comma-separated --only/--skip value into detector names."""
+    return [name.strip() for name in value.split(',') if name.strip()] if value else None
+
+@cli.command()
+@click.argument('project_path', type=click.Path(exists=True, file_okay=False, resolve_path=True), default='.')
+@click.option('--thresholds', help="JSON string to override default detector thresholds (same format as for 'analyze').")
+@click.option('--interval', type=click.FloatRange(min=0.05), default=0.5, show_default=True, help="Seconds between checks for changed files.")
+def watch(project_path, thresholds, interval):
+    """
+    Analyzes a project, then re-analyzes changed files on every save.
+
+    The analysis state stays in memory, so each update only re-reads the files that
+    changed before printing the new score and the issues that appeared or went away.
+    """
+    custom_thresholds = {}
+    if thresholds:
+        try:
+            custom_thresholds = json_lib.loads(thresholds)
+        except json_lib.JSONDecodeError:
+            click.echo("Error: Invalid JSON format for --thresholds.", err=True)
+            return
+
+    def on_change(session, added, resolved, elapsed):
+        if elapsed is None:
+            click.echo(f"✔ {len(session.records)} files analyzed, {len(session.issues)} issues found")
+        else:
+            click.echo(f"\n🔄 Updated in {elapsed * 1000:.0f} ms")
+        click.echo(f"📊 Maintainability Score: {session.score}/100")
+        for issue in resolved:
+            click.echo(f"- fixed [{issue['severity']}] `{issue.get('file', 'Project-wide')}`: {issue['message']}")
+        for issue in added:
+            click.echo(f"+ [{issue['severity']}] `{issue.get('file', 'Project-wide')}`: {issue['message']}")
+
+    from .watch import watch as watch_project
+    click.echo(f"👀 Watching project at: {project_path} (Ctrl+C to stop)")
+    try:
+        watch_project(Analyzer(project_path, custom_thresholds), on_change, interval)
+    except KeyboardInterrupt:
+        click.echo("\nStopped watching.")
+
+@cli.command()
+@click.argument('project_path', type=click.Path(exists=True, file_okay=False, resolve_path=True), default='.')
+@click.option('--thresholds', help="JSON string to override default detector thresholds (same format as for 'analyze').")
+@click.option('--no-cache', is_flag=True, help="Analyze every file at startup instead of reusing cached results.")
+def serve(project_path, thresholds, no_cache):
+    """
+    Serves analysis results to editors and tools as JSON-RPC 2.0 over stdin/stdout.
+
+    The project is analyzed once at startup and kept in memory. Requests such as
+    'analyze_buffer' (unsaved text for a path) or 'score' (for a package) then only
+    re-analyze what they are about. Messages are single JSON lines or, as language
+    clients send them, Content-Length framed.
+    """
+    custom_thresholds = {}
+    if thresholds:
+        try:
+            custom_thresholds = json_lib.loads(thresholds)
+        except json_lib.JSONDecodeError:
+            click.echo("Error: Invalid JSON format for --thresholds.", err=True)
+            return
+
+    from .server import Server, serve as serve_stdio
+    cache_dir = None if no_cache else os.path.join(project_path, CACHE_DIR_NAME)
+    server = Server(Analyzer(project_path, custom_thresholds, cache_dir=cache_dir))
+    # stdout carries the protocol; status goes to stderr.
+    click.echo(f"🩺 Serving {project_path} ({len(server.session.records)} files) on stdio", err=True)
+    serve_stdio(server, sys.stdin.buffer, sys.stdout.buffer)
+
+@cli.command()
+@click.option('--files', type=click.IntRange(min=1), default=100, show_default=True, help="Number of modules in the synthetic project.")
+@click.option('--functions-per-file', type=click.IntRange(min=0), default=3, show_default=True)
+@click.option('--function-lines', type=click.IntRange(min=3), default=20, show_default=True, help="Length of each generated function.")
+@click.option('--branch-density', type=click.FloatRange(0, 1), default=0.2, show_default=True, help="Share of statements that are branches.")
+@click.option('--imports', 'import_shape', type=click.Choice(bench_lib.IMPORT_SHAPES), default='random', show_default=True, help="Shape of the import graph.")
+@click.option('--duplicates', type=click.FloatRange(0, 1), default=0.1, show_default=True, help="Share of modules containing a copied block.")
+@click.option('--seed', type=int, default=0, show_default=True)
+@click.option('--jobs', '-j', type=click.IntRange(min=1), default=1, show_default=True, help="Worker processes for the full analyzer run.")
+@click.option('--save', 'save_path', type=click.Path(dir_okay=False), help="Write the results as a JSON baseline.")
+@click.option('--compare', 'compare_path', type=click.Path(exists=True, dir_okay=False), help="Compare against a JSON baseline and exit with 1 on regressions.")
+@click.option('--tolerance', type=click.FloatRange(min=0), default=0.10, show_default=True, help="Allowed slowdown or memory growth before flagging a regression.")
+def bench(files, functions_per_file, function_lines, branch_density, import_shape, duplicates, seed, jobs, save_path, compare_path, tolerance):
+    """
+    Benchmarks every detector and the full analyzer on a generated project.
+
+    Each measurement runs in a fresh process and records wall time, files/sec
+    and peak RSS.
+    """
+    workload = dict(files=files, functions_per_file=functions_per_file, function_lines=function_lines,
+                    branch_density=branch_density, import_shape=import_shape, duplicate_ratio=duplicates, seed=seed)
+    with tempfile.TemporaryDirectory(prefix='projectdoctor-bench-') as root:
+        click.echo(f"🏗  Generating {files} modules...")
+        bench_lib.generate_project(root, **workload)
+        results = bench_lib.run_benchmark(root, jobs=jobs)
+
+    click.echo(f"{'target':<16}{'wall (s)':>10}{'files/s':>12}{'peak RSS (KiB)':>16}")
+    for target, result in results.items():
+        click.echo(f"{target:<16}{result['wall_seconds']:>10.3f}{result['files_per_sec'] or 0:>12.1f}{result['peak_rss_kb'] or 0:>16}")
+
+    if save_path:
+        bench_lib.save_baseline(bench_lib.make_baseline(results, jobs=jobs, **workload), save_path)
+        click.echo(f"📄 Baseline saved to: {save_path}")
+    if compare_path:
+        regressions = bench_lib.compare(bench_lib.load_baseline(compare_path), results, tolerance)
+        for target, metric, before, after in regressions:
+            click.echo(f"🔴 {target}: {metric} regressed from {before} to {after}")
+        if regressions:
+            sys.exit(1)
+        click.echo("✅ No regressions against the baseline.")
+
 if __name__ == '__main__':
     cli()
\ No newline at end of file
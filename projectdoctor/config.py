@@ -0,0 +1,20 @@
+# projectdoctor/config.py
+import os
+
+try:
+    import tomllib
+except ImportError: # Python < 3.11; the tomli backport is a dependency there.
+    import tomli as tomllib
+
+def load_config(project_path):
+    """
+    Returns the `[tool.projectdoctor]` table of the project's pyproject.toml, or {}
+    when there is none or it cannot be parsed.
+    """
+    try:
+        with open(os.path.join(project_path, 'pyproject.toml'), 'rb') as f:
+            data = tomllib.load(f)
+    except (OSError, tomllib.TOMLDecodeError):
+        return {}
+    config = data.get('tool', {}).get('projectdoctor', {})
+    return config if isinstance(config, dict) else {}
@@ -0,0 +1,217 @@
+# projectdoctor/corpus.py
+import ast
+import collections
+import io
+import tokenize
+
+def read_bytes(path):
+    """
+    Reads a whole file as bytes. Every reader decodes, hashes and parses the bytes, so
+    they are needed in memory as a whole; mapping the file would only add a copy.
+    """
+    with open(path, 'rb') as f:
+        return f.read()
+
+def source_encoding(raw):
+    """The encoding named by a file's BOM or PEP 263 coding cookie; UTF-8 when absent or unknown."""
+    try:
+        encoding, _ = tokenize.detect_encoding(io.BytesIO(raw).readline)
+    except SyntaxError:
+        return 'utf-8'
+    return encoding
+
+def count_lines(raw):
+    """Counts lines as text-mode reads see them ('\n', '\r\n' and '\r' all end a line), without decoding."""
+    count = raw.count(b'\n')
+    if b'\r' in raw:
+        count += raw.count(b'\r') - raw.count(b'\r\n')
+    if raw and raw[-1:] not in (b'\n', b'\r'):
+        count += 1
+    return count
+
+def _parse(text, path):
+    try:
+        return ast.parse(text, filename=path, type_comments=True)
+    except SyntaxError:
+        # A misplaced type comment is only an error when type comments are parsed.
+        return ast.parse(text, filename=path)
+
+
+class SourceFile:
+    """
+    A Python file read once and shared by every detector. The raw bytes are only
+    decoded, split and parsed when a detector asks for text, lines or the AST.
+    """
+
+    def __init__(self, path, raw, corpus=None):
+        self.path = path
+        self.raw = raw
+        self._text = None
+        self._line_count = None
+        self._corpus = corpus
+        self._lines = None
+        self._line_offsets = None
+        self._stripped_lines = None
+        self._tree = None
+        self._parse_error = None
+        # Results of the visitor plugins run on this file (see `visitor.run`).
+        self.visits = {}
+
+    @property
+    def text(self):
+        """The decoded source, honouring its coding cookie; undecodable bytes become U+FFFD."""
+        if self._text is None:
+            text = self.raw.decode(source_encoding(self.raw), errors='replace')
+            if '\r' in text:
+                # Match the universal-newline translation of text-mode reads.
+                text = text.replace('\r\n', '\n').replace('\r', '\n')
+            self._text = text
+        return self._text
+
+    @property
+    def lines(self):
+        """The file's lines without their trailing newlines."""
+        if self._lines is None:
+            lines = self.text.split('\n')
+            if lines and lines[-1] == '':
+                lines.pop()
+            self._lines = lines
+        return self._lines
+
+    @property
+    def line_count(self):
+        if self._line_count is None:
+            self._line_count = len(self._lines) if self._lines is not None else count_lines(self.raw)
+        return self._line_count
+
+    @property
+    def line_offsets(self):
+        """Character offset of the start of every line in `text`."""
+        if self._line_offsets is None:
+            offsets, position = [], 0
+            for line in self.lines:
+                offsets.append(position)
+                position += len(line) + 1
+            self._line_offsets = offsets
+        return self._line_offsets
+
+    @property
+    def stripped_lines(self):
+        """Every line with surrounding whitespace removed (blank lines become '')."""
+        if self._stripped_lines is None:
+            self._stripped_lines = [line.strip() for line in self.lines]
+        return self._stripped_lines
+
+    @property
+    def tree(self):
+        """The module AST, parsed on first access. Parse failures are remembered and re-raised."""
+        if self._tree is None:
+            if self._parse_error is not None:
+                raise self._parse_error
+            try:
+                # Type comments are parsed like Vulture does, so names used only in them count as used.
+                self._tree = _parse(self.text, self.path)
+            except (SyntaxError, ValueError) as e:
+                self._parse_error = e
+                raise
+            finally:
+                if self._corpus is not None:
+                    self._corpus.parses += 1
+        return self._tree
+
+
+class Corpus:
+    """
+    Lazily loaded collection of `SourceFile`s, keyed by path. Without `retain`, only
+    the most recently read file is kept, so a source and its AST are freed as soon as
+    the next file is read.
+    """
+
+    def __init__(self, retain=True):
+        self.retain = retain
+        self._files = {}
+        self._errors = {}
+        # Reads started by `prefetch` that `get` has not picked up yet.
+        self._pending = {}
+        # Unsaved contents that stand in for files on disk, e.g. an editor's buffers.
+        self._overlays = {}
+        self.reads = 0
+        self.bytes_read = 0
+        self.parses = 0
+
+    def get(self, path):
+        """Returns the `SourceFile` for `path`, reading it on first use. Read errors are re-raised."""
+        source = self._files.get(path)
+        if source is not None:
+            return source
+        if path in self._errors:
+            raise self._errors[path]
+        if path in self._overlays:
+            text = self._overlays[path]
+            source = SourceFile(path, text.encode('utf-8'), self)
+            # The text is already decoded; a coding cookie in it no longer applies.
+            source._text = text.replace('\r\n', '\n').replace('\r', '\n')
+            if not self.retain:
+                self._files.clear()
+            self._files[path] = source
+            return source
+        pending = self._pending.pop(path, None)
+        try:
+            raw = pending.result() if pending is not None else read_bytes(path)
+        except OSError as e:
+            self._errors[path] = e
+            raise
+        finally:
+            self.reads += 1
+        self.bytes_read += len(raw)
+        source = SourceFile(path, raw, self)
+        if not self.retain:
+            self._files.clear()
+        self._files[path] = source
+        return source
+
+    def prefetch(self, paths, threads=8, window=32):
+        """
+        Yields `paths` in order while a thread pool reads up to `window` of the files not
+        yet loaded ahead of time, so `get` rarely waits on open/read latency (e.g. on NFS).
+        """
+        paths = list(paths)
+        unread = collections.deque(path for path in paths if path not in self._files and path not in self._errors)
+        if len(unread) <= 1:
+            yield from paths
+            return
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=min(threads, len(unread))) as executor:
+            try:
+                for path in paths:
+                    while unread and len(self._pending) < window:
+                        ahead = unread.popleft()
+                        self._pending[ahead] = executor.submit(read_bytes, ahead)
+                    yield path
+            finally:
+                for future in self._pending.values():
+                    future.cancel()
+                self._pending.clear()
+
+    def overlay(self, path, text):
+        """
+        Makes `get(path)` return `text` instead of the file's contents on disk, which need
+        not exist; `text=None` goes back to the file on disk.
+        """
+        if text is None:
+            self._overlays.pop(path, None)
+        else:
+            self._overlays[path] = text
+        self.forget(path)
+
+    def has_overlay(self, path):
+        return path in self._overlays
+
+    def forget(self, path):
+        """Drops a file so the next `get` reads it again, e.g. after it changed on disk."""
+        self._files.pop(path, None)
+        self._errors.pop(path, None)
+        self._pending.pop(path, None)
+
+    def __contains__(self, path):
+        return path in self._files
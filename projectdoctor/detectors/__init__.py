@@ -1 +1,154 @@
+# projectdoctor/detectors/__init__.py
+import functools
+import importlib
+import sys
+import time
+import warnings
+from ..corpus import Corpus
+from ..profiling import add_timing
+from .. import budget, visitor
 
+def collect_record(collectors, corpus, file_path, thresholds, timings=None, profiles=None):
+    """
+    Runs the per-file `collect` step of every detector on one file.
+    The record holds the file's line count under 'loc' and each detector's
+    data under its name, or only an 'error' if the file cannot be read.
+    With `timings`, each step's wall and CPU time is added under the detector's
+    name; `profiles` maps detector names to a cProfile enabled around their step.
+    A file over the size budget, or whose parse or any step runs out of time, is
+    recorded as a 'quarantine' with the reason instead (see `budget`).
+    """
+    size = budget.oversized(file_path, thresholds)
+    if size is not None:
+        return budget.quarantine(f"{size} bytes exceeds the {budget.max_file_size(thresholds)}-byte file budget")
+    try:
+        source = corpus.get(file_path)
+    except OSError as e:
+        return {'error': str(e)}
+    record = {'loc': source.line_count}
+    try:
+        if collectors and budget.step_timeout(thresholds, 'parse'):
+            # Parse up front, so a parse that runs out of time is blamed on the parse itself.
+            with budget.deadline(budget.step_timeout(thresholds, 'parse'), 'parse'):
+                try:
+                    source.tree
+                except (SyntaxError, ValueError):
+                    pass
+        _collect_steps(record, collectors, source, thresholds, timings, profiles)
+    except budget.StepTimeout as e:
+        return budget.quarantine(f"{e.step} took longer than {e.seconds:g}s", record['loc'])
+    return record
+
+def _collect_steps(record, collectors, source, thresholds, timings, profiles):
+    # Detectors backed by visitor plugins share a single traversal of the AST.
+    plugins = [collect.plugin for collect in collectors.values() if isinstance(collect, visitor.PluginCollect)]
+    if plugins:
+        with budget.deadline(budget.step_timeout(thresholds, 'visitor'), 'visitor'):
+            if timings is None:
+                visitor.run(source, thresholds, plugins)
+            else:
+                start_wall, start_cpu = time.perf_counter(), time.process_time()
+                visitor.run(source, thresholds, plugins)
+                add_timing(timings, 'visitor', time.perf_counter() - start_wall, time.process_time() - start_cpu)
+    for name, collect in collectors.items():
+        with budget.deadline(budget.step_timeout(thresholds, name), name):
+            if timings is None:
+                try:
+                    record[name] = collect(source, thresholds)
+                except Exception:
+                    continue # Skip files that cannot be parsed
+            else:
+                _timed_collect(record, name, collect, source, thresholds, timings, profiles)
+
+def _timed_collect(record, name, collect, source, thresholds, timings, profiles):
+    profile = profiles.get(name) if profiles else None
+    start_wall, start_cpu = time.perf_counter(), time.process_time()
+    if profile:
+        profile.enable()
+    try:
+        record[name] = collect(source, thresholds)
+    except Exception:
+        pass # Skip files that cannot be parsed
+    finally:
+        if profile:
+            profile.disable()
+        add_timing(timings, name, time.perf_counter() - start_wall, time.process_time() - start_cpu)
+
+def collect_records(collectors, python_files, thresholds, corpus=None):
+    """Collects a record for every file, keyed by path in `python_files` order."""
+    corpus = corpus or Corpus()
+    return {path: collect_record(collectors, corpus, path, thresholds) for path in python_files}
+
+# Built-in detectors in the order they run; each module is imported only when selected.
+BUILTIN_DETECTORS = ('file_size', 'long_function', 'duplicate_code', 'circular_import', 'complexity', 'structure', 'dead_code')
+
+# Built-in detectors grouped from cheapest to most expensive, for runs that may stop early.
+# Each group is collected in one pass over files that are re-read and re-parsed for it, so the
+# visitor-backed detectors share the first group and a traversal.
+COST_STAGES = (('structure', 'file_size', 'long_function', 'complexity', 'circular_import'), ('duplicate_code',), ('dead_code',))
+
+ENTRY_POINT_GROUP = 'projectdoctor.detectors'
+
+@functools.lru_cache(maxsize=None)
+def _entry_points():
+    """The entry points of the 'projectdoctor.detectors' group, by name. Scanning them is slow, so it is done once and only when needed."""
+    from importlib import metadata
+    if sys.version_info >= (3, 10):
+        entry_points = metadata.entry_points(group=ENTRY_POINT_GROUP)
+    else:
+        entry_points = metadata.entry_points().get(ENTRY_POINT_GROUP, [])
+    return {entry_point.name: entry_point for entry_point in entry_points if entry_point.name not in BUILTIN_DETECTORS}
+
+def detector_names():
+    """Every available detector name: the built-ins, then third-party ones."""
+    return list(BUILTIN_DETECTORS) + sorted(_entry_points())
+
+@functools.lru_cache(maxsize=None)
+def load_detector(name):
+    """
+    Imports a detector by name. An entry point names either a `visitor.Plugin` subclass,
+    which joins the shared AST traversal, or a module-like object with `NAME` and
+    `collect`/`reduce` or `analyze`. Raises `KeyError` for unknown names.
+    Detectors with a `VERSION`, to be bumped whenever `collect` returns different
+    data for the same file, can have their results shared (see `cache.SharedCache`).
+    """
+    if name in BUILTIN_DETECTORS:
+        return importlib.import_module(f'.{name}', __name__)
+    detector = _entry_points()[name].load()
+    if isinstance(detector, type) and issubclass(detector, visitor.Plugin):
+        detector = visitor.PluginDetector(detector)
+    return detector
+
+def select_detectors(only=None, skip=()):
+    """
+    Loads the detectors to run: `only` those named (default: all), minus those in `skip`.
+    Third-party entry points are only scanned when they might be selected.
+    Raises `ValueError` naming an unknown detector.
+    """
+    wanted = list(only) if only else None
+    if wanted is None or any(name not in BUILTIN_DETECTORS for name in wanted):
+        available = detector_names()
+    else:
+        available = list(BUILTIN_DETECTORS)
+    for name in list(wanted or ()) + list(skip):
+        if name not in available:
+            raise ValueError(f"Unknown detector '{name}'. Available: {', '.join(detector_names())}.")
+    names = [name for name in available if (wanted is None or name in wanted) and name not in skip]
+    detectors = []
+    for name in names:
+        try:
+            detectors.append(load_detector(name))
+        except Exception as e:
+            if name in BUILTIN_DETECTORS:
+                raise
+            warnings.warn(f"Could not load detector '{name}': {e}")
+    return detectors
+
+def cost_stages(detectors):
+    """Groups `detectors` by `COST_STAGES`, cheapest first; third-party ones, of unknown cost, form the last group."""
+    order = [name for stage in COST_STAGES for name in stage]
+    stages = [[] for _ in range(len(COST_STAGES) + 1)]
+    for detector in sorted(detectors, key=lambda d: order.index(d.NAME) if d.NAME in order else len(order)):
+        stage = next((i for i, names in enumerate(COST_STAGES) if detector.NAME in names), len(COST_STAGES))
+        stages[stage].append(detector)
+    return [stage for stage in stages if stage]
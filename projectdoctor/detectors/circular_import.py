@@ -1,7 +1,14 @@
 # projectdoctor/detectors/circular_import.py
 import os
-import ast
-from collections import defaultdict
+from collections import defaultdict, deque
+from ..issue import Issue, Severity
+from ..visitor import Plugin, PluginCollect
+from . import collect_records
+
+NAME = 'circular_import'
+VERSION = 1
+CYCLE = "Circular import detected: {}"
+CYCLE_IN_COMPONENT = CYCLE + " ({} modules are tangled in this cycle: {})"
 
 # Helper functions remain the same
 def _get_module_name(file_path, project_path):
@@ -21,60 +28,152 @@ def _resolve_import(module_name, current_module_path):
     base = parts[:len(parts) - level]
     return '.'.join(base + ([module_name] if module_name else []))
 
-class ImportVisitor(ast.NodeVisitor):
-    def __init__(self, current_module_path):
-        self.current_module_path = current_module_path
+def _strongly_connected_components(graph):
+    """Iterative Tarjan's algorithm; linear in nodes + edges and free of recursion limits."""
+    index, lowlink, on_stack, stack, components = {}, {}, set(), [], []
+    def push(node):
+        index[node] = lowlink[node] = len(index)
+        stack.append(node)
+        on_stack.add(node)
+        return node, iter(sorted(graph.get(node, ())))
+    for root in graph:
+        if root in index: continue
+        work = [push(root)]
+        while work:
+            node, neighbors = work[-1]
+            for neighbor in neighbors:
+                if neighbor not in index:
+                    work.append(push(neighbor))
+                    break
+                if neighbor in on_stack:
+                    lowlink[node] = min(lowlink[node], index[neighbor])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+                if lowlink[node] == index[node]:
+                    component = set()
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.add(member)
+                        if member == node: break
+                    components.append(component)
+    return components
+
+def _shortest_cycle(graph, component):
+    """Breadth-first search for the shortest cycle through the component's smallest module."""
+    start = min(component)
+    parents, queue = {start: None}, deque([start])
+    while queue:
+        node = queue.popleft()
+        for neighbor in sorted(graph.get(node, ())):
+            if neighbor == start:
+                cycle = [start]
+                while node is not None:
+                    cycle.append(node)
+                    node = parents[node]
+                return cycle[::-1]
+            if neighbor in component and neighbor not in parents:
+                parents[neighbor] = node
+                queue.append(neighbor)
+    return None
+
+def _find_cycles(graph):
+    """Returns `(cycle, component)` for every strongly connected component that contains a cycle."""
+    cycles = []
+    for component in _strongly_connected_components(graph):
+        node = next(iter(component))
+        if len(component) > 1 or node in graph.get(node, ()):
+            cycles.append((_shortest_cycle(graph, component), component))
+    return sorted(cycles, key=lambda c: c[0])
+
+class ImportPlugin(Plugin):
+    """Records the file's imports, with relative imports left unresolved so the result is path-independent."""
+    NAME = NAME
+
+    def begin(self, source, thresholds):
         self.imports = set()
-    def visit_Import(self, node):
+
+    def enter_Import(self, node):
         for alias in node.names: self.imports.add(alias.name)
-        self.generic_visit(node)
-    def visit_ImportFrom(self, node):
-        if node.module: self.imports.add(_resolve_import(node.module, self.current_module_path))
-        self.generic_visit(node)
 
-def _find_cycles(graph):
-    path, visited, cycles, seen_cycles = [], set(), [], set()
-    def dfs(node):
-        path.append(node)
-        visited.add(node)
-        for neighbor in graph.get(node, []):
-            if neighbor in path:
-                cycle = path[path.index(neighbor):] + [neighbor]
-                sorted_tuple = tuple(sorted(cycle))
-                if sorted_tuple not in seen_cycles:
-                    cycles.append(cycle)
-                    seen_cycles.add(sorted_tuple)
-            elif neighbor not in visited: dfs(neighbor)
-        path.pop()
-    for node in list(graph.keys()):
-        if node not in visited: dfs(node)
-    return cycles
-
-def analyze(project_path, thresholds, python_files):
+    def enter_ImportFrom(self, node):
+        if node.module:
+            self.imports.add('.' * node.level + node.module)
+
+    def result(self):
+        return sorted(self.imports)
+
+collect = PluginCollect(ImportPlugin)
+
+def build_graph(project_path, imports_by_path):
     """
-    ADVANCED DETECTOR: circular_import
-    Purpose: Detects circular dependencies between modules.
-    Improvement: This graph-based AST analysis is already the gold standard.
+    Resolves each file's raw imports (as returned by `collect`) against the project's modules.
+    Returns the module dependency graph and the module name -> file path map.
     """
     dependency_graph, module_map = defaultdict(set), {}
-    for path in python_files:
+    for path in imports_by_path:
         name = _get_module_name(path, project_path)
         if name: module_map[name] = path
-    
+
     all_project_modules = set(module_map.keys())
 
     for module_name, file_path in module_map.items():
-        try:
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                tree = ast.parse(f.read(), filename=file_path)
-                visitor = ImportVisitor(module_name)
-                visitor.visit(tree)
-                for imp in visitor.imports:
-                    if imp in all_project_modules: dependency_graph[module_name].add(imp)
-        except Exception: continue
-            
-    cycles, issues = _find_cycles(dependency_graph), []
-    for cycle in cycles:
-        cycle_path = " -> ".join(cycle)
-        issues.append({'file': module_map.get(cycle[0], cycle[0]), 'severity': 'HIGH', 'message': f"Circular import detected: {cycle_path}"})
-    return issues
\ No newline at end of file
+        for raw in imports_by_path[file_path]:
+            imp = _resolve_import(raw, module_name)
+            if imp in all_project_modules: dependency_graph[module_name].add(imp)
+    return dependency_graph, module_map
+
+class ImportGraph:
+    """
+    The project's dependency graph, updated in place as files change. A content change
+    only re-resolves that module's edges; adding or removing a file changes the set of
+    project modules, so the graph is rebuilt on the next `issues()` call.
+    """
+
+    def __init__(self, project_path, imports_by_path=None):
+        self.project_path = project_path
+        self.imports_by_path = dict(imports_by_path or {})
+        self._graph, self._module_map = None, None
+
+    def update(self, path, imports):
+        is_new = path not in self.imports_by_path
+        self.imports_by_path[path] = imports
+        if is_new or self._graph is None:
+            self._graph = None
+            return
+        module_name = _get_module_name(path, self.project_path)
+        if module_name:
+            resolved = {_resolve_import(raw, module_name) for raw in imports}
+            self._graph[module_name] = resolved & self._module_map.keys()
+
+    def remove(self, path):
+        if self.imports_by_path.pop(path, None) is not None:
+            self._graph = None
+
+    def issues(self):
+        if self._graph is None:
+            self._graph, self._module_map = build_graph(self.project_path, self.imports_by_path)
+        issues = []
+        for cycle, component in _find_cycles(self._graph):
+            file = self._module_map.get(cycle[0], cycle[0])
+            args = (" -> ".join(cycle),)
+            if len(component) > len(cycle) - 1:
+                template, args = CYCLE_IN_COMPONENT, args + (len(component), ', '.join(sorted(component)))
+            else:
+                template = CYCLE
+            issues.append(Issue(NAME, Severity.HIGH, file, template, args, value=len(cycle) - 1))
+        return issues
+
+def reduce(project_path, thresholds, records):
+    return ImportGraph(project_path, {path: record.get(NAME, ()) for path, record in records.items()}).issues()
+
+def analyze(project_path, thresholds, python_files, corpus=None):
+    """
+    ADVANCED DETECTOR: circular_import
+    Purpose: Detects circular dependencies between modules.
+    Improvement: Linear-time SCC search; one issue per tangle of modules, with its shortest cycle.
+    """
+    return reduce(project_path, thresholds, collect_records({NAME: collect}, python_files, thresholds, corpus))
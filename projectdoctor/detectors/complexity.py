@@ -1,29 +1,108 @@
 # projectdoctor/detectors/complexity.py
-from radon.visitors import Function
-from radon.cli.harvest import cc_visit
+from ..issue import Issue, Severity
+from ..visitor import Plugin, PluginCollect
+from . import collect_records
 
-def analyze(project_path, thresholds, python_files):
+NAME = 'complexity'
+VERSION = 1
+PER_FILE = True
+TOO_COMPLEX = "Function '{}' on line {} has high cyclomatic complexity ({})."
+
+class ComplexityPlugin(Plugin):
+    """
+    Counts cyclomatic complexity during the shared traversal, following Radon's rules:
+    a function starts at 1 and its body (not its decorators, defaults or annotations) adds
+    one per if/elif/IfExp, loop (plus its else), except handler, try-else, extra BoolOp
+    operand, comprehension and its ifs, assert, and non-wildcard match case. Nested
+    functions and classes count on their own, and as in Radon only module-level functions
+    and methods of module-level classes are reported.
+    Records `[name, line, complexity]` for every reported function above the threshold.
+    """
+    NAME = NAME
+
+    def begin(self, source, thresholds):
+        self.max_complexity = thresholds.get('complexity', {}).get('max_complexity', 10)
+        # One `[kind, node, complexity, body_start]` entry per enclosing function, class or assert.
+        self.scopes = []
+        self.classes = 0
+        self.found = []
+
+    def _add(self, amount, node):
+        if self.scopes:
+            scope = self.scopes[-1]
+            if scope[0] == 'function' and (node.lineno, node.col_offset) >= scope[3]:
+                scope[2] += amount
+
+    def enter_FunctionDef(self, node):
+        body = node.body[0]
+        self.scopes.append(['function', node, 1, (body.lineno, body.col_offset)])
+
+    def leave_FunctionDef(self, node):
+        _, _, complexity, _ = self.scopes.pop()
+        kinds = [scope[0] for scope in self.scopes]
+        if complexity > self.max_complexity and (not kinds or kinds == ['class']):
+            # Radon lists module-level functions first, then each class's methods.
+            self.found.append((self.classes if kinds else 0, len(self.found), [node.name, node.lineno, complexity]))
+
+    enter_AsyncFunctionDef = enter_FunctionDef
+    leave_AsyncFunctionDef = leave_FunctionDef
+
+    def enter_ClassDef(self, node):
+        if not self.scopes:
+            self.classes += 1
+        self.scopes.append(['class', node, 0, None])
+
+    def leave_ClassDef(self, node):
+        self.scopes.pop()
+
+    def enter_Assert(self, node):
+        # Radon does not look inside assert statements.
+        self._add(1, node)
+        self.scopes.append(['assert', node, 0, None])
+
+    def leave_Assert(self, node):
+        self.scopes.pop()
+
+    def enter_If(self, node):
+        self._add(1, node)
+
+    enter_IfExp = enter_If
+
+    def enter_For(self, node):
+        self._add(bool(node.orelse) + 1, node)
+
+    enter_While = enter_AsyncFor = enter_For
+
+    def enter_Try(self, node):
+        self._add(len(node.handlers) + bool(node.orelse), node)
+
+    def enter_BoolOp(self, node):
+        self._add(len(node.values) - 1, node)
+
+    def enter_comprehension(self, node):
+        # Comprehensions carry no position of their own; their target marks where they are.
+        self._add(len(node.ifs) + 1, node.target)
+
+    def enter_Match(self, node):
+        wildcard = any(getattr(case.pattern, 'pattern', False) is None for case in node.cases)
+        self._add(max(0, len(node.cases) - wildcard), node)
+
+    def result(self):
+        return [entry for _, _, entry in sorted(self.found, key=lambda found: found[:2])]
+
+collect = PluginCollect(ComplexityPlugin)
+
+def reduce(project_path, thresholds, records):
+    issues = []
+    for file_path, record in records.items():
+        for name, lineno, complexity in record.get(NAME, ()):
+            issues.append(Issue(NAME, Severity.HIGH, file_path, TOO_COMPLEX, (name, lineno, complexity), lineno, complexity))
+    return issues
+
+def analyze(project_path, thresholds, python_files, corpus=None):
     """
     ADVANCED DETECTOR: complexity
     Purpose: Measures cyclomatic complexity of functions.
-    Improvement: Uses Radon's most reliable programmatic API (cc_visit).
+    Improvement: Counts during the shared AST traversal instead of a separate Radon pass.
     """
-    max_complexity = thresholds.get('complexity', {}).get('max_complexity', 10)
-    issues = []
-    for file_path in python_files:
-        try:
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                content = f.read()
-            
-            results = cc_visit(content)
-            
-            for result in results:
-                if isinstance(result, Function) and result.complexity > max_complexity:
-                    issues.append({
-                        'file': file_path,
-                        'severity': 'HIGH',
-                        'message': f"Function '{result.name}' on line {result.lineno} has high cyclomatic complexity ({result.complexity})."
-                    })
-        except Exception:
-            continue
-    return issues
\ No newline at end of file
+    return reduce(project_path, thresholds, collect_records({NAME: collect}, python_files, thresholds, corpus))
@@ -1,29 +1,179 @@
 # projectdoctor/detectors/dead_code.py
+import functools
+import pkgutil
+from collections import Counter, defaultdict
+from pathlib import Path
 import vulture
+from vulture import noqa
+from vulture.core import Item
+from ..issue import Issue, Severity
+from . import collect_records
 
-def analyze(project_path, thresholds, python_files):
-    """Finds unused code using Vulture v2.11 API."""
-    issues = []
-    min_confidence = thresholds.get('dead_code', {}).get('min_confidence', 80)
+NAME = 'dead_code'
+# Vulture's own version is part of it, since its tables decide what `collect` returns.
+VERSION = f'2+vulture{vulture.__version__}'
+DEAD = "Potential dead code on line {}: {} ({}% confidence)"
+
+# Vulture's per-type collections of defined code, as named on `vulture.Vulture`.
+_DEFINED = ('defined_attrs', 'defined_classes', 'defined_funcs', 'defined_imports',
+            'defined_methods', 'defined_props', 'defined_vars', 'unreachable_code')
 
-    if not python_files:
-        return issues
-        
+def collect(source, thresholds):
+    """
+    Runs Vulture over one file and returns its name tables:
+    'defined' holds `[type, name, first_line, last_line, message, confidence]` rows,
+    'used' the names the file uses. Unused code is only decided once all files are merged.
+    """
+    v = vulture.Vulture(verbose=False)
+    # Equivalent to `v.scan(source.text, source.path)`, but reuses the shared AST.
+    v.filename = Path(source.path)
+    v.code = source.text.splitlines()
+    v.noqa_lines = noqa.parse_noqa(v.code)
+    v.visit(source.tree)
+    defined = [
+        [item.typ, item.name, item.first_lineno, item.last_lineno, item.message, item.confidence]
+        for collection in _DEFINED for item in getattr(v, collection)
+    ]
+    return {'defined': defined, 'used': sorted(v.used_names)}
+
+@functools.lru_cache(maxsize=None)
+def _whitelist(import_name):
+    """
+    The names used by Vulture's bundled whitelist for an imported name (e.g. `threading`'s
+    `Thread.daemon`), which `Vulture.scavenge` scans for every import in the project.
+    """
+    path = f"whitelists/{import_name}_whitelist.py"
     try:
-        # API for Vulture 2.x
-        v = vulture.Vulture(python_files, min_confidence=min_confidence, verbose=False)
-        v.scan()
-
-        for item in v.report().split('\n'):
-            if item:
-                # Vulture's report format is like: "path:line: message (confidence%)"
-                issues.append({
-                    'file': item.split(':')[0],
-                    'severity': 'LOW',
-                    'message': f"Potential dead code: {item}"
-                })
-    except Exception:
-        # If Vulture fails for any reason, fail silently.
-        pass
-
-    return issues
\ No newline at end of file
+        data = pkgutil.get_data('vulture', path)
+    except OSError:
+        return frozenset()
+    if not data:
+        return frozenset()
+    v = vulture.Vulture(verbose=False)
+    v.scan(data.decode('utf-8'), filename=path)
+    return frozenset(v.used_names)
+
+def spill(part, file_id, store):
+    """For `--max-memory`: moves the name tables into sorted runs of used names and of definitions by name."""
+    used, defined = store.run(NAME + '.used'), store.run(NAME + '.defined')
+    for name in part['used']:
+        used.add((name,))
+    for typ, name, first_lineno, last_lineno, message, confidence in part['defined']:
+        defined.add((name, typ, file_id, first_lineno, last_lineno, message, confidence))
+        if typ == 'import':
+            for used_name in _whitelist(name):
+                used.add((used_name,))
+    return {}
+
+def _unused(records, min_confidence):
+    used_names, imports = set(), set()
+    for record in records.values():
+        part = record.get(NAME, {})
+        used_names.update(part.get('used', ()))
+        imports.update(row[1] for row in part.get('defined', ()) if row[0] == 'import')
+    for name in imports:
+        used_names.update(_whitelist(name))
+    for file_path, record in records.items():
+        for typ, name, first_lineno, last_lineno, message, confidence in record.get(NAME, {}).get('defined', ()):
+            if confidence >= min_confidence and (typ == 'unreachable_code' or name not in used_names):
+                yield Item(name, typ, Path(file_path), first_lineno, last_lineno, message, confidence)
+
+def _unused_spilled(spill, min_confidence):
+    """`_unused` as a merge join of the sorted runs of definitions and used names."""
+    used = iter(spill.run(NAME + '.used'))
+    used_name = next(used, (None,))[0]
+    for name, typ, file_id, first_lineno, last_lineno, message, confidence in spill.run(NAME + '.defined'):
+        while used_name is not None and used_name < name:
+            used_name = next(used, (None,))[0]
+        if confidence >= min_confidence and (typ == 'unreachable_code' or name != used_name):
+            yield Item(name, typ, Path(spill.paths[file_id]), first_lineno, last_lineno, message, confidence)
+
+def _min_confidence(thresholds):
+    return thresholds.get('dead_code', {}).get('min_confidence', 80)
+
+def _issues(unused):
+    issues = []
+    for item in sorted(unused, key=lambda item: (str(item.filename).lower(), item.first_lineno, item.name, item.typ)):
+        extra = {'name': item.name, 'type': item.typ, 'confidence': item.confidence}
+        issues.append(Issue(NAME, Severity.LOW, str(item.filename), DEAD, (item.first_lineno, item.message, item.confidence), item.first_lineno, extra=extra))
+    return issues
+
+def reduce(project_path, thresholds, records):
+    min_confidence = _min_confidence(thresholds)
+    if hasattr(records, 'spill'):
+        return _issues(set(_unused_spilled(records.spill, min_confidence)))
+    return _issues(set(_unused(records, min_confidence)))
+
+def make_index(thresholds):
+    """An empty `UsageIndex`, to `add` files' `collect` output to."""
+    return UsageIndex(_min_confidence(thresholds))
+
+def _used_names(part):
+    """The names a file uses, with the whitelisted names of its imports."""
+    used = set(part.get('used', ()))
+    for row in part.get('defined', ()):
+        if row[0] == 'import':
+            used.update(_whitelist(row[1]))
+    return used
+
+class UsageIndex:
+    """
+    The merged name tables of a long-lived session (`watch`, `serve`), updated in place.
+    It counts the files using each name, so a changed file only re-checks its own
+    definitions and those of the names that it started or stopped being the last user of.
+    Every other file keeps the issues it had.
+    """
+
+    def __init__(self, min_confidence=80):
+        self.min_confidence = min_confidence
+        self.parts = {}
+        self._uses = Counter()
+        self._definers = defaultdict(set)
+        self._issues = {}
+        self._stale = set()
+
+    def add(self, path, part):
+        """Indexes a file's `collect` output, replacing what was indexed for it before."""
+        old = self.parts.get(path, {})
+        old_used, new_used = _used_names(old), _used_names(part)
+        for name in old_used - new_used:
+            self._uses[name] -= 1
+            if not self._uses[name]:
+                del self._uses[name]
+                self._stale.update(self._definers.get(name, ()))
+        for name in new_used - old_used:
+            self._uses[name] += 1
+            if self._uses[name] == 1:
+                self._stale.update(self._definers.get(name, ()))
+        for row in old.get('defined', ()):
+            definers = self._definers.get(row[1])
+            if definers is not None:
+                definers.discard(path)
+                if not definers:
+                    del self._definers[row[1]]
+        for row in part.get('defined', ()):
+            self._definers[row[1]].add(path)
+        self.parts[path] = part
+        self._stale.add(path)
+
+    def remove(self, path):
+        if path not in self.parts:
+            return
+        self.add(path, {})
+        del self.parts[path]
+        self._issues.pop(path, None)
+        self._stale.discard(path)
+
+    def issues(self):
+        """Every indexed file's issues, re-checking only the files that went stale."""
+        for path in self._stale:
+            self._issues[path] = _issues({
+                Item(name, typ, Path(path), first_lineno, last_lineno, message, confidence)
+                for typ, name, first_lineno, last_lineno, message, confidence in self.parts[path].get('defined', ())
+                if confidence >= self.min_confidence and (typ == 'unreachable_code' or name not in self._uses)})
+        self._stale.clear()
+        return [issue for issues in self._issues.values() for issue in issues]
+
+def analyze(project_path, thresholds, python_files, corpus=None):
+    """Finds unused code using Vulture v2.11 API."""
+    return reduce(project_path, thresholds, collect_records({NAME: collect}, python_files, thresholds, corpus))
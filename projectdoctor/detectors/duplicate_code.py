@@ -1,36 +1,501 @@
 # projectdoctor/detectors/duplicate_code.py
 import hashlib
-from collections import defaultdict
+import io
+import keyword
+import tokenize
+from collections import defaultdict, deque
+from ..issue import Issue, Severity
+from . import collect_records
 
-def analyze(project_path, thresholds, python_files):
-    """Finds blocks of duplicated code across different files."""
-    min_lines = thresholds.get('duplicate_code', {}).get('min_lines', 8)
-    hashes = defaultdict(list)
-    issues = []
-
-    # Phase 1: Collect all block hashes and their locations
-    for file_path in python_files:
-        try:
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                lines = [line.strip() for line in f.readlines() if line.strip()]
-            if len(lines) < min_lines:
+NAME = 'duplicate_code'
+VERSION = 2
+DUPLICATE = "Duplicate code block (lines {}-{}) also found in: {} (lines {}-{})."
+
+# Rabin-Karp polynomial hashing over per-line hashes, modulo the Mersenne prime 2**61 - 1.
+_MOD = (1 << 61) - 1
+_BASE = 1_000_003
+
+def _line_hash(line):
+    return int.from_bytes(hashlib.blake2b(line.encode('utf-8'), digest_size=8).digest(), 'big') % _MOD
+
+def _settings(thresholds):
+    """
+    The `duplicate_code` thresholds. `mode` is 'lines' (exact copies of `min_lines`
+    non-blank lines) or 'tokens' (Type-2 clones: copies up to renamed identifiers and
+    changed literals, found through winnowed fingerprints of `noise_tokens`-grams and
+    guaranteed for copies of at least `min_tokens` tokens).
+    """
+    settings = thresholds.get('duplicate_code', {})
+    return (settings.get('mode', 'lines'), settings.get('min_lines', 8),
+            settings.get('noise_tokens', 12), settings.get('min_tokens', 50))
+
+def collect(source, thresholds):
+    mode, min_lines, noise_tokens, min_tokens = _settings(thresholds)
+    if mode == 'tokens':
+        return _collect_fingerprints(source, noise_tokens, _winnow_window(noise_tokens, min_tokens))
+    return _collect_windows(source, min_lines)
+
+def _winnow_window(k, min_tokens):
+    """
+    The winnowing window `w`: each run of `w` consecutive k-grams holds a fingerprint.
+    A copy of `min_tokens` tokens then shares a chain of fingerprints, at most `w` apart,
+    spanning at least `min_tokens - 2 * w + 2` tokens (see `FingerprintIndex`).
+    """
+    return max(1, (min_tokens - k + 1) // 4)
+
+def _collect_windows(source, min_lines):
+    """
+    Returns the line numbers of the file's non-blank lines ('lines') and the rolling
+    hash of every window of `min_lines` consecutive non-blank lines ('windows').
+    Window `i` spans `lines[i]` to `lines[i + min_lines - 1]`.
+    """
+    lines, line_hashes = [], []
+    for lineno, line in enumerate(source.stripped_lines, 1):
+        if line:
+            lines.append(lineno)
+            line_hashes.append(_line_hash(line))
+    if len(lines) < min_lines:
+        return {'lines': [], 'windows': []}
+
+    windows, window_hash = [], 0
+    high = pow(_BASE, min_lines - 1, _MOD)
+    for i, line_hash in enumerate(line_hashes):
+        if i >= min_lines:
+            window_hash = (window_hash - line_hashes[i - min_lines] * high) % _MOD
+        window_hash = (window_hash * _BASE + line_hash) % _MOD
+        if i >= min_lines - 1:
+            windows.append(window_hash)
+    return {'lines': lines, 'windows': windows}
+
+_token_hashes = {}
+
+def _token_hash(token):
+    # Normalized tokens come from a small vocabulary (keywords, operators, ID, NUM, STR), so hash each once.
+    value = _token_hashes.get(token)
+    if value is None:
+        value = _token_hashes[token] = _line_hash(token)
+    return value
+
+def _normalized_tokens(text):
+    """
+    Yields `(token, start_line, end_line)` with every identifier replaced by 'ID', every
+    number by 'NUM' and every string (f-strings included) by 'STR'. Comments and blank
+    lines are dropped. Stops quietly at a tokenize error, keeping the tokens read so far.
+    """
+    fstrings = 0
+    try:
+        for tok in tokenize.generate_tokens(io.StringIO(text).readline):
+            kind = tokenize.tok_name[tok.type]
+            if kind == 'FSTRING_START':
+                if not fstrings:
+                    yield 'STR', tok.start[0], tok.end[0]
+                fstrings += 1
+            elif kind == 'FSTRING_END':
+                fstrings -= 1
+            elif fstrings or kind in ('COMMENT', 'NL', 'ENCODING', 'ENDMARKER'):
                 continue
-            for i in range(len(lines) - min_lines + 1):
-                block = "".join(lines[i:i + min_lines])
-                block_hash = hashlib.md5(block.encode('utf-8')).hexdigest()
-                hashes[block_hash].append(file_path)
-        except Exception:
+            elif kind == 'NAME':
+                yield tok.string if keyword.iskeyword(tok.string) else 'ID', tok.start[0], tok.end[0]
+            elif kind == 'NUMBER':
+                yield 'NUM', tok.start[0], tok.end[0]
+            elif kind == 'STRING':
+                yield 'STR', tok.start[0], tok.end[0]
+            else:
+                yield tok.string or kind, tok.start[0], tok.end[0]
+    except (tokenize.TokenError, SyntaxError):
+        return
+
+def _collect_fingerprints(source, k, w):
+    """
+    Winnows the hashes of every `k`-gram of normalized tokens (Schleimer, Wilkerson and
+    Aiken): of each `w` consecutive k-gram hashes, the rightmost minimum is kept, so any
+    shared run of `w + k - 1` tokens shares at least one fingerprint. Returns the kept
+    hashes ('windows'), each one's token position ('positions') and the first and last
+    line its k-gram covers ('lines', 'ends').
+    """
+    tokens = list(_normalized_tokens(source.text))
+    part = {'windows': [], 'positions': [], 'lines': [], 'ends': []}
+    if len(tokens) < k:
+        return part
+    token_hashes = [_token_hash(token) for token, _, _ in tokens]
+    high = pow(_BASE, k - 1, _MOD)
+    gram_hash, candidates, last = 0, deque(), None
+    for i, token_hash in enumerate(token_hashes):
+        if i >= k:
+            gram_hash = (gram_hash - token_hashes[i - k] * high) % _MOD
+        gram_hash = (gram_hash * _BASE + token_hash) % _MOD
+        gram = i - k + 1
+        if gram < 0:
+            continue
+        # `candidates` holds k-grams of the current window with increasing hashes.
+        while candidates and candidates[-1][1] >= gram_hash:
+            candidates.pop()
+        candidates.append((gram, gram_hash))
+        if candidates[0][0] <= gram - w:
+            candidates.popleft()
+        if gram >= w - 1 or i == len(tokens) - 1:
+            position, fingerprint = candidates[0]
+            if position != last:
+                last = position
+                part['windows'].append(fingerprint)
+                part['positions'].append(position)
+                part['lines'].append(tokens[position][1])
+                part['ends'].append(tokens[position + k - 1][2])
+    return part
+
+def make_index(thresholds):
+    """An empty index for the configured mode, to `add` files' `collect` output to."""
+    mode, min_lines, noise_tokens, min_tokens = _settings(thresholds)
+    if mode == 'tokens':
+        return FingerprintIndex(noise_tokens, min_tokens)
+    return WindowIndex(min_lines)
+
+class WindowIndex:
+    """
+    Maps each window hash to its occurrences, packed as `file_id << 32 | window`.
+    A hash seen once maps to a bare int; only repeated hashes pay for a list.
+    Files can be added and removed in place, so a long-lived index never needs a rebuild.
+    """
+
+    def __init__(self, min_lines=8):
+        self.min_lines = min_lines
+        self._index = {}
+        self._spilled = None
+        self._spilled_lines = None
+        self._ids = {}
+        self.paths = []
+        self.parts = []
+        # Once `issues` ran in memory: the matches bucketed per file pair, each pair's
+        # issues, and the pairs whose matches changed since.
+        self._pairs = None
+        self._pair_issues = {}
+        self._stale = set()
+
+    def add(self, path, part):
+        """Indexes a file's `collect` output, replacing what was indexed for it before."""
+        self.remove(path)
+        file_id = self._ids.get(path)
+        if file_id is None:
+            file_id = self._ids[path] = len(self.paths)
+            self.paths.append(path)
+            self.parts.append(None)
+        self.parts[file_id] = part
+        touched = self._unmatch(part['windows'])
+        index = self._index
+        for window, window_hash in enumerate(part['windows']):
+            occurrence = file_id << 32 | window
+            found = index.get(window_hash)
+            if found is None:
+                index[window_hash] = occurrence
+            elif isinstance(found, list):
+                found.append(occurrence)
+            else:
+                index[window_hash] = [found, occurrence]
+        self._match(touched)
+
+    def remove(self, path):
+        file_id = self._ids.get(path)
+        if file_id is None or self.parts[file_id] is None:
+            return
+        touched = self._unmatch(self.parts[file_id]['windows'])
+        index = self._index
+        for window, window_hash in enumerate(self.parts[file_id]['windows']):
+            occurrence = file_id << 32 | window
+            found = index[window_hash]
+            if not isinstance(found, list):
+                del index[window_hash]
+                continue
+            found.remove(occurrence)
+            if len(found) == 1:
+                index[window_hash] = found[0]
+        self.parts[file_id] = None
+        self._match(touched)
+
+    def _unmatch(self, hashes):
+        """
+        Drops the matches of the groups of `hashes` from the per-pair buckets before the
+        index changes, and returns the hashes for `_match` to bucket again afterwards.
+        Which file a copy is matched against depends on every file of its group, so the
+        file pairs this marks stale are not only those of the changed file.
+        """
+        if self._pairs is None:
+            return ()
+        hashes = set(hashes)
+        self._rematch(hashes, discard=True)
+        return hashes
+
+    def _match(self, hashes):
+        if hashes:
+            self._rematch(hashes, discard=False)
+
+    def _rematch(self, hashes, discard):
+        index, pairs = self._index, self._pairs
+        groups = (index[h] for h in hashes if isinstance(index.get(h), list))
+        # Paths sort files the way `_groups` ranks them.
+        for key, matches in self._matches(groups, self.paths).items():
+            self._stale.add(key[:2])
+            if discard:
+                pairs[key[:2]][key].difference_update(matches)
+            else:
+                pairs[key[:2]][key].update(matches)
+
+    def load_spilled(self, records):
+        """
+        Indexes `SpilledRecords`: parts stay in memory without their hashes and line
+        tables, which `spill` moved to sorted runs on disk. `issues` merges the hashes
+        back in hash order, and looks up the lines of the clones it found in one pass.
+        """
+        spill = records.spill
+        self.paths = spill.paths
+        self.parts = [records[path].get(NAME) for path in spill.paths]
+        self._spilled = spill.run(NAME)
+        self._spilled_lines = spill.run(NAME + '.lines')
+
+    def _lines(self, wanted):
+        """
+        Maps each `(file_id, i)` in `wanted` to the first and last line of that file's
+        window or fingerprint `i` (`lines[i]` and, in tokens mode, `ends[i]`).
+        """
+        found = {}
+        if self._spilled_lines is not None:
+            chunks = {(file_id, i - i % _LINE_CHUNK) for file_id, i in wanted}
+            for file_id, start, lines, ends in self._spilled_lines:
+                if (file_id, start) in chunks:
+                    for offset, line in enumerate(lines):
+                        if (file_id, start + offset) in wanted:
+                            found[(file_id, start + offset)] = line, (ends or lines)[offset]
+            return found
+        for file_id, i in wanted:
+            part = self.parts[file_id]
+            found[(file_id, i)] = part['lines'][i], part.get('ends', part['lines'])[i]
+        return found
+
+    def _groups(self):
+        """The occurrence lists of hashes seen more than once, and each file's rank by path."""
+        if self._spilled is not None:
+            groups = (occurrences for occurrences in _spilled_groups(self._spilled) if len(occurrences) > 1)
+        else:
+            groups = (occurrences for occurrences in self._index.values() if isinstance(occurrences, list))
+        # Rank files by path so the result does not depend on the order files were added in.
+        rank = {file_id: i for i, file_id in enumerate(sorted(range(len(self.paths)), key=self.paths.__getitem__))}
+        return groups, rank
+
+    def issues(self):
+        """
+        Reports every clone region between two indexed files. In memory, each file pair's
+        issues are kept, and later calls rebuild only the pairs `add` and `remove` touched.
+        """
+        groups, rank = self._groups()
+        if self._spilled is not None:
+            found = self._issues(self._matches(groups, rank))
+        else:
+            if self._pairs is None:
+                self._pairs = defaultdict(lambda: defaultdict(set))
+                for key, matches in self._matches(groups, rank).items():
+                    self._pairs[key[:2]][key].update(matches)
+                self._stale.update(self._pairs)
+            for pair in self._stale:
+                buckets = {key: list(matches) for key, matches in self._pairs[pair].items() if matches}
+                if buckets:
+                    self._pair_issues[pair] = self._issues(buckets)
+                else:
+                    self._pairs.pop(pair, None)
+                    self._pair_issues.pop(pair, None)
+            self._stale.clear()
+            found = [entry for entries in self._pair_issues.values() for entry in entries]
+        found.sort(key=lambda r: (rank[r[0]], r[1], rank[r[2]], r[3]))
+        return [issue for _, _, _, _, issue in found]
+
+    def _matches(self, groups, rank):
+        return _matching_windows(groups, rank)
+
+    def _issues(self, diagonals):
+        """The `(file_a, first_a, file_b, first_b, issue)` of the clone regions of `diagonals`."""
+        min_lines = self.min_lines
+        # Window `i` spans `lines[i]` to `lines[i + min_lines - 1]`.
+        spans = [(file_a, first_a, last_a + min_lines - 1, file_b, first_b, first_b + last_a - first_a + min_lines - 1)
+                 for file_a, first_a, last_a, file_b, first_b in _clone_regions(diagonals)]
+        lines = self._lines(_endpoints(spans))
+        found = []
+        for file_a, first_a, last_a, file_b, first_b, last_b in spans:
+            start_a, end_a = lines[(file_a, first_a)][0], lines[(file_a, last_a)][0]
+            args = (start_a, end_a, self.paths[file_b], lines[(file_b, first_b)][0], lines[(file_b, last_b)][0])
+            issue = Issue(NAME, Severity.MEDIUM, self.paths[file_a], DUPLICATE, args, start_a, end_a - start_a + 1)
+            found.append((file_a, first_a, file_b, first_b, issue))
+        return found
+
+class FingerprintIndex(WindowIndex):
+    """
+    A `WindowIndex` of winnowed token fingerprints. Matching fingerprints are bucketed
+    by file pair and token offset, and fingerprints of one bucket at most `w` k-grams
+    apart are chained into one clone region. Within a copy of `L` tokens the first and
+    last full windows pick fingerprints at most `w - 1` k-grams from either end, so its
+    chain spans at least `L - 2 * w + 2` tokens. A region is reported once its chain
+    spans that much for `L = min_tokens`; shorter chance matches are dropped.
+    """
+
+    def __init__(self, k=12, min_tokens=50):
+        super().__init__()
+        self.k = k
+        self.w = _winnow_window(k, min_tokens)
+        self.min_extent = min_tokens - 2 * self.w + 2
+
+    def _matches(self, groups, rank):
+        return _matching_fingerprints(groups, rank, self.parts)
+
+    def _issues(self, buckets):
+        regions = []
+        for (file_a, file_b, _), matches in buckets.items():
+            matches.sort()
+            positions = self.parts[file_a]['positions']
+            chain = [matches[0]]
+            for match in matches[1:] + [None]:
+                if match is not None and positions[match[0]] - positions[chain[-1][0]] <= self.w:
+                    chain.append(match)
+                    continue
+                if positions[chain[-1][0]] - positions[chain[0][0]] + self.k >= self.min_extent:
+                    regions.append((file_a, chain[0][0], chain[-1][0], file_b, chain[0][1], chain[-1][1]))
+                chain = [match]
+        lines = self._lines(_endpoints(regions))
+        found = []
+        for file_a, first_a, last_a, file_b, first_b, last_b in regions:
+            start_a, end_a = lines[(file_a, first_a)][0], lines[(file_a, last_a)][1]
+            args = (start_a, end_a, self.paths[file_b], lines[(file_b, first_b)][0], lines[(file_b, last_b)][1])
+            issue = Issue(NAME, Severity.MEDIUM, self.paths[file_a], DUPLICATE, args, start_a, end_a - start_a + 1)
+            found.append((file_a, first_a, file_b, first_b, issue))
+        return found
+
+def _endpoints(spans):
+    """The `(file_id, i)` of the first and last window on both sides of `(file_a, first_a, last_a, file_b, first_b, last_b)` spans."""
+    wanted = set()
+    for file_a, first_a, last_a, file_b, first_b, last_b in spans:
+        wanted.update(((file_a, first_a), (file_a, last_a), (file_b, first_b), (file_b, last_b)))
+    return wanted
+
+# Fingerprint groups with at most this many cross-file pairs are matched pairwise.
+_PAIRWISE_MATCHES = 64
+
+def _matching_fingerprints(groups, rank, parts):
+    """
+    Like `_matching_windows`, for fingerprints: matches `(fingerprint_a, fingerprint_b)`
+    are bucketed by file pair and by the offset between their token positions. Short
+    token sequences repeat within a file far more often than lines do, so small groups
+    are matched pairwise rather than in order.
+    """
+    buckets = defaultdict(list)
+    for occurrences in groups:
+        by_file = defaultdict(list)
+        for occurrence in sorted(occurrences):
+            by_file[occurrence >> 32].append(occurrence & 0xFFFFFFFF)
+        if len(by_file) < 2:
             continue
-            
-    # Phase 2: Find hashes that appear in more than one unique file
-    reported_hashes = set()
-    for block_hash, locations in hashes.items():
-        unique_files = sorted(list(set(locations)))
-        if len(unique_files) > 1 and block_hash not in reported_hashes:
-            issues.append({
-                'file': unique_files[0],
-                'severity': 'MEDIUM',
-                'message': f"Duplicated code block also found in: {', '.join(unique_files[1:])}"
-            })
-            reported_hashes.add(block_hash)
-    return issues
\ No newline at end of file
+        file_a, *others = sorted(by_file, key=rank.__getitem__)
+        canonical, positions_a = by_file[file_a], parts[file_a]['positions']
+        for file_b in others:
+            positions_b = parts[file_b]['positions']
+            pairwise = len(canonical) * len(by_file[file_b]) <= _PAIRWISE_MATCHES
+            for i, fingerprint_b in enumerate(by_file[file_b]):
+                for fingerprint_a in canonical if pairwise else [canonical[min(i, len(canonical) - 1)]]:
+                    buckets[(file_a, file_b, positions_a[fingerprint_a] - positions_b[fingerprint_b])].append((fingerprint_a, fingerprint_b))
+    return buckets
+
+def _spilled_groups(run):
+    """Groups the sorted `(hash, file_id, window)` tuples of a spilled run into packed occurrence lists."""
+    current, occurrences = None, []
+    for window_hash, file_id, window in run:
+        if window_hash != current:
+            if occurrences:
+                yield occurrences
+            current, occurrences = window_hash, []
+        occurrences.append(file_id << 32 | window)
+    if occurrences:
+        yield occurrences
+
+def _matching_windows(groups, rank):
+    """
+    Turns groups of occurrences sharing a hash into cross-file window matches,
+    bucketed by file pair and diagonal (the offset between the two windows).
+    Every copy is matched against the copy in the lowest-ranked file only, so a block
+    found in N files costs N - 1 matches instead of N * (N - 1) / 2. Repeats within
+    a file are matched in order (the i-th repeat against the i-th canonical one).
+    """
+    diagonals = defaultdict(list)
+    for occurrences in groups:
+        by_file = defaultdict(list)
+        for occurrence in sorted(occurrences):
+            by_file[occurrence >> 32].append(occurrence & 0xFFFFFFFF)
+        if len(by_file) < 2:
+            continue
+        file_a, *others = sorted(by_file, key=rank.__getitem__)
+        canonical = by_file[file_a]
+        for file_b in others:
+            for i, window_b in enumerate(by_file[file_b]):
+                window_a = canonical[min(i, len(canonical) - 1)]
+                diagonals[(file_a, file_b, window_a - window_b)].append(window_a)
+    return diagonals
+
+def _clone_regions(diagonals):
+    """
+    Collapses runs of consecutive matching windows on a diagonal into maximal clone regions
+    `(file_a, first_window_a, last_window_a, file_b, first_window_b)`, dropping regions that
+    are contained in a larger region between the same two files.
+    """
+    by_pair = defaultdict(list)
+    for (file_a, file_b, offset), windows in diagonals.items():
+        windows.sort()
+        start = previous = windows[0]
+        for window in windows[1:] + [None]:
+            if window == previous + 1:
+                previous = window
+                continue
+            by_pair[(file_a, file_b)].append((start, previous, start - offset))
+            if window is not None:
+                start = previous = window
+
+    regions = []
+    for (file_a, file_b), spans in by_pair.items():
+        spans.sort(key=lambda s: (s[0] - s[1], s[0], s[2]))
+        kept = []
+        for first_a, last_a, first_b in spans:
+            last_b = first_b + last_a - first_a
+            if not any(k[0] <= first_a and last_a <= k[1] and k[2] <= first_b and last_b <= k[3] for k in kept):
+                kept.append((first_a, last_a, first_b, last_b))
+        regions.extend((file_a, first_a, last_a, file_b, first_b) for first_a, last_a, first_b, _ in kept)
+    return sorted(regions)
+
+# Line numbers per spilled row of a line table.
+_LINE_CHUNK = 64
+
+def spill(part, file_id, store):
+    """
+    For `--max-memory`: moves the part's hashes into a sorted run as `(hash, file_id, window)`
+    and its line table into one as `(file_id, start, lines, ends)` chunks of `_LINE_CHUNK`
+    entries (`ends` is None in line mode). Only the hash count and, in tokens mode, the token
+    positions the matching needs stay in the record.
+    """
+    run = store.run(NAME)
+    for window, window_hash in enumerate(part['windows']):
+        run.add((window_hash, file_id, window))
+    run, lines, ends = store.run(NAME + '.lines'), part['lines'], part.get('ends')
+    for start in range(0, len(lines), _LINE_CHUNK):
+        chunk = (file_id, start, lines[start:start + _LINE_CHUNK], ends and ends[start:start + _LINE_CHUNK])
+        # A line number costs about a quarter of a hash tuple.
+        run.add(chunk, 1 + len(chunk[2]) * (2 if ends else 1) // 4)
+    kept = {'windows': len(part['windows'])}
+    if 'positions' in part:
+        kept['positions'] = part['positions']
+    return kept
+
+def reduce(project_path, thresholds, records):
+    index = make_index(thresholds)
+    if hasattr(records, 'spill'):
+        index.load_spilled(records)
+        return index.issues()
+    for path, record in records.items():
+        if record.get(NAME, {}).get('windows'):
+            index.add(path, record[NAME])
+    return index.issues()
+
+def analyze(project_path, thresholds, python_files, corpus=None):
+    """Finds blocks of duplicated code across different files."""
+    return reduce(project_path, thresholds, collect_records({NAME: collect}, python_files, thresholds, corpus))
@@ -1,29 +1,29 @@
 # projectdoctor/detectors/file_size.py
+from ..issue import Issue, Severity
+from . import collect_records
 
-def analyze(project_path, thresholds, python_files):
+NAME = 'file_size'
+VERSION = 1
+PER_FILE = True
+UNREADABLE = "Could not read or parse file: {}"
+TOO_LONG = "File exceeds {} lines (has {} lines)."
+
+def reduce(project_path, thresholds, records):
+    """Builds file_size issues from the line counts already stored in each record."""
+    max_lines = thresholds.get('file_size', {}).get('max_lines', 800)
+    issues = []
+    for file_path, record in records.items():
+        if 'error' in record:
+            # If a file can't be read, we can report it as a low-level warning.
+            issues.append(Issue(NAME, Severity.LOW, file_path, UNREADABLE, (record['error'],)))
+        elif record.get('loc', 0) > max_lines:
+            issues.append(Issue(NAME, Severity.LOW, file_path, TOO_LONG, (max_lines, record['loc']), value=record['loc']))
+    return issues
+
+def analyze(project_path, thresholds, python_files, corpus=None):
     """
     ADVANCED DETECTOR: file_size
     Purpose: Detects files that exceed a recommended line count.
     Improvement: More resilient to file reading errors.
     """
-    max_lines = thresholds.get('file_size', {}).get('max_lines', 800)
-    issues = []
-    for file_path in python_files:
-        try:
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                line_count = sum(1 for _ in f)
-                if line_count > max_lines:
-                    issues.append({
-                        'file': file_path,
-                        'severity': 'LOW',
-                        'message': f"File exceeds {max_lines} lines (has {line_count} lines)."
-                    })
-        except IOError as e:
-            # If a file can't be read, we can report it as a low-level warning.
-            issues.append({
-                'file': file_path,
-                'severity': 'LOW',
-                'message': f"Could not read or parse file: {e}"
-            })
-            continue
-    return issues
\ No newline at end of file
+    return reduce(project_path, thresholds, collect_records({}, python_files, thresholds, corpus))
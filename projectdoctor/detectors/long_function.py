@@ -1,27 +1,41 @@
 # projectdoctor/detectors/long_function.py
-import ast
+from ..issue import Issue, Severity
+from ..visitor import Plugin, PluginCollect
+from . import collect_records
 
-def analyze(project_path, thresholds, python_files):
-    """Identifies functions that are too long using Python's AST."""
-    max_lines = thresholds.get('long_function', {}).get('max_lines', 50)
+NAME = 'long_function'
+VERSION = 1
+PER_FILE = True
+TOO_LONG = "Function '{}' on line {} is too long ({} lines)."
+
+class LongFunctionPlugin(Plugin):
+    """Records `[name, start_line, length]` for every function that is too long."""
+    NAME = NAME
+
+    def begin(self, source, thresholds):
+        self.max_lines = thresholds.get('long_function', {}).get('max_lines', 50)
+        self.found = []
+
+    def enter_FunctionDef(self, node):
+        start_line = node.lineno
+        end_line = node.end_lineno
+        if end_line and start_line:
+            length = end_line - start_line + 1
+            if length > self.max_lines:
+                self.found.append([node.name, start_line, length])
+
+    def result(self):
+        return self.found
+
+collect = PluginCollect(LongFunctionPlugin)
+
+def reduce(project_path, thresholds, records):
     issues = []
-    for file_path in python_files:
-        try:
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                content = f.read()
-            tree = ast.parse(content)
-            for node in ast.walk(tree):
-                if isinstance(node, ast.FunctionDef):
-                    start_line = node.lineno
-                    end_line = node.end_lineno
-                    if end_line and start_line:
-                        length = end_line - start_line + 1
-                        if length > max_lines:
-                            issues.append({
-                                'file': file_path,
-                                'severity': 'MEDIUM',
-                                'message': f"Function '{node.name}' on line {start_line} is too long ({length} lines)."
-                            })
-        except Exception:
-            continue # Skip files that cannot be parsed
-    return issues
\ No newline at end of file
+    for file_path, record in records.items():
+        for name, start_line, length in record.get(NAME, ()):
+            issues.append(Issue(NAME, Severity.MEDIUM, file_path, TOO_LONG, (name, start_line, length), start_line, length))
+    return issues
+
+def analyze(project_path, thresholds, python_files, corpus=None):
+    """Identifies functions that are too long using Python's AST."""
+    return reduce(project_path, thresholds, collect_records({NAME: collect}, python_files, thresholds, corpus))
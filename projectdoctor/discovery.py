@@ -0,0 +1,167 @@
+# projectdoctor/discovery.py
+import os
+import re
+from .cache import CACHE_DIR_NAME
+from .changes import GitError, _git
+
+# Gitignore-style patterns that are never analyzed; a later `!pattern` exclude re-includes one.
+DEFAULT_EXCLUDES = (
+    'venv/', '.venv/', 'env/', '__pycache__/', 'node_modules/', '.git/', '.hg/', '.svn/',
+    '.tox/', '.nox/', '.eggs/', '*.egg-info/', 'build/', 'dist/', 'site-packages/',
+    '.mypy_cache/', '.pytest_cache/', CACHE_DIR_NAME + '/',
+)
+
+def _glob_to_regex(pattern):
+    """Translates a gitignore glob: `*` and `?` stay within a path segment, `**` spans segments."""
+    parts, i = [], 0
+    while i < len(pattern):
+        c = pattern[i]
+        if pattern.startswith('**/', i):
+            parts.append('(?:.*/)?')
+            i += 3
+            continue
+        if pattern.startswith('**', i):
+            parts.append('.*')
+            i += 2
+            continue
+        if c == '*':
+            parts.append('[^/]*')
+        elif c == '?':
+            parts.append('[^/]')
+        elif c == '[' and ']' in pattern[i + 1:]:
+            end = pattern.index(']', i + 1)
+            body = pattern[i + 1:end]
+            parts.append('[' + ('^' + body[1:] if body.startswith('!') else body) + ']')
+            i = end
+        elif c == '\\' and i + 1 < len(pattern):
+            i += 1
+            parts.append(re.escape(pattern[i]))
+        else:
+            parts.append(re.escape(c))
+        i += 1
+    return re.compile(''.join(parts))
+
+class Rule:
+    """One gitignore pattern, applying to paths below `base` (a project-relative dir ending in '/', or '')."""
+    __slots__ = ('regex', 'negate', 'dir_only', 'anchored', 'base')
+
+    def __init__(self, pattern, base=''):
+        self.negate = pattern.startswith('!')
+        if self.negate:
+            pattern = pattern[1:]
+        elif pattern.startswith('\\'):
+            pattern = pattern[1:]
+        self.dir_only = pattern.endswith('/')
+        pattern = pattern.rstrip('/')
+        # A slash anywhere but at the end anchors the pattern to its .gitignore's directory.
+        self.anchored = '/' in pattern
+        self.regex = _glob_to_regex(pattern.lstrip('/'))
+        self.base = base
+
+    def matches(self, rel, name, is_dir):
+        if self.dir_only and not is_dir:
+            return False
+        if self.anchored:
+            return rel.startswith(self.base) and self.regex.fullmatch(rel[len(self.base):]) is not None
+        return rel.startswith(self.base) and self.regex.fullmatch(name) is not None
+
+def parse_patterns(lines, base=''):
+    rules = []
+    for line in lines:
+        line = line.rstrip('\n').rstrip()
+        if line and not line.startswith('#'):
+            rules.append(Rule(line, base))
+    return rules
+
+def is_ignored(rules, rel, is_dir):
+    """Whether the project-relative path `rel` is ignored; as in git, the last matching rule wins."""
+    name = rel.rsplit('/', 1)[-1]
+    ignored = False
+    for rule in rules:
+        if rule.negate == ignored and rule.matches(rel, name, is_dir):
+            ignored = not rule.negate
+    return ignored
+
+def _read_gitignore(directory, base):
+    try:
+        with open(os.path.join(directory, '.gitignore'), 'r', encoding='utf-8', errors='ignore') as f:
+            return parse_patterns(f, base)
+    except OSError:
+        return []
+
+def walk_python_files(project_path, rules):
+    """
+    Lists the Python files with `os.scandir`, honouring every `.gitignore` on the way and
+    pruning ignored directories before they are entered. Files come in `os.walk` order:
+    a directory's files by name, then its subdirectories by name.
+    """
+    python_files = []
+    stack = [(project_path, '', rules)]
+    while stack:
+        directory, rel_dir, inherited = stack.pop()
+        rules = inherited + _read_gitignore(directory, rel_dir)
+        try:
+            with os.scandir(directory) as it:
+                entries = sorted(it, key=lambda entry: entry.name)
+        except OSError:
+            continue
+        subdirs = []
+        for entry in entries:
+            rel = rel_dir + entry.name
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+            except OSError:
+                continue
+            if is_dir:
+                if not is_ignored(rules, rel, True):
+                    subdirs.append((entry.path, rel + '/', rules))
+            elif entry.name.endswith('.py') and not is_ignored(rules, rel, False):
+                python_files.append(entry.path)
+        stack.extend(reversed(subdirs))
+    return python_files
+
+def _walk_order(rel):
+    parts = rel.split('/')
+    return [(1, part) for part in parts[:-1]] + [(0, parts[-1])]
+
+def git_python_files(project_path, rules):
+    """
+    Lists the tracked and untracked-but-not-ignored Python files below `project_path`
+    with `git ls-files`, filtered by `rules` and sorted like `walk_python_files`.
+    Raises `GitError` when the directory is not inside a git work tree.
+    """
+    listed = _git(project_path, 'ls-files', '-z', '--cached', '--others', '--exclude-standard', '--', '*.py').split('\0')
+    deleted = set(_git(project_path, 'ls-files', '-z', '--deleted', '--', '*.py').split('\0'))
+    dir_verdicts = {}
+
+    def dir_ignored(rel_dir):
+        if rel_dir not in dir_verdicts:
+            parent = rel_dir.rsplit('/', 1)[0] if '/' in rel_dir else None
+            dir_verdicts[rel_dir] = (parent is not None and dir_ignored(parent)) or is_ignored(rules, rel_dir, True)
+        return dir_verdicts[rel_dir]
+
+    kept = set()
+    for rel in listed:
+        if not rel or rel in deleted or not rel.endswith('.py'):
+            continue
+        if ('/' in rel and dir_ignored(rel.rsplit('/', 1)[0])) or is_ignored(rules, rel, False):
+            continue
+        kept.add(rel)
+    return [os.path.join(project_path, *rel.split('/')) for rel in sorted(kept, key=_walk_order)]
+
+def discover(project_path, excludes=(), use_git=True):
+    """
+    Returns the Python files of the project, skipping `DEFAULT_EXCLUDES`, `.gitignore`d
+    paths and the gitignore-style `excludes`. Inside a git work tree the list comes from
+    `git ls-files`; otherwise the tree is walked.
+    """
+    rules = parse_patterns(DEFAULT_EXCLUDES) + parse_patterns(excludes)
+    if use_git:
+        try:
+            python_files = git_python_files(project_path, rules)
+        except GitError:
+            python_files = None
+        # An empty listing may mean the project sits in a directory the enclosing repository ignores.
+        if python_files:
+            return python_files
+    return walk_python_files(project_path, rules)
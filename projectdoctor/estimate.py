@@ -0,0 +1,108 @@
+# projectdoctor/estimate.py
+import math
+import os
+import random
+import statistics
+from collections import Counter, defaultdict
+from .score import SEVERITY_WEIGHTS, score_from_ratio
+
+# Upper bounds, in bytes, of the size classes files are stratified by (the last class is open-ended).
+SIZE_CLASSES = (2048, 16384)
+
+# Each round samples this many times as many files as the previous one.
+GROWTH = 1.5
+
+def _stratum(file_path):
+    """The size class of a file; only stats it."""
+    try:
+        size = os.stat(file_path).st_size
+    except OSError:
+        size = 0
+    return sum(size >= bound for bound in SIZE_CLASSES)
+
+def _ratio_estimate(strata, project_penalty, z):
+    """
+    Separate-stratum ratio estimate of penalty points per line: `(Y + project_penalty) / X`
+    with `Y`, `X` the expanded per-file penalty and line totals. Returns
+    `(ratio, half_width, estimated_lines)`; the half-width is `z` standard errors.
+    """
+    total_penalty = total_lines = 0.0
+    for population, sample in strata:
+        total_penalty += population * statistics.fmean(penalty for penalty, _ in sample)
+        total_lines += population * statistics.fmean(lines for _, lines in sample)
+    if total_lines <= 0:
+        return 0.0, 0.0, 0.0
+    ratio = (total_penalty + project_penalty) / total_lines
+    variance = 0.0
+    for population, sample in strata:
+        n = len(sample)
+        if n < population and n > 1:
+            residuals = [penalty - ratio * lines for penalty, lines in sample]
+            variance += population ** 2 * (1 - n / population) * statistics.variance(residuals) / n
+    return ratio, z * math.sqrt(variance) / total_lines, total_lines
+
+def estimate_score(analyzer, tolerance=2.0, confidence=0.95, seed=0):
+    """
+    Estimates the maintainability score from a random sample of the analyzer's files,
+    stratified by size class. Detectors marked `PER_FILE` run on the sample and their
+    penalty per line is extrapolated with a ratio estimator; detectors without a per-file step (such as `structure`) run exactly. Cross-file
+    detectors (duplicates, import cycles, dead code) cannot be extrapolated from a
+    sample and are left out. The sample grows by `GROWTH` per round until the
+    `confidence` interval of the score is at most `tolerance` points either side.
+    """
+    rng = random.Random(seed)
+    z = statistics.NormalDist().inv_cdf(0.5 + confidence / 2)
+    per_file = [d for d in analyzer.detectors if getattr(d, 'PER_FILE', False)]
+    project_wide = [d for d in analyzer.detectors if not hasattr(d, 'collect')]
+    skipped = [d.NAME for d in analyzer.detectors if d not in per_file and d not in project_wide]
+
+    project_counts = Counter()
+    for detector in project_wide:
+        project_counts.update(issue.severity.name for issue in analyzer.reduce(detector, {}))
+    project_penalty = sum(SEVERITY_WEIGHTS[severity] * count for severity, count in project_counts.items())
+
+    strata = defaultdict(list)
+    for file_path in analyzer.python_files:
+        strata[_stratum(file_path)].append(file_path)
+    for files in strata.values():
+        rng.shuffle(files)
+    total_files = len(analyzer.python_files)
+
+    measured, counts = {}, Counter()
+    target = min(total_files, max(2 * len(strata), 30))
+    while True:
+        # Proportional allocation with at least two files per stratum, so each has a variance.
+        wanted = []
+        for files in strata.values():
+            share = max(2, math.ceil(target * len(files) / total_files)) if total_files else 0
+            wanted.extend(path for path in files[:share] if path not in measured)
+        records = analyzer.collect(per_file, wanted)
+        penalties = Counter()
+        for detector in per_file:
+            for issue in analyzer.reduce(detector, records):
+                penalties[issue.file] += SEVERITY_WEIGHTS[issue.severity.name]
+                counts[issue.severity.name] += 1
+        for path, record in records.items():
+            measured[path] = (penalties[path], record.get('loc', 0))
+
+        sample = [(len(files), [measured[path] for path in files if path in measured]) for files in strata.values()]
+        ratio, half_width, lines = _ratio_estimate([(n, s) for n, s in sample if s], project_penalty, z)
+        score = score_from_ratio(ratio)
+        low, high = score_from_ratio(ratio + half_width), score_from_ratio(ratio - half_width)
+        if len(measured) >= total_files or (high - low) / 2 <= tolerance:
+            break
+        target = min(total_files, math.ceil(max(target, len(measured)) * GROWTH))
+
+    scale = total_files / len(measured) if measured else 0
+    return {
+        "score": int(score),
+        "interval": [int(low), int(high)],
+        "confidence": confidence,
+        "sampled_files": len(measured),
+        "total_files": total_files,
+        "estimated_loc": round(lines),
+        # Sampled issue counts scaled to the whole project, plus the exact project-wide ones.
+        "estimated_severity_counts": {severity: round(counts[severity] * scale) + project_counts[severity]
+                                      for severity in SEVERITY_WEIGHTS},
+        "skipped_detectors": skipped,
+    }
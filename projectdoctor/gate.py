@@ -0,0 +1,39 @@
+# projectdoctor/gate.py
+from .score import SEVERITY_WEIGHTS, score_from_counts
+
+def parse_max_issues(specs):
+    """Parses `SEVERITY=N` limits, e.g. `['HIGH=0', 'medium=10']`, into `{'HIGH': 0, 'MEDIUM': 10}`. Raises `ValueError`."""
+    limits = {}
+    for spec in specs:
+        severity, _, count = spec.partition('=')
+        severity = severity.strip().upper()
+        if severity not in SEVERITY_WEIGHTS or not count.strip().isdigit():
+            raise ValueError(f"Invalid issue limit '{spec}'. Expected SEVERITY=N with SEVERITY one of {', '.join(SEVERITY_WEIGHTS)}.")
+        limits[severity] = int(count)
+    return limits
+
+class Gate:
+    """
+    Pass/fail criteria for CI: a minimum score (`fail_under`) and the most issues allowed
+    per severity (`max_issues`). Issues only ever add to the counts and lower the score,
+    so once the issues found so far fail the gate, the rest of the run cannot pass it.
+    """
+
+    def __init__(self, fail_under=None, max_issues=None):
+        self.fail_under = fail_under
+        self.max_issues = max_issues or {}
+
+    def __bool__(self):
+        return self.fail_under is not None or bool(self.max_issues)
+
+    def failures(self, severity_counts, total_loc):
+        """Why the counts so far fail the gate, as messages; empty while it can still pass."""
+        failures = []
+        if self.fail_under is not None:
+            score = score_from_counts(severity_counts, total_loc)
+            if score < self.fail_under:
+                failures.append(f"a score of at most {score}, below the minimum of {self.fail_under}")
+        for severity, limit in self.max_issues.items():
+            if severity_counts.get(severity, 0) > limit:
+                failures.append(f"at least {severity_counts[severity]} {severity} issues, more than the {limit} allowed")
+        return failures
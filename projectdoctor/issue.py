@@ -0,0 +1,120 @@
+# projectdoctor/issue.py
+import enum
+import heapq
+from operator import attrgetter
+
+class Severity(enum.IntEnum):
+    """Issue severities; the value is the report order."""
+    HIGH = 0
+    MEDIUM = 1
+    LOW = 2
+
+    @classmethod
+    def parse(cls, name):
+        """The severity called `name` in any case; names it does not know (e.g. 'INFO') count as LOW."""
+        return cls.__members__.get(str(name).upper(), cls.LOW)
+
+class Issue:
+    """
+    One finding. The message is only rendered when asked for: `template` is a format
+    string shared by every issue of its kind and `args` fills it in. `line` and `value`
+    (the metric, such as a function's length) are plain fields, and `extra` holds any
+    detector-specific ones. Issues also read like the dicts detectors used to return:
+    `issue['severity']`, `issue['message']`, `issue.get('line')`.
+    """
+    __slots__ = ('detector', 'severity', 'file', 'line', 'value', 'template', 'args', 'extra', 'key')
+
+    def __init__(self, detector, severity, file, template, args=(), line=None, value=None, extra=None):
+        self.detector = detector
+        self.severity = severity
+        self.file = file
+        self.line = line
+        self.value = value
+        self.template = template
+        self.args = args
+        self.extra = extra
+        self.key = None
+
+    @classmethod
+    def from_dict(cls, data, detector=None):
+        """Wraps an issue dict, e.g. from a third-party detector or a partial results file."""
+        data = dict(data)
+        severity = Severity.parse(data.pop('severity'))
+        file, message = data.pop('file', None), data.pop('message')
+        detector = data.pop('detector', detector)
+        line, value = data.pop('line', None), data.pop('value', None)
+        return cls(detector, severity, file, message, (), line, value, data or None)
+
+    @property
+    def message(self):
+        return self.template.format(*self.args) if self.args else self.template
+
+    def to_dict(self):
+        data = {} if self.file is None else {'file': self.file}
+        data['severity'] = self.severity.name
+        data['message'] = self.message
+        if self.detector is not None:
+            data['detector'] = self.detector
+        if self.line is not None:
+            data['line'] = self.line
+        if self.value is not None:
+            data['value'] = self.value
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def __getitem__(self, name):
+        if name == 'severity':
+            return self.severity.name
+        if name == 'message':
+            return self.message
+        if name in ('file', 'detector', 'line', 'value'):
+            value = getattr(self, name)
+            if value is not None:
+                return value
+        elif self.extra and name in self.extra:
+            return self.extra[name]
+        raise KeyError(name)
+
+    def get(self, name, default=None):
+        try:
+            return self[name]
+        except KeyError:
+            return default
+
+    def __eq__(self, other):
+        if isinstance(other, (Issue, dict)):
+            return self.to_dict() == as_dict(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"Issue({self.to_dict()!r})"
+
+def as_issue(issue, detector=None):
+    return issue if isinstance(issue, Issue) else Issue.from_dict(issue, detector)
+
+def as_dict(issue):
+    return issue.to_dict() if isinstance(issue, Issue) else issue
+
+sort_key = attrgetter('key')
+
+def assign_keys(issue_lists):
+    """
+    Gives every issue its integer report-order key: severity first, then file path.
+    File paths are ranked once for all issues, so sorting compares plain ints.
+    """
+    files = sorted({str(issue.file) for issues in issue_lists for issue in issues})
+    rank = {file: index for index, file in enumerate(files)}
+    stride = len(files) + 1
+    for issues in issue_lists:
+        for issue in issues:
+            issue.key = issue.severity * stride + rank[str(issue.file)]
+    return issue_lists
+
+def merge_issues(issue_lists):
+    """Sorts each detector's issues by severity, then file, and k-way merges them lazily in that order."""
+    for issues in assign_keys(issue_lists):
+        issues.sort(key=sort_key)
+    return heapq.merge(*issue_lists, key=sort_key)
@@ -0,0 +1,125 @@
+# projectdoctor/partial.py
+import gzip
+import hashlib
+import json
+import os
+from collections import Counter
+from .budget import quarantined
+from .discovery import _walk_order
+from .detectors import load_detector
+from .issue import as_dict, as_issue, merge_issues
+
+PARTIAL_FORMAT = 1
+
+class PartialError(Exception):
+    """Raised when partial results cannot be read or do not add up to one analysis."""
+
+def shard_of(rel_path, count):
+    """The 1-based shard a project-relative path belongs to; stable across machines and runs."""
+    return int(hashlib.sha1(rel_path.encode('utf-8')).hexdigest()[:8], 16) % count + 1
+
+def parse_shard(value):
+    """Parses 'i/N' into `(i, N)`. Raises ValueError unless 1 <= i <= N."""
+    try:
+        index, count = (int(part) for part in value.split('/'))
+    except ValueError:
+        raise ValueError(f"Invalid shard '{value}', expected INDEX/COUNT such as 1/4.")
+    if not 1 <= index <= count:
+        raise ValueError(f"Invalid shard '{value}', INDEX must be between 1 and COUNT.")
+    return index, count
+
+def write_partial(analyzer, filename):
+    """
+    Collects the analyzer's files and writes them as gzipped JSON: each file's record
+    (line count, duplicate window hashes, raw imports, vulture name tables, ...) keyed by
+    its project-relative path. Detectors without a per-file step (such as `structure`)
+    look at the whole project, so the first shard runs them and stores their issues.
+    Returns the number of files written.
+    """
+    records = analyzer.collect()
+    shard = analyzer.shard or (1, 1)
+    project_issues = {}
+    if shard[0] == 1:
+        for detector in analyzer.detectors:
+            if not hasattr(detector, 'reduce'):
+                issues = detector.analyze(analyzer.project_path, analyzer.thresholds, analyzer.all_python_files, analyzer.corpus)
+                project_issues[detector.NAME] = [as_dict(issue) for issue in issues]
+    data = {
+        'format': PARTIAL_FORMAT,
+        'project_path': analyzer.project_path,
+        'thresholds': analyzer.thresholds,
+        'detectors': [detector.NAME for detector in analyzer.detectors],
+        'shard': list(shard),
+        'records': {analyzer.relative_path(path): record for path, record in records.items()},
+        'project_issues': project_issues,
+    }
+    with gzip.open(filename, 'wt', encoding='utf-8') as f:
+        json.dump(data, f)
+    return len(records)
+
+def _load(filename):
+    try:
+        with gzip.open(filename, 'rt', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        raise PartialError(f"Could not read partial results '{filename}': {e}")
+    if not isinstance(data, dict) or data.get('format') != PARTIAL_FORMAT:
+        raise PartialError(f"'{filename}' is not a partial results file of format {PARTIAL_FORMAT}.")
+    return data
+
+def _check(partials):
+    first_name, first = partials[0]
+    for name, data in partials[1:]:
+        for key in ('thresholds', 'detectors'):
+            if data[key] != first[key]:
+                raise PartialError(f"'{name}' was produced with different {key} than '{first_name}'.")
+    count = first['shard'][1]
+    indexes = Counter(data['shard'][0] for _, data in partials)
+    if any(data['shard'][1] != count for _, data in partials):
+        raise PartialError("Partial results come from different shard counts.")
+    duplicated = sorted(index for index, seen in indexes.items() if seen > 1)
+    missing = sorted(set(range(1, count + 1)) - set(indexes))
+    if duplicated or missing:
+        raise PartialError(f"Shards do not add up to {count}: "
+                           + "; ".join(filter(None, [duplicated and f"duplicated {duplicated}", missing and f"missing {missing}"])) + ".")
+
+def merge_partials(filenames, project_path=None):
+    """
+    Merges the partial results of every shard and runs the cross-file step of each
+    detector over them, exactly as a single-node run would. Returns results shaped
+    like `Analyzer.run`. File paths are rebuilt under `project_path`, by default the
+    path the first shard analyzed. Raises `PartialError`.
+    """
+    partials = [(filename, _load(filename)) for filename in filenames]
+    if not partials:
+        raise PartialError("No partial results given.")
+    partials.sort(key=lambda partial: partial[1]['shard'][0])
+    _check(partials)
+    first = partials[0][1]
+    project_path = project_path or first['project_path']
+    thresholds = first['thresholds']
+
+    merged = {}
+    for _, data in partials:
+        merged.update(data['records'])
+    records = {os.path.join(project_path, *rel.split('/')): merged[rel] for rel in sorted(merged, key=_walk_order)}
+
+    issues, severity_counts = [], Counter()
+    for name in first['detectors']:
+        detector = load_detector(name)
+        if hasattr(detector, 'reduce'):
+            detector_issues = detector.reduce(project_path, thresholds, records)
+        else:
+            detector_issues = first['project_issues'].get(name, [])
+        detector_issues = [as_issue(issue, name) for issue in detector_issues]
+        severity_counts.update(issue.severity.name for issue in detector_issues)
+        issues.append(detector_issues)
+    return {
+        "issues": list(merge_issues(issues)),
+        "python_files": list(records),
+        "total_loc": sum(record.get('loc', 0) for record in records.values()),
+        "severity_counts": severity_counts,
+        "records": records,
+        "project_path": project_path,
+        "quarantine": quarantined(records),
+    }
@@ -0,0 +1,112 @@
+# projectdoctor/profiling.py
+import cProfile
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+def add_timing(timings, name, wall, cpu, files=1):
+    """Adds one measurement to `timings[name]`, a `[wall_seconds, cpu_seconds, files]` list."""
+    totals = timings.setdefault(name, [0.0, 0.0, 0])
+    totals[0] += wall
+    totals[1] += cpu
+    totals[2] += files
+
+def merge_timings(timings, other):
+    for name, (wall, cpu, files) in other.items():
+        add_timing(timings, name, wall, cpu, files)
+
+class Profiler:
+    """
+    Collects the `timings` section of a profiled run: wall and CPU time of every stage,
+    the per-file `collect` step of each detector (summed over files and worker processes),
+    each detector's cross-file step, and I/O and cache counters. With `memory`, it also
+    traces allocations for the tracemalloc peak of the main process; tracing slows the
+    whole run down several times, so the timings are then inflated. With `profile_dir`,
+    every detector also gets a cProfile dump there.
+    """
+
+    def __init__(self, profile_dir=None, memory=False):
+        self.profile_dir = profile_dir
+        self.memory = memory
+        self.collect_timings = {}
+        self.profiles = {}
+        self.timings = {'stages': {}, 'detectors': {}}
+        self._started = None
+        self._owns_tracemalloc = False
+        self._peak_memory = 0
+
+    def start(self):
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._owns_tracemalloc = True
+        self._started = time.perf_counter(), time.process_time()
+
+    def profile(self, name):
+        """Returns the cProfile of detector `name`, or None when no dump was asked for."""
+        if self.profile_dir is None:
+            return None
+        if name not in self.profiles:
+            self.profiles[name] = cProfile.Profile()
+        return self.profiles[name]
+
+    @contextmanager
+    def stage(self, name, detector=None):
+        """Measures a block as stage `name`, or as the cross-file step of `detector`."""
+        profile = self.profile(detector) if detector else None
+        if self.memory and hasattr(tracemalloc, 'reset_peak') and tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        start_wall, start_cpu = time.perf_counter(), time.process_time()
+        if profile:
+            profile.enable()
+        try:
+            yield
+        finally:
+            if profile:
+                profile.disable()
+            entry = {
+                'wall_seconds': round(time.perf_counter() - start_wall, 4),
+                'cpu_seconds': round(time.process_time() - start_cpu, 4),
+                'peak_memory_kb': self._peak_kb(),
+            }
+            timings, key = (self.timings['detectors'].setdefault(detector, {}), 'reduce') if detector else (self.timings['stages'], name)
+            previous = timings.get(key)
+            if previous: # A stage measured more than once, e.g. each stage's collect in a gated run, adds up.
+                entry['wall_seconds'] = round(entry['wall_seconds'] + previous['wall_seconds'], 4)
+                entry['cpu_seconds'] = round(entry['cpu_seconds'] + previous['cpu_seconds'], 4)
+                if previous['peak_memory_kb'] is not None:
+                    entry['peak_memory_kb'] = max(entry['peak_memory_kb'] or 0, previous['peak_memory_kb'])
+            timings[key] = entry
+
+    def _peak_kb(self):
+        """The tracemalloc peak since the last `stage` began; `stage` resets it, so the overall peak is kept here."""
+        if not self.memory or not tracemalloc.is_tracing():
+            return None
+        peak = tracemalloc.get_traced_memory()[1]
+        self._peak_memory = max(self._peak_memory, peak)
+        return peak // 1024
+
+    def count(self, stage, **counters):
+        self.timings['stages'].setdefault(stage, {}).update(counters)
+
+    def finish(self):
+        """Stops tracing, writes the cProfile dumps and returns the `timings` section."""
+        detectors = self.timings['detectors']
+        for name, (wall, cpu, files) in self.collect_timings.items():
+            collect = {'wall_seconds': round(wall, 4), 'cpu_seconds': round(cpu, 4), 'files': files}
+            detectors[name] = {'collect': collect, **detectors.get(name, {})}
+        if self._started:
+            start_wall, start_cpu = self._started
+            self.timings['total'] = {
+                'wall_seconds': round(time.perf_counter() - start_wall, 4),
+                'cpu_seconds': round(time.process_time() - start_cpu, 4),
+                'peak_memory_kb': max(self._peak_memory, tracemalloc.get_traced_memory()[1]) // 1024 if self.memory and tracemalloc.is_tracing() else None,
+            }
+        if self._owns_tracemalloc:
+            tracemalloc.stop()
+            self._owns_tracemalloc = False
+        if self.profile_dir is not None:
+            os.makedirs(self.profile_dir, exist_ok=True)
+            for name, profile in self.profiles.items():
+                profile.dump_stats(os.path.join(self.profile_dir, f"{name}.prof"))
+        return self.timings
@@ -1,55 +1,185 @@
 # projectdoctor/reporter.py
+import io
 import json
-from .score import calculate_score
+import sys
+from collections import Counter
+from .issue import as_dict
+from .score import calculate_score, score_from_counts
+
+class _BufferedLines:
+    """Collects output lines and hands them to the stream in large batches."""
+
+    def __init__(self, stream, batch_size=1000):
+        self.stream = stream
+        self.batch_size = batch_size
+        self._lines = []
+
+    def write(self, line):
+        self._lines.append(line)
+        if len(self._lines) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self._lines:
+            self.stream.write("".join(self._lines))
+            self._lines = []
 
 class Reporter:
+    """
+    Writes the analysis results. `issues` may be a list or a lazy iterator (as from
+    `Analyzer.stream`) of `Issue`s or issue dicts; messages are rendered as they are
+    written. Every writer consumes the issues exactly once, so call only one of them.
+    """
+
     def __init__(self, analysis_results):
         self.issues = analysis_results['issues']
         self.python_files = analysis_results['python_files']
-        self.score = calculate_score(self.issues, self.python_files)
+        severity_counts = analysis_results.get('severity_counts')
+        if severity_counts is None:
+            self.issues = list(self.issues)
+            self.score = calculate_score(self.issues, self.python_files, analysis_results.get('corpus'), analysis_results.get('total_loc'))
+            severity_counts = Counter(issue['severity'] for issue in self.issues)
+        else:
+            # A `--since` run scores the whole project but counts only the issues it reports.
+            self.score = analysis_results.get('score', score_from_counts(severity_counts, analysis_results['total_loc']))
+        self.issue_count = sum(severity_counts.values())
+        self.timings = analysis_results.get('timings')
+        # Files left out of the analysis for exceeding a size or time budget.
+        self.quarantine = analysis_results.get('quarantine') or []
+        # The `--fail-under`/`--max-issues` verdict, when a gate was set.
+        self.gate = analysis_results.get('gate')
 
     def to_cli(self):
         """Prints a summary report to the command line."""
-        print("\n" + "="*50)
-        print("🩺 ProjectDoctor Report – Code Health Overview")
-        print("="*50)
-        print(f"\n📊 Maintainability Score: {self.score}/100\n")
+        self.write_cli(sys.stdout)
 
-        if not self.issues:
-            print("✅ No issues detected. Great job!")
-            return
+    def write_cli(self, stream):
+        out = _BufferedLines(stream)
+        out.write("\n" + "="*50 + "\n")
+        out.write("🩺 ProjectDoctor Report – Code Health Overview\n")
+        out.write("="*50 + "\n")
+        out.write(f"\n📊 Maintainability Score: {self.score}/100\n\n")
 
-        print("⚠️ Issues Detected:")
-        for issue in self.issues:
-            severity = issue['severity']
-            file = issue.get('file', 'Project-wide')
-            message = issue['message']
-            print(f"- [{severity}] `{file}`: {message}")
+        if not self.issue_count:
+            out.write("✅ No issues detected. Great job!\n")
+        else:
+            out.write("⚠️ Issues Detected:\n")
+            for issue in self.issues:
+                severity = issue['severity']
+                file = issue.get('file', 'Project-wide')
+                message = issue['message']
+                out.write(f"- [{severity}] `{file}`: {message}\n")
+        if self.quarantine:
+            out.write("\n🚧 Quarantined Files (not analyzed):\n")
+            for entry in self.quarantine:
+                out.write(f"- `{entry['file']}`: {entry['reason']}\n")
+        if self.gate:
+            out.write("\n" + self._gate_summary() + "\n")
+        if self.timings:
+            self._write_timings_table(out)
+        out.flush()
+
+    def _write_timings_table(self, out):
+        """Writes the `--profile` summary: one row per stage and per detector step."""
+        def ms(entry, key):
+            value = entry.get(key)
+            return "-" if value is None else f"{value * 1000:.0f}"
+
+        out.write("\n⏱️ Profile:\n")
+        out.write(f"{'Step':<28}{'Wall ms':>10}{'CPU ms':>10}{'Files':>8}{'Peak KB':>10}\n")
+        rows = [(name, entry) for name, entry in self.timings['stages'].items()]
+        for name, steps in self.timings['detectors'].items():
+            rows.extend((f"{name}.{step}", entry) for step, entry in steps.items())
+        if 'total' in self.timings:
+            rows.append(('total', self.timings['total']))
+        for name, entry in rows:
+            peak = entry.get('peak_memory_kb')
+            out.write(f"{name:<28}{ms(entry, 'wall_seconds'):>10}{ms(entry, 'cpu_seconds'):>10}"
+                      f"{entry.get('files', ''):>8}{'-' if peak is None else peak:>10}\n")
+        collect = self.timings['stages'].get('collect', {})
+        if 'reads' in collect:
+            out.write(f"Read {collect['reads']} files ({collect['bytes_read']} bytes), {collect['parses']} parses, "
+                      f"{collect['cache_hits']} cache hits, {collect['cache_misses']} cache misses.\n")
 
     def to_markdown(self, filename):
         """Saves a detailed report in Markdown format."""
         with open(filename, 'w', encoding='utf-8') as f:
-            f.write("# 🩺 ProjectDoctor Report – Code Health Overview\n\n")
-            f.write(f"📊 **Maintainability Score:** {self.score}/100\n\n")
-            
-            if not self.issues:
-                f.write("✅ No issues detected. Great job!\n")
-                return
-
-            f.write("## ⚠️ Issues Detected\n\n")
-            f.write("| Severity | File | Issue Description |\n")
-            f.write("|----------|------|-------------------|\n")
+            self.write_markdown(f)
+
+    def write_markdown(self, stream):
+        out = _BufferedLines(stream)
+        out.write("# 🩺 ProjectDoctor Report – Code Health Overview\n\n")
+        out.write(f"📊 **Maintainability Score:** {self.score}/100\n\n")
+
+        if not self.issue_count:
+            out.write("✅ No issues detected. Great job!\n")
+        else:
+            out.write("## ⚠️ Issues Detected\n\n")
+            out.write("| Severity | File | Issue Description |\n")
+            out.write("|----------|------|-------------------|\n")
             for issue in self.issues:
                 severity = issue['severity']
                 file = issue.get('file', 'Project-wide')
                 message = issue['message']
-                f.write(f"| {severity} | `{file}` | {message} |\n")
+                out.write(f"| {severity} | `{file}` | {message} |\n")
+        if self.quarantine:
+            out.write("\n## 🚧 Quarantined Files\n\n")
+            out.write("These files exceeded a size or time budget and were not analyzed.\n\n")
+            for entry in self.quarantine:
+                out.write(f"- `{entry['file']}`: {entry['reason']}\n")
+        if self.gate:
+            out.write("\n## 🚦 Gate\n\n" + self._gate_summary() + "\n")
+        out.flush()
+
+    def _gate_summary(self):
+        if self.gate['passed']:
+            return "🚦 Gate passed."
+        summary = f"🚦 Gate failed: {'; '.join(self.gate['failures'])}."
+        if self.gate['skipped_detectors']:
+            summary += (f"\nThe analysis stopped early without {', '.join(self.gate['skipped_detectors'])}, "
+                        "so the score and issues are partial.")
+        return summary
 
     def to_json(self):
         """Returns a JSON representation of the report."""
-        report = {
-            'maintainability_score': self.score,
-            'issue_count': len(self.issues),
-            'issues': self.issues,
-        }
-        return json.dumps(report, indent=2)
+        buffer = io.StringIO()
+        self.write_json(buffer)
+        return buffer.getvalue()
+
+    def write_json(self, stream):
+        """Streams the same document `json.dumps(report, indent=2)` would produce, one issue at a time."""
+        out = _BufferedLines(stream)
+        out.write("{\n")
+        out.write(f'  "maintainability_score": {json.dumps(self.score)},\n')
+        out.write(f'  "issue_count": {self.issue_count},\n')
+        if not self.issue_count:
+            out.write('  "issues": []')
+        else:
+            out.write('  "issues": [\n')
+            for i, issue in enumerate(self.issues):
+                text = json.dumps(as_dict(issue), indent=2).replace("\n", "\n    ")
+                out.write(("    " if i == 0 else ",\n    ") + text)
+            out.write("\n  ]")
+        if self.quarantine:
+            out.write(',\n  "quarantine": ' + json.dumps(self.quarantine, indent=2).replace("\n", "\n  "))
+        if self.gate is not None:
+            out.write(',\n  "gate": ' + json.dumps(self.gate, indent=2).replace("\n", "\n  "))
+        if self.timings is not None:
+            out.write(',\n  "timings": ' + json.dumps(self.timings, indent=2).replace("\n", "\n  "))
+        out.write("\n}")
+        out.flush()
+
+    def write_jsonl(self, stream):
+        """Writes JSON Lines: one issue object per line, then a final summary object."""
+        out = _BufferedLines(stream)
+        for issue in self.issues:
+            out.write(json.dumps(as_dict(issue)) + "\n")
+        summary = {'maintainability_score': self.score, 'issue_count': self.issue_count}
+        if self.quarantine:
+            summary['quarantine'] = self.quarantine
+        if self.gate is not None:
+            summary['gate'] = self.gate
+        if self.timings is not None:
+            summary['timings'] = self.timings
+        out.write(json.dumps(summary) + "\n")
+        out.flush()
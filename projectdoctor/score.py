@@ -1,42 +1,54 @@
 # projectdoctor/score.py
+from .corpus import Corpus
 
-def _get_total_loc(python_files):
+def _get_total_loc(python_files, corpus=None):
     """Calculates the total lines of code across all python files."""
+    corpus = corpus or Corpus()
     total_loc = 0
     for file_path in python_files:
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                total_loc += sum(1 for _ in f)
-        except (IOError, UnicodeDecodeError):
+            total_loc += corpus.get(file_path).line_count
+        except IOError:
             continue
     return total_loc
 
-def calculate_score(issues, python_files):
+SEVERITY_WEIGHTS = {
+    'HIGH': 15,
+    'MEDIUM': 5,
+    'LOW': 1,
+}
+
+def calculate_score(issues, python_files, corpus=None, total_loc=None):
     """
     Calculates a maintainability score from 0 to 100.
     The score starts at 100 and is penalized based on the *density* of issues
     relative to the project's size (total lines of code).
     """
-    severity_weights = {
-        'HIGH': 15,
-        'MEDIUM': 5,
-        'LOW': 1,
-    }
-    
-    total_penalty_points = sum(severity_weights.get(issue['severity'], 1) for issue in issues)
-
-    total_loc = _get_total_loc(python_files)
+    severity_counts = {}
+    for issue in issues:
+        severity_counts[issue['severity']] = severity_counts.get(issue['severity'], 0) + 1
+
+    if total_loc is None:
+        total_loc = _get_total_loc(python_files, corpus)
+    return score_from_counts(severity_counts, total_loc)
+
+def score_from_counts(severity_counts, total_loc):
+    """Calculates the score from per-severity issue counts, e.g. `{'HIGH': 2, 'LOW': 7}`."""
+    total_penalty_points = sum(SEVERITY_WEIGHTS.get(severity, 1) * count for severity, count in severity_counts.items())
+
     if total_loc == 0:
         return 100
 
+    return int(score_from_ratio(total_penalty_points / total_loc))
+
+def score_from_ratio(ratio):
+    """The score, between 0 and 100 and not yet rounded down, for `ratio` penalty points per line of code."""
     # Calculate penalty points per 1000 lines of code to normalize
-    penalty_ratio = (total_penalty_points / total_loc) * 1000
+    penalty_ratio = ratio * 1000
 
     # A scaling factor to control how harshly the ratio affects the score
     scaling_factor = 5.0
-    
+
     score_deduction = penalty_ratio * scaling_factor
-    
-    final_score = 100 - score_deduction
 
-    return max(0, int(final_score))
+    return max(0.0, min(100.0, 100 - score_deduction))
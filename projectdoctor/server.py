@@ -0,0 +1,172 @@
+# projectdoctor/server.py
+import json
+import os
+import time
+from .issue import as_dict
+from .score import score_from_counts
+from .watch import WatchSession, poll_changes, snapshot
+
+# JSON-RPC 2.0 error codes.
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+
+class RPCError(Exception):
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+class Server:
+    """
+    Answers JSON-RPC requests from a warm `WatchSession`: the records, the detectors' issues
+    and indexes stay in memory, and unsaved editor buffers are analyzed from their text
+    through corpus overlays, so a request only re-collects the one file it is about.
+
+    Methods (params by name; paths are absolute or relative to the project):
+    - `analyze_buffer(path, text)`: analyzes unsaved text for `path`; returns its issues and the score.
+    - `close_buffer(path)`: drops the buffer and goes back to the file on disk.
+    - `issues(path=None)`: the current issues, optionally of one file or directory.
+    - `score(package=None)`: the score of the project or of the files under one directory.
+    - `refresh()`: picks up files changed on disk since the last refresh.
+    - `shutdown()`: stops the server after replying.
+    """
+
+    def __init__(self, analyzer):
+        self.analyzer = analyzer
+        self.stamps = snapshot(analyzer.python_files)
+        self.session = WatchSession(analyzer)
+        self.running = True
+
+    def _path(self, params, name='path', required=True):
+        path = params.get(name)
+        if path is None and not required:
+            return None
+        if not isinstance(path, str):
+            raise RPCError(INVALID_PARAMS, f"'{name}' must be a path string.")
+        return os.path.abspath(os.path.join(self.analyzer.project_path, path))
+
+    def _selected(self, path):
+        """The session's issues of the file `path`, or of every file under it when it is a directory."""
+        if path is None:
+            return self.session.issues
+        prefix = path.rstrip(os.sep) + os.sep
+        return [issue for issue in self.session.issues
+                if issue.file is not None and (issue.file == path or issue.file.startswith(prefix))]
+
+    def analyze_buffer(self, params):
+        path, text = self._path(params), params.get('text')
+        if not isinstance(text, str):
+            raise RPCError(INVALID_PARAMS, "'text' must be the buffer's source text.")
+        start = time.perf_counter()
+        self.analyzer.corpus.overlay(path, text)
+        self.session.update([path])
+        return {'issues': [as_dict(issue) for issue in self._selected(path)], 'score': self.session.score,
+                'elapsed_ms': round((time.perf_counter() - start) * 1000, 1)}
+
+    def close_buffer(self, params):
+        path = self._path(params)
+        self.analyzer.corpus.overlay(path, None)
+        if os.path.exists(path):
+            self.session.update([path])
+        else:
+            self.session.update(removed=[path])
+        return {'score': self.session.score}
+
+    def issues(self, params):
+        return {'issues': [as_dict(issue) for issue in self._selected(self._path(params, required=False))]}
+
+    def score(self, params):
+        package = self._path(params, 'package', required=False)
+        if package is None:
+            return {'score': self.session.score, 'issue_count': len(self.session.issues), 'files': len(self.session.records)}
+        prefix = package.rstrip(os.sep) + os.sep
+        records = [record for path, record in self.session.records.items() if path == package or path.startswith(prefix)]
+        issues = self._selected(package)
+        severity_counts = {}
+        for issue in issues:
+            severity_counts[issue['severity']] = severity_counts.get(issue['severity'], 0) + 1
+        score = score_from_counts(severity_counts, sum(record.get('loc', 0) for record in records))
+        return {'score': score, 'issue_count': len(issues), 'files': len(records)}
+
+    def refresh(self, params):
+        self.stamps, changed, removed = poll_changes(self.analyzer, self.stamps)
+        # Open buffers take precedence over their files on disk.
+        corpus = self.analyzer.corpus
+        removed = [path for path in removed if not corpus.has_overlay(path)]
+        added, resolved = self.session.update(changed, removed)
+        return {'changed': len(changed), 'removed': len(removed), 'added': len(added), 'resolved': len(resolved),
+                'score': self.session.score}
+
+    def shutdown(self, params):
+        self.running = False
+        return None
+
+    METHODS = ('analyze_buffer', 'close_buffer', 'issues', 'score', 'refresh', 'shutdown')
+
+    def handle(self, message):
+        """Returns the response to one decoded JSON-RPC message, or None for a notification."""
+        if not isinstance(message, dict) or message.get('jsonrpc') != '2.0' or not isinstance(message.get('method'), str):
+            return _error(message.get('id') if isinstance(message, dict) else None, INVALID_REQUEST, "Invalid JSON-RPC 2.0 request.")
+        request_id = message.get('id')
+        params = message.get('params') or {}
+        try:
+            if message['method'] not in self.METHODS:
+                raise RPCError(METHOD_NOT_FOUND, f"Unknown method '{message['method']}'.")
+            if not isinstance(params, dict):
+                raise RPCError(INVALID_PARAMS, "Params must be an object.")
+            result = getattr(self, message['method'])(params)
+        except RPCError as e:
+            return None if 'id' not in message else _error(request_id, e.code, e.message)
+        except Exception as e:
+            return None if 'id' not in message else _error(request_id, INTERNAL_ERROR, f"{type(e).__name__}: {e}")
+        if 'id' not in message:
+            return None
+        return {'jsonrpc': '2.0', 'id': request_id, 'result': result}
+
+def _error(request_id, code, message):
+    return {'jsonrpc': '2.0', 'id': request_id, 'error': {'code': code, 'message': message}}
+
+def _read_message(stream):
+    """
+    Reads one message as `(body, framed)`: either a `Content-Length` framed message,
+    as editors' language clients send them, or a single line of JSON. Returns None at EOF.
+    """
+    while True:
+        line = stream.readline()
+        if not line:
+            return None
+        if line.strip():
+            break
+    if not line.lower().startswith(b'content-length:'):
+        return line, False
+    length = int(line.split(b':', 1)[1])
+    while stream.readline().strip(): # Other headers, up to the blank line.
+        pass
+    return stream.read(length), True
+
+def _write_message(stream, response, framed):
+    body = json.dumps(response).encode('utf-8')
+    if framed:
+        stream.write(b'Content-Length: %d\r\n\r\n' % len(body) + body)
+    else:
+        stream.write(body + b'\n')
+    stream.flush()
+
+def serve(server, stdin, stdout):
+    """Answers requests from the binary stream `stdin` on `stdout`, in the framing each request used, until shutdown or EOF."""
+    while server.running:
+        message = _read_message(stdin)
+        if message is None:
+            return
+        body, framed = message
+        try:
+            request = json.loads(body)
+        except ValueError as e:
+            _write_message(stdout, _error(None, PARSE_ERROR, f"Parse error: {e}"), framed)
+            continue
+        response = server.handle(request)
+        if response is not None:
+            _write_message(stdout, response, framed)
@@ -0,0 +1,126 @@
+# projectdoctor/spill.py
+import heapq
+import json
+import os
+import shutil
+import tempfile
+
+class SortedRun:
+    """
+    A stream of tuples that is only ever read back in sorted order. Tuples are buffered
+    in memory; when the owning `SpillStore` runs over budget the buffer is sorted and
+    written to disk as one run, and iteration k-way merges the runs with what is left.
+    """
+
+    def __init__(self, store, name):
+        self._store = store
+        self.name = name
+        self.buffer = []
+        self.weight = 0
+        self.files = []
+
+    def add(self, item, weight=1):
+        """Buffers `item`, which costs about `weight` typical tuples of memory."""
+        self.buffer.append(item)
+        self.weight += weight
+        self._store._added(weight)
+
+    def flush(self):
+        if not self.buffer:
+            return
+        self.buffer.sort()
+        filename = os.path.join(self._store.directory(), f"{self.name}.{len(self.files)}.jsonl")
+        with open(filename, 'w', encoding='utf-8') as f:
+            for item in self.buffer:
+                f.write(json.dumps(item, separators=(',', ':')))
+                f.write('\n')
+        self.files.append(filename)
+        self._store.buffered -= self.weight
+        self.buffer, self.weight = [], 0
+
+    def __iter__(self):
+        self.buffer.sort()
+        return heapq.merge(self.buffer, *(_read_run(filename) for filename in self.files))
+
+def _read_run(filename):
+    with open(filename, encoding='utf-8') as f:
+        for line in f:
+            yield tuple(json.loads(line))
+
+class SpillStore:
+    """
+    Cross-file detector state kept within a memory budget: named `SortedRun`s, plus the
+    file ids spilled items refer to. Once more than `limit` items (by weight) are buffered
+    in total, the heaviest buffer is written out as a sorted run. Call `close` to delete the runs.
+    """
+    # Rough in-memory cost of one buffered tuple, used to turn a byte budget into an item count.
+    ITEM_BYTES = 200
+
+    def __init__(self, max_memory):
+        # Half of the budget for buffers; the rest is for the compact records and the reduce step.
+        self.limit = max(1, max_memory // 2 // self.ITEM_BYTES)
+        self.buffered = 0
+        self.runs = {}
+        self.paths = []
+        self._ids = {}
+        self._directory = None
+
+    def run(self, name):
+        run = self.runs.get(name)
+        if run is None:
+            run = self.runs[name] = SortedRun(self, name)
+        return run
+
+    def file_id(self, path):
+        file_id = self._ids.get(path)
+        if file_id is None:
+            file_id = self._ids[path] = len(self.paths)
+            self.paths.append(path)
+        return file_id
+
+    @property
+    def spilled_runs(self):
+        return sum(len(run.files) for run in self.runs.values())
+
+    def directory(self):
+        if self._directory is None:
+            self._directory = tempfile.mkdtemp(prefix='projectdoctor-spill-')
+        return self._directory
+
+    def _added(self, weight=1):
+        self.buffered += weight
+        if self.buffered > self.limit:
+            max(self.runs.values(), key=lambda run: run.weight).flush()
+
+    def close(self):
+        if self._directory is not None:
+            shutil.rmtree(self._directory, ignore_errors=True)
+            self._directory = None
+
+class SpilledRecords(dict):
+    """
+    Per-file records, keyed by path, whose bulky detector data has been moved into
+    `spill`. Detectors that define `spill(part, file_id, store)` hand their part over
+    as each record arrives and read it back in `reduce` through `records.spill`.
+    """
+
+    def __init__(self, spill, spillers):
+        super().__init__()
+        self.spill = spill
+        self._spillers = spillers
+
+    def __setitem__(self, path, record):
+        if self._spillers and 'error' not in record:
+            file_id = self.spill.file_id(path)
+            record = dict(record)
+            for name, spill in self._spillers.items():
+                if name in record:
+                    record[name] = spill(record[name], file_id, self.spill)
+        super().__setitem__(path, record)
+
+    def ordered(self, paths):
+        """The records of `paths` in that order, sharing the same spilled data."""
+        records = SpilledRecords(self.spill, {})
+        for path in paths:
+            dict.__setitem__(records, path, self[path])
+        return records
@@ -0,0 +1,165 @@
+# projectdoctor/store.py
+import datetime
+import json
+import os
+import sqlite3
+from .changes import GitError, _git
+from .issue import as_issue
+from .score import score_from_counts
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    created_at TEXT NOT NULL,
+    project_path TEXT NOT NULL,
+    git_commit TEXT,
+    score INTEGER NOT NULL,
+    issue_count INTEGER NOT NULL,
+    file_count INTEGER NOT NULL,
+    total_loc INTEGER NOT NULL,
+    timings TEXT
+);
+CREATE TABLE IF NOT EXISTS files (
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    path TEXT NOT NULL,
+    loc INTEGER,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS issues (
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    detector TEXT,
+    severity TEXT NOT NULL,
+    file TEXT,
+    line INTEGER,
+    value REAL,
+    message TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_run ON files(run_id);
+CREATE INDEX IF NOT EXISTS files_path ON files(path, run_id);
+CREATE INDEX IF NOT EXISTS issues_run ON issues(run_id, severity);
+CREATE INDEX IF NOT EXISTS issues_file ON issues(file, run_id);
+CREATE INDEX IF NOT EXISTS issues_detector ON issues(detector, run_id);
+"""
+
+class StoreError(Exception):
+    """Raised when the results database cannot answer a query, e.g. for an unknown run."""
+
+class ResultStore:
+    """
+    A SQLite history of analysis runs: one row per run (score, counts, timings), per
+    analyzed file (line count) and per issue. Files are stored relative to the project,
+    so runs of different checkouts of the same project line up.
+    """
+    BATCH_SIZE = 1000
+
+    def __init__(self, filename):
+        self.connection = sqlite3.connect(filename)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
+
+    def record(self, results):
+        """
+        Adds a run for the analysis `results` (from `Analyzer.stream`, `run` or `merge_partials`).
+        Returns `(run_id, results)`: the returned results yield the same issues, inserting each
+        batch as it is consumed, so the report is still streamed. The run and its files are
+        committed right away, its issues once all have been consumed (or on `close`).
+        """
+        project_path = results['project_path']
+        severity_counts = results['severity_counts']
+        total_loc = results['total_loc']
+        cursor = self.connection.execute(
+            "INSERT INTO runs (created_at, project_path, git_commit, score, issue_count, file_count, total_loc, timings)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (datetime.datetime.now().isoformat(timespec='seconds'), project_path, _head_commit(project_path),
+             results.get('score', score_from_counts(severity_counts, total_loc)), sum(severity_counts.values()), len(results['python_files']),
+             total_loc, json.dumps(results['timings']) if results.get('timings') else None))
+        run_id = cursor.lastrowid
+        records = results.get('records') or {}
+        self.connection.executemany(
+            "INSERT INTO files (run_id, path, loc, error) VALUES (?, ?, ?, ?)",
+            ((run_id, _relative(path, project_path), records.get(path, {}).get('loc'), records.get(path, {}).get('error'))
+             for path in results['python_files']))
+        self.connection.commit()
+        return run_id, dict(results, issues=self._insert_issues(run_id, results['issues'], project_path))
+
+    def _insert_issues(self, run_id, issues, project_path):
+        batch = []
+        for issue in issues:
+            issue = as_issue(issue)
+            batch.append((run_id, issue.detector, issue.severity.name, _relative(issue.file, project_path), issue.line, issue.value,
+                          _relative_message(issue.message, project_path)))
+            if len(batch) >= self.BATCH_SIZE:
+                self._flush(batch)
+            yield issue
+        self._flush(batch)
+        self.connection.commit()
+
+    def _flush(self, batch):
+        self.connection.executemany(
+            "INSERT INTO issues (run_id, detector, severity, file, line, value, message) VALUES (?, ?, ?, ?, ?, ?, ?)", batch)
+        batch.clear()
+
+    def runs(self, limit=20):
+        """The latest runs, oldest first, each with its per-severity issue counts."""
+        rows = self.connection.execute(
+            "SELECT runs.*,"
+            " (SELECT COUNT(*) FROM issues WHERE run_id = runs.id AND severity = 'HIGH') AS high,"
+            " (SELECT COUNT(*) FROM issues WHERE run_id = runs.id AND severity = 'MEDIUM') AS medium,"
+            " (SELECT COUNT(*) FROM issues WHERE run_id = runs.id AND severity = 'LOW') AS low"
+            " FROM runs ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        return [dict(row) for row in reversed(rows)]
+
+    def file_history(self, path, limit=20):
+        """Per run: the file's line count and issue count, oldest first."""
+        rows = self.connection.execute(
+            "SELECT runs.id AS run_id, runs.created_at, files.loc,"
+            " (SELECT COUNT(*) FROM issues WHERE issues.file = files.path AND issues.run_id = runs.id) AS issue_count"
+            " FROM files JOIN runs ON runs.id = files.run_id WHERE files.path = ?"
+            " ORDER BY runs.id DESC LIMIT ?", (path, limit)).fetchall()
+        return [dict(row) for row in reversed(rows)]
+
+    def latest_run(self, offset=0):
+        row = self.connection.execute("SELECT id FROM runs ORDER BY id DESC LIMIT 1 OFFSET ?", (offset,)).fetchone()
+        return row['id'] if row else None
+
+    def diff(self, run_a, run_b, severity=None):
+        """
+        Returns `(added, fixed)`: the issues of `run_b` that `run_a` did not have, and
+        the issues of `run_a` that are gone in `run_b`. Raises `StoreError` for unknown runs.
+        """
+        for run_id in (run_a, run_b):
+            if self.connection.execute("SELECT 1 FROM runs WHERE id = ?", (run_id,)).fetchone() is None:
+                raise StoreError(f"There is no run {run_id}.")
+        return self._missing_from(run_b, run_a, severity), self._missing_from(run_a, run_b, severity)
+
+    def _missing_from(self, run_id, other_run_id, severity):
+        # An issue is "the same" in another run if its detector, severity, file and message match, as in watch mode.
+        query = ("SELECT detector, severity, file, line, value, message FROM issues AS i WHERE run_id = ?"
+                 " AND NOT EXISTS (SELECT 1 FROM issues WHERE run_id = ? AND file IS i.file AND detector IS i.detector"
+                 " AND severity = i.severity AND message = i.message)")
+        params = [run_id, other_run_id]
+        if severity:
+            query += " AND severity = ?"
+            params.append(severity)
+        query += " ORDER BY CASE severity WHEN 'HIGH' THEN 0 WHEN 'MEDIUM' THEN 1 ELSE 2 END, file, line"
+        return [dict(row) for row in self.connection.execute(query, params)]
+
+def _relative(path, project_path):
+    if path is None:
+        return None
+    return os.path.relpath(path, project_path).replace("\\", "/")
+
+def _relative_message(message, project_path):
+    """The message with paths under the project (e.g. a duplicate's other location) made relative."""
+    return message.replace(os.path.join(project_path, ''), '')
+
+def _head_commit(project_path):
+    try:
+        return _git(project_path, 'rev-parse', 'HEAD').strip()
+    except GitError:
+        return None
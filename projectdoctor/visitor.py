@@ -0,0 +1,101 @@
+# projectdoctor/visitor.py
+import ast
+
+class Plugin:
+    """
+    A per-file check driven by the shared traversal. Subclasses set `NAME` and define
+    `enter_<NodeType>(node)` / `leave_<NodeType>(node)` callbacks for the node types they
+    need (e.g. `enter_FunctionDef`, `leave_ClassDef`, `enter_comprehension`); `result`
+    returns the file's JSON-friendly data. A plugin used as a detector also defines
+    `reduce(project_path, thresholds, records)`, a staticmethod turning records into issues.
+    """
+    NAME = None
+
+    def begin(self, source, thresholds):
+        """Called before the traversal of each file."""
+
+    def result(self):
+        return None
+
+    @staticmethod
+    def reduce(project_path, thresholds, records):
+        return []
+
+def _handlers(plugins, node_type, table):
+    name = node_type.__name__
+    enters = [getattr(p, 'enter_' + name) for p in plugins if hasattr(p, 'enter_' + name)]
+    leaves = [getattr(p, 'leave_' + name) for p in plugins if hasattr(p, 'leave_' + name)]
+    table[node_type] = handlers = (enters, leaves) if enters or leaves else None
+    return handlers
+
+def walk(tree, plugins):
+    """Walks `tree` once, depth-first in field order, calling each plugin's enter and leave callbacks."""
+    table = {}
+    stack = [(tree, False)]
+    iter_child_nodes = ast.iter_child_nodes
+    while stack:
+        node, leaving = stack.pop()
+        node_type = type(node)
+        handlers = table[node_type] if node_type in table else _handlers(plugins, node_type, table)
+        if leaving:
+            for callback in handlers[1]:
+                callback(node)
+            continue
+        if handlers:
+            for callback in handlers[0]:
+                callback(node)
+            if handlers[1]:
+                stack.append((node, True))
+        children = list(iter_child_nodes(node))
+        children.reverse()
+        stack.extend((child, False) for child in children)
+
+def run(source, thresholds, plugin_classes):
+    """
+    Runs the plugins not yet run on `source` in one traversal of its AST and returns
+    `{plugin_class: result}`. Results, and a failure such as a syntax error, are kept on
+    the source so every detector backed by a plugin shares the same traversal.
+    """
+    visits = source.visits
+    if visits.get('thresholds') is not thresholds:
+        visits.clear()
+        visits['thresholds'] = thresholds
+    pending = [cls for cls in plugin_classes if cls not in visits]
+    if pending:
+        plugins = [cls() for cls in pending]
+        try:
+            for plugin in plugins:
+                plugin.begin(source, thresholds)
+            walk(source.tree, plugins)
+            for cls, plugin in zip(pending, plugins):
+                visits[cls] = plugin.result()
+        except Exception as e:
+            for cls in pending:
+                visits[cls] = e
+    return {cls: visits[cls] for cls in plugin_classes}
+
+class PluginCollect:
+    """A detector `collect` step backed by a plugin; picklable, so it can be sent to worker processes."""
+
+    def __init__(self, plugin):
+        self.plugin = plugin
+
+    def __call__(self, source, thresholds):
+        result = run(source, thresholds, [self.plugin])[self.plugin]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+class PluginDetector:
+    """Adapts a `Plugin` subclass to the detector interface (`NAME`, `collect`, `reduce`, `analyze`)."""
+
+    def __init__(self, plugin):
+        self.plugin = plugin
+        self.NAME = plugin.NAME
+        self.VERSION = getattr(plugin, 'VERSION', None)
+        self.collect = PluginCollect(plugin)
+        self.reduce = plugin.reduce
+
+    def analyze(self, project_path, thresholds, python_files, corpus=None):
+        from .detectors import collect_records
+        return self.reduce(project_path, thresholds, collect_records({self.NAME: self.collect}, python_files, thresholds, corpus))
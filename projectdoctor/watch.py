@@ -0,0 +1,137 @@
+# projectdoctor/watch.py
+import os
+import time
+from .detectors import collect_record, circular_import
+from .issue import merge_issues
+from .score import score_from_counts
+
+def _issue_id(issue):
+    return issue['severity'], str(issue.get('file')), issue['message']
+
+def _difference(before, after):
+    """
+    `(added, resolved)` between two issue lists. Issues carried over as the same object
+    are skipped, so only the re-derived ones have their messages formatted and compared.
+    """
+    kept = {id(issue) for issue in before}.intersection(id(issue) for issue in after)
+    old = {_issue_id(issue): issue for issue in before if id(issue) not in kept}
+    new = {_issue_id(issue): issue for issue in after if id(issue) not in kept}
+    return [issue for key, issue in new.items() if key not in old], [issue for key, issue in old.items() if key not in new]
+
+class WatchSession:
+    """
+    Keeps a full analysis warm in memory: the per-file records, each detector's issues
+    and the in-place indexes behind the cross-file detectors (duplicate windows, dead
+    code's name tables, the import graph). `update` re-collects only the files that
+    changed and patches the indexes. Per-file detectors are then re-reduced for those
+    files only, and cross-file detectors only when their part of a record changed.
+    """
+
+    def __init__(self, analyzer):
+        self.analyzer = analyzer
+        self.records = analyzer.collect()
+        self.indexes = {d.NAME: d.make_index(analyzer.thresholds) for d in analyzer.detectors if hasattr(d, 'make_index')}
+        self.imports = circular_import.ImportGraph(analyzer.project_path)
+        for file_path, record in self.records.items():
+            self._index(file_path, record)
+        # Per-file detectors' issues by file, in `records` order.
+        self.by_file = {d.NAME: {} for d in analyzer.detectors if getattr(d, 'PER_FILE', False)}
+        self.detector_issues = {d.NAME: self._reduce(d, self.records) for d in analyzer.detectors}
+        self.issues = list(merge_issues(list(self.detector_issues.values())))
+
+    @property
+    def score(self):
+        severity_counts = {}
+        for issue in self.issues:
+            severity_counts[issue['severity']] = severity_counts.get(issue['severity'], 0) + 1
+        return score_from_counts(severity_counts, sum(record.get('loc', 0) for record in self.records.values()))
+
+    def _index(self, file_path, record):
+        for name, index in self.indexes.items():
+            part = record.get(name)
+            if part:
+                index.add(file_path, part)
+            else:
+                index.remove(file_path)
+        self.imports.update(file_path, record.get(circular_import.NAME, ()))
+
+    def _reduce(self, detector, paths):
+        """Re-derives one detector's issues; a per-file detector's only for `paths`."""
+        name = detector.NAME
+        if name in self.by_file:
+            by_file = self.by_file[name]
+            for path in paths:
+                if path in self.records:
+                    by_file[path] = self.analyzer.reduce(detector, {path: self.records[path]})
+                else:
+                    by_file.pop(path, None)
+            return [issue for path in self.records for issue in by_file.get(path, ())]
+        if name in self.indexes:
+            return self.indexes[name].issues()
+        if detector is circular_import:
+            return self.imports.issues()
+        return self.analyzer.reduce(detector, self.records)
+
+    def update(self, changed=(), removed=()):
+        """
+        Applies file changes and returns `(added, resolved)`: the issues that appeared
+        and the issues that went away.
+        """
+        analyzer = self.analyzer
+        collectors = {d.NAME: d.collect for d in analyzer.detectors if hasattr(d, 'collect')}
+        before = {file_path: self.records.get(file_path) for file_path in (*removed, *changed)}
+        for file_path in removed:
+            self.records.pop(file_path, None)
+            for index in self.indexes.values():
+                index.remove(file_path)
+            self.imports.remove(file_path)
+            analyzer.corpus.forget(file_path)
+        for file_path in changed:
+            analyzer.corpus.forget(file_path)
+            record = self.records[file_path] = collect_record(collectors, analyzer.corpus, file_path, analyzer.thresholds)
+            self._index(file_path, record)
+        analyzer.python_files = list(self.records)
+
+        # Adding or removing a file can change any cross-file result, e.g. the module names.
+        reshaped = any((record is None) != (file_path not in self.records) for file_path, record in before.items())
+        for detector in analyzer.detectors:
+            name = detector.NAME
+            if (name in self.by_file or not hasattr(detector, 'collect') or reshaped
+                    or any((record or {}).get(name) != self.records.get(file_path, {}).get(name) for file_path, record in before.items())):
+                self.detector_issues[name] = self._reduce(detector, before)
+        issues, self.issues = self.issues, list(merge_issues(list(self.detector_issues.values())))
+        return _difference(issues, self.issues)
+
+def snapshot(python_files):
+    """Maps each file to its `(mtime_ns, size)`; unreadable files are left out."""
+    stamps = {}
+    for file_path in python_files:
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            continue
+        stamps[file_path] = (stat.st_mtime_ns, stat.st_size)
+    return stamps
+
+def poll_changes(analyzer, stamps):
+    """Re-discovers the project's files and returns `(new_stamps, changed, removed)`."""
+    new_stamps = snapshot(analyzer._get_python_files())
+    changed = [path for path, stamp in new_stamps.items() if stamps.get(path) != stamp]
+    removed = [path for path in stamps if path not in new_stamps]
+    return new_stamps, changed, removed
+
+def watch(analyzer, on_change, interval=0.5):
+    """
+    Runs the full analysis once, then polls the project every `interval` seconds and calls
+    `on_change(session, added, resolved, elapsed)` after every batch of changes. Runs until interrupted.
+    """
+    stamps = snapshot(analyzer.python_files)
+    session = WatchSession(analyzer)
+    on_change(session, session.issues, [], None)
+    while True:
+        time.sleep(interval)
+        stamps, changed, removed = poll_changes(analyzer, stamps)
+        if changed or removed:
+            start = time.perf_counter()
+            added, resolved = session.update(changed, removed)
+            on_change(session, added, resolved, time.perf_counter() - start)
@@ -8,9 +8,9 @@ setup(
     include_package_data=True,
     install_requires=[
         'click',
-        'radon',
         'astroid',
         'vulture',
+        'tomli; python_version < "3.11"',
     ],
     entry_points={
         'console_scripts': [
@@ -0,0 +1,471 @@
+import os
+import subprocess
+import sys
+import time
+import unittest
+from unittest import mock
+
+from base import BaseTestCase
+from projectdoctor.analyzer import Analyzer
+from projectdoctor.budget import KillablePool
+from projectdoctor.corpus import Corpus
+from projectdoctor.gate import Gate
+from projectdoctor.reporter import Reporter
+from projectdoctor.spill import SpillStore
+from projectdoctor.watch import WatchSession, poll_changes, snapshot
+
+def _sleep_for(seconds):
+    time.sleep(seconds)
+    return seconds
+
+def _shared_run(project_path, shared_cache):
+    results = Analyzer(project_path, shared_cache=shared_cache).run()
+    return [(os.path.relpath(i['file'], project_path) if i['file'] else None, i['message'].replace(project_path, '<checkout>'))
+            for i in results['issues']]
+
+class TestAnalyzer(BaseTestCase):
+
+    # --- corpus ---
+    def test_corpus_reads_and_parses_each_file_once(self):
+        self.create_file("pkg/a.py", "import pkg.b\n\ndef f():\n    return 1\n")
+        self.create_file("pkg/b.py", "import pkg.a\n")
+        self.create_file("broken.py", "def (:\n")
+
+        analyzer = Analyzer(self.project_path)
+        analyzer.run()
+        self.assertEqual(analyzer.corpus.reads, 3)
+        self.assertEqual(analyzer.corpus.parses, 3)
+
+    def test_corpus_source_file_views(self):
+        path = self.create_file("crlf.py", "a = 1\r\n\r\n  b = 2  \r\nc")
+        source = Corpus().get(path)
+        self.assertEqual(source.lines, ["a = 1", "", "  b = 2  ", "c"])
+        self.assertEqual(source.line_count, 4)
+        self.assertEqual(source.line_offsets, [0, 6, 7, 17])
+        self.assertEqual(source.stripped_lines, ["a = 1", "", "b = 2", "c"])
+
+    def test_corpus_honours_coding_cookie(self):
+        path = os.path.join(self.project_path, "latin.py")
+        with open(path, 'wb') as f:
+            f.write("# -*- coding: latin-1 -*-\nname = 'café'\n".encode('latin-1'))
+        source = Corpus().get(path)
+        self.assertEqual(source.line_count, 2)
+        self.assertEqual(source.lines[1], "name = 'café'")
+
+    def test_corpus_prefetch_reads_ahead_in_order(self):
+        paths = [self.create_file(f"m{i}.py", f"x = {i}\n" * (i + 1)) for i in range(5)]
+        missing = self.project_path + "/missing.py"
+        corpus = Corpus()
+        seen = []
+        for path in corpus.prefetch(paths + [missing], window=2):
+            seen.append(path)
+            if path != missing:
+                self.assertEqual(corpus.get(path).line_count, paths.index(path) + 1)
+        self.assertEqual(seen, paths + [missing])
+        with self.assertRaises(OSError):
+            corpus.get(missing)
+        self.assertEqual(corpus.reads, 6)
+
+    def test_corpus_remembers_read_errors(self):
+        corpus = Corpus()
+        missing = self.project_path + "/missing.py"
+        for _ in range(2):
+            with self.assertRaises(OSError):
+                corpus.get(missing)
+        self.assertEqual(corpus.reads, 1)
+
+    # --- cache ---
+    def _cached_run(self, thresholds=None):
+        analyzer = Analyzer(self.project_path, thresholds, cache_dir=os.path.join(self.project_path, '.projectdoctor_cache'))
+        return analyzer, analyzer.run()
+
+    def test_cache_skips_unchanged_files(self):
+        common_block = "print('this is common code')\n" * 10
+        self.create_file("mod_a.py", "import mod_b\n" + common_block)
+        self.create_file("mod_b.py", "import mod_a\n" + common_block)
+        self.create_file("unused.py", "import os\n")
+
+        first, first_results = self._cached_run()
+        self.assertEqual(first.cache.misses, 3)
+        second, second_results = self._cached_run()
+        self.assertEqual((second.cache.hits, second.cache.misses), (3, 0))
+        self.assertEqual(second.corpus.reads, 0)
+        self.assertEqual(first_results['issues'], second_results['issues'])
+        self.assertEqual(first_results['total_loc'], second_results['total_loc'])
+
+    def test_cache_reanalyzes_changed_files_only(self):
+        path = self.create_file("mod_a.py", "import mod_b\n")
+        self.create_file("mod_b.py", "x = 1\n")
+        self._cached_run()
+
+        self.create_file("mod_b.py", "import mod_a\n")
+        os.utime(path, ns=(0, 0)) # Touched but identical content is recognized by its hash.
+        analyzer, results = self._cached_run()
+        self.assertEqual((analyzer.cache.hits, analyzer.cache.misses), (1, 1))
+        self.assertTrue(any("Circular import" in i['message'] for i in results['issues']))
+
+    def test_cache_invalidated_by_thresholds(self):
+        self.create_file("main.py", "a = 1\n" * 20)
+        self._cached_run()
+        analyzer, results = self._cached_run({'file_size': {'max_lines': 10}})
+        self.assertEqual(analyzer.cache.hits, 0)
+        self.assertTrue(any("exceeds 10 lines" in i['message'] for i in results['issues']))
+
+    def test_cache_invalidated_by_detector_version(self):
+        self.create_file("main.py", "a = 1\n")
+        self._cached_run()
+        from projectdoctor.detectors import long_function
+        with mock.patch.object(long_function, 'VERSION', long_function.VERSION + 1):
+            analyzer, _ = self._cached_run()
+        self.assertEqual((analyzer.cache.hits, analyzer.cache.misses), (0, 1))
+
+    def test_cache_kept_when_budgets_change(self):
+        self.create_file("main.py", "a = 1\n" * 20)
+        big = self.create_file("big.py", "b = 2\n" * 200)
+        _, results = self._cached_run({'budget': {'max_file_size': 500}})
+        self.assertEqual([entry['file'] for entry in results['quarantine']], [big])
+
+        # Only the file quarantined under the old budget is analyzed again.
+        analyzer, results = self._cached_run({'budget': {'max_file_size': 5000}, 'dead_code': {'timeout': 30}})
+        self.assertEqual((analyzer.cache.hits, analyzer.cache.misses), (1, 1))
+        self.assertEqual(results['quarantine'], [])
+
+    # --- shared cache ---
+    def _checkout(self, name):
+        block = "".join(f"value_{i} = compute({i})\n" for i in range(10))
+        self.create_file(f"{name}/pkg/a.py", "import pkg.b\n" + block + "def f():\n" + "    x = 1\n" * 60)
+        self.create_file(f"{name}/pkg/b.py", "from . import a\nimport os\n" + block)
+        self.create_file(f"{name}/broken.py", "def (:\n")
+        return os.path.join(self.project_path, name)
+
+    def test_shared_cache_serves_identical_files_at_other_paths(self):
+        shared = os.path.join(self.project_path, 'shared')
+        first = Analyzer(self._checkout('ci-1'), shared_cache=shared)
+        first.run()
+        self.assertEqual(first.shared.hits, 0)
+        # Parts of 3 files for the 5 detectors with a per-file step.
+        self.assertEqual(first.shared.misses, 15)
+
+        checkout = self._checkout('ci-2')
+        second = Analyzer(checkout, shared_cache=shared)
+        results = second.run()
+        self.assertEqual((second.shared.hits, second.shared.misses), (15, 0))
+        self.assertEqual(results['issues'], Analyzer(checkout).run()['issues'])
+        self.assertTrue(all(i['file'] is None or i['file'].startswith(checkout) for i in results['issues']))
+
+        third = Analyzer(checkout, {'long_function': {'max_lines': 10}}, shared_cache=shared)
+        third.run()
+        self.assertEqual((third.shared.hits, third.shared.misses), (12, 3))
+
+    def test_shared_cache_concurrent_writers(self):
+        from concurrent.futures import ProcessPoolExecutor
+        shared = os.path.join(self.project_path, 'shared')
+        checkouts = [self._checkout(f"ci-{i}") for i in range(4)]
+        with ProcessPoolExecutor(max_workers=4) as executor:
+            runs = list(executor.map(_shared_run, checkouts, [shared] * 4))
+        self.assertTrue(all(run == runs[0] for run in runs))
+        entries = [name for _, _, files in os.walk(shared) for name in files]
+        self.assertFalse([name for name in entries if name.endswith('.tmp')])
+        self.assertEqual(len(entries), 15)
+        analyzer = Analyzer(checkouts[0], shared_cache=shared)
+        analyzer.run()
+        self.assertEqual(analyzer.shared.misses, 0)
+
+    # --- parallel ---
+    def test_parallel_run_matches_serial_run(self):
+        common_block = "print('this is common code')\n" * 10
+        for i in range(12):
+            self.create_file(f"pkg/mod_{i}.py", f"import pkg.mod_{(i + 1) % 12}\n" + common_block + "def f():\n" + "    x = 1\n" * 60)
+        self.create_file("pkg/broken.py", "def (:\n")
+
+        serial = Analyzer(self.project_path).run()
+        parallel = Analyzer(self.project_path, jobs=3).run()
+        self.assertEqual(serial['issues'], parallel['issues'])
+        self.assertEqual(serial['total_loc'], parallel['total_loc'])
+
+    def test_parallel_run_with_cache(self):
+        for i in range(4):
+            self.create_file(f"mod_{i}.py", "import os\n")
+        cache_dir = os.path.join(self.project_path, '.projectdoctor_cache')
+        first = Analyzer(self.project_path, cache_dir=cache_dir, jobs=2).run()
+        analyzer = Analyzer(self.project_path, cache_dir=cache_dir, jobs=2)
+        self.assertEqual(first['issues'], analyzer.run()['issues'])
+        self.assertEqual(analyzer.cache.hits, 4)
+
+    # --- memory budget ---
+    def test_max_memory_spills_and_matches_in_memory_run(self):
+        common_block = "print('this is common code')\n" * 10
+        for i in range(6):
+            self.create_file(f"pkg/mod_{i}.py", f"import pkg.mod_{(i + 1) % 6}\n" + common_block + f"def unused_{i}():\n" + "    x = 1\n" * 60)
+        self.create_file("pkg/broken.py", "def (:\n")
+
+        for thresholds in ({}, {'duplicate_code': {'mode': 'tokens'}}):
+            in_memory = Analyzer(self.project_path, thresholds).run()
+            with mock.patch.object(SpillStore, 'close', autospec=True, side_effect=SpillStore.close) as close:
+                # A budget this small writes a sorted run every few items.
+                budgeted = Analyzer(self.project_path, thresholds, max_memory=1024).run()
+            self.assertGreater(close.call_args[0][0].spilled_runs, 1)
+            self.assertFalse([r for r in budgeted['records'].values() if 'lines' in r.get('duplicate_code', {})])
+            self.assertEqual(budgeted['issues'], in_memory['issues'])
+            self.assertEqual(budgeted['total_loc'], in_memory['total_loc'])
+
+    # --- budgets ---
+    def test_oversized_file_is_quarantined_without_reading_and_cached(self):
+        self.create_file("small.py", "x = 1\n")
+        big = self.create_file("generated_pb2.py", "x = 1\n" * 1000)
+        thresholds = {'budget': {'max_file_size': 1000}}
+
+        first, results = self._cached_run(thresholds)
+        self.assertEqual(results['quarantine'], [{'file': big, 'reason': "6000 bytes exceeds the 1000-byte file budget"}])
+        self.assertEqual(first.corpus.reads, 1)
+        self.assertFalse(any(i.get('file') == big for i in results['issues']))
+        second, results = self._cached_run(thresholds)
+        self.assertEqual((second.cache.hits, second.corpus.reads), (2, 0))
+        self.assertEqual([entry['file'] for entry in results['quarantine']], [big])
+
+    def test_step_over_time_budget_quarantines_file(self):
+        slow = self.create_file("slow.py", "".join(f"def f_{i}(a, b):\n    return a + b\n" for i in range(3000)))
+        self.create_file("fast.py", "x = 1\n")
+        results = Analyzer(self.project_path, {'dead_code': {'timeout': 0.001}}).run()
+        self.assertEqual(results['quarantine'], [{'file': slow, 'reason': "dead_code took longer than 0.001s"}])
+        self.assertEqual(Analyzer(self.project_path).run()['quarantine'], [])
+
+    def test_killable_pool_kills_stuck_workers(self):
+        pool = KillablePool(_sleep_for, (), workers=2, timeout=0.5)
+        results = dict(pool.map([0, 60, 0.1]))
+        self.assertEqual(results, {0: 0, 60: None, 0.1: 0.1})
+
+    # --- gate ---
+    def _gated_project(self):
+        for i in range(4):
+            self.create_file(f"pkg/mod_{i}.py", f"import pkg.mod_{(i + 1) % 4}\nimport os\n\ndef f():\n" + "    x = 1\n" * 60)
+
+    def test_gate_stops_once_it_cannot_pass(self):
+        self._gated_project()
+        analyzer = Analyzer(self.project_path)
+        results = analyzer.run(Gate(max_issues={'MEDIUM': 2}))
+        self.assertEqual(results['gate']['failures'], ["at least 5 MEDIUM issues, more than the 2 allowed"])
+        self.assertEqual(results['gate']['skipped_detectors'], ['duplicate_code', 'circular_import', 'complexity', 'dead_code'])
+        self.assertFalse(any('dead_code' in record for record in results['records'].values()))
+        self.assertEqual({i['detector'] for i in results['issues']}, {'structure', 'long_function'})
+
+    def test_passing_gate_runs_every_detector(self):
+        self._gated_project()
+        full = Analyzer(self.project_path).run()
+        gated = Analyzer(self.project_path).run(Gate(fail_under=0, max_issues={'HIGH': 10}))
+        self.assertEqual(gated['gate'], {'passed': True, 'failures': [], 'skipped_detectors': []})
+        key = lambda i: (i['detector'], i['file'] or '', i['message'])
+        self.assertEqual(sorted(gated['issues'], key=key), sorted(full['issues'], key=key))
+        self.assertEqual(gated['total_loc'], full['total_loc'])
+
+    def test_gated_run_caches_only_the_stages_it_ran(self):
+        self._gated_project()
+        cache_dir = os.path.join(self.project_path, '.projectdoctor_cache')
+        Analyzer(self.project_path, cache_dir=cache_dir).run(Gate(fail_under=100))
+        analyzer = Analyzer(self.project_path, cache_dir=cache_dir)
+        results = analyzer.run()
+        self.assertEqual(analyzer.cache.hits, 0)
+        self.assertEqual(results['issues'], Analyzer(self.project_path).run()['issues'])
+        analyzer = Analyzer(self.project_path, cache_dir=cache_dir)
+        analyzer.run(Gate(fail_under=0))
+        self.assertEqual(analyzer.cache.misses, 0)
+
+    def test_cli_rejects_bad_gate_and_selection_options(self):
+        from click.testing import CliRunner
+        from projectdoctor.cli import cli
+        self._gated_project()
+        runner = CliRunner()
+        for args in (['--max-issues', 'HGH=0'], ['--fail-under', '50', '--estimate'], ['--only', 'nope'],
+                     ['--shard', '4/3'], ['--thresholds', '{oops']):
+            result = runner.invoke(cli, ['analyze', self.project_path, '--no-cache', *args])
+            self.assertEqual(result.exit_code, 2, args)
+            self.assertIn("Error:", result.output)
+        result = runner.invoke(cli, ['analyze', self.project_path, '--no-cache', '--max-issues', 'MEDIUM=2'])
+        self.assertEqual(result.exit_code, 1)
+
+    # --- detector selection ---
+    def test_only_and_skip_select_detectors(self):
+        self.create_file("big.py", "a = 1\n" * 900)
+        analyzer = Analyzer(self.project_path, only=['file_size', 'structure'], skip=['structure'])
+        self.assertEqual([d.NAME for d in analyzer.detectors], ['file_size'])
+        self.assertEqual([i['message'] for i in analyzer.run()['issues']], ['File exceeds 800 lines (has 900 lines).'])
+        with self.assertRaises(ValueError):
+            Analyzer(self.project_path, only=['nope'])
+
+    def test_only_does_not_import_other_detectors(self):
+        script = ("import sys; from projectdoctor.analyzer import Analyzer; "
+                  f"Analyzer({self.project_path!r}, only=['file_size', 'structure']).run(); "
+                  "print('vulture' in sys.modules, 'projectdoctor.detectors.dead_code' in sys.modules)")
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        output = subprocess.run([sys.executable, '-c', script], cwd=root, capture_output=True, text=True, check=True).stdout
+        self.assertEqual(output.split(), ['False', 'False'])
+
+    def test_cache_entries_from_partial_run_not_reused_by_full_run(self):
+        self.create_file("mod.py", "import os\n")
+        cache_dir = os.path.join(self.project_path, '.projectdoctor_cache')
+        Analyzer(self.project_path, cache_dir=cache_dir, only=['file_size']).run()
+        analyzer = Analyzer(self.project_path, cache_dir=cache_dir)
+        analyzer.run()
+        self.assertEqual((analyzer.cache.hits, analyzer.cache.misses), (0, 1))
+        partial = Analyzer(self.project_path, cache_dir=cache_dir, only=['dead_code'])
+        partial.run()
+        self.assertEqual(partial.cache.hits, 1)
+
+    # --- profile ---
+    def test_profile_reports_timings(self):
+        for i in range(3):
+            self.create_file(f"mod_{i}.py", "import os\n\ndef f():\n    return os.sep\n")
+        results = Analyzer(self.project_path, profile=True, jobs=2).run()
+        timings = results['timings']
+        collect = timings['stages']['collect']
+        self.assertEqual((collect['files'], collect['reads'], collect['parses']), (3, 3, 3))
+        self.assertGreater(collect['bytes_read'], 0)
+        self.assertEqual(timings['detectors']['long_function']['collect']['files'], 3)
+        self.assertIn('reduce', timings['detectors']['structure'])
+        self.assertIsNone(timings['total']['peak_memory_kb'])
+        self.assertNotIn('timings', Analyzer(self.project_path).run())
+
+    def test_profile_memory_traces_peaks_only_when_asked(self):
+        import tracemalloc
+        self.create_file("mod.py", "x = 1\n")
+        results = Analyzer(self.project_path, profile=True).run()
+        self.assertIsNone(results['timings']['stages']['collect']['peak_memory_kb'])
+        results = Analyzer(self.project_path, profile_memory=True).run()
+        self.assertIsNotNone(results['timings']['stages']['collect']['peak_memory_kb'])
+        self.assertIsNotNone(results['timings']['total']['peak_memory_kb'])
+        self.assertFalse(tracemalloc.is_tracing())
+
+    def test_profile_dir_dumps_cprofile_per_detector(self):
+        self.create_file("mod.py", "x = 1\n")
+        profile_dir = os.path.join(self.project_path, 'profiles')
+        Analyzer(self.project_path, profile_dir=profile_dir, jobs=2).run()
+        self.assertIn('dead_code.prof', os.listdir(profile_dir))
+        self.assertIn('complexity.prof', os.listdir(profile_dir))
+
+    # --- since ---
+    def _git(self, *args):
+        subprocess.run(['git', *args], cwd=self.project_path, check=True, capture_output=True)
+
+    def _commit_all(self):
+        self._git('add', '-A')
+        self._git('-c', 'user.name=t', '-c', 'user.email=t@t', 'commit', '-q', '-m', 'snapshot')
+
+    def test_since_expands_to_importers_and_cycles(self):
+        self._git('init', '-q')
+        self.create_file("app/core.py", "x = 1\n")
+        self.create_file("app/user.py", "import app.core\n")
+        self.create_file("app/a.py", "import app.b\n")
+        self.create_file("app/b.py", "import app.c\n")
+        self.create_file("app/c.py", "x = 1\n")
+        self.create_file("app/other.py", "import os\n")
+        self._commit_all()
+
+        self.create_file("app/core.py", "x = 2\n")
+        self.create_file("app/c.py", "import app.a\n")
+        self.create_file("app/new.py", "import app.other\n")
+        analyzer = Analyzer(self.project_path, since='HEAD')
+        names = sorted(os.path.relpath(p, self.project_path) for p in analyzer.python_files)
+        self.assertEqual(names, [os.path.join('app', n) for n in ['a.py', 'b.py', 'c.py', 'core.py', 'new.py', 'user.py']])
+        issues = analyzer.run()['issues']
+        self.assertTrue(any("app.a -> app.b -> app.c -> app.a" in i['message'] for i in issues))
+
+    def test_since_reduces_over_every_file(self):
+        self._git('init', '-q')
+        self.create_file("models.py", "class Model:\n    def save(self):\n        pass\n\ndef make():\n    return Model()\n")
+        self.create_file("factory.py", "from models import make\n\ndef build():\n    return make()\n")
+        self.create_file("views.py", "import factory\n\nfactory.build().save()\n")
+        self._commit_all()
+
+        self.create_file("models.py", "class Model:\n    def save(self):\n        return 1\n\ndef make():\n    return Model()\n")
+        thresholds = {'dead_code': {'min_confidence': 60}}
+        full = Analyzer(self.project_path, thresholds).run()
+        analyzer = Analyzer(self.project_path, thresholds, since='HEAD')
+        self.assertNotIn(os.path.join(self.project_path, 'views.py'), analyzer.python_files)
+        results = analyzer.run()
+        # Every file once for the cross-file detectors, then the two affected ones for the per-file detectors.
+        self.assertEqual(analyzer.corpus.parses, 5)
+        self.assertFalse([i for i in results['issues'] if i['detector'] == 'dead_code'])
+        self.assertEqual(results['total_loc'], full['total_loc'])
+        self.assertEqual(Reporter(results).score, Reporter(full).score)
+        self.assertTrue(all(i['file'] in analyzer.python_files for i in results['issues']))
+
+    def test_since_with_unknown_ref(self):
+        from projectdoctor.changes import GitError
+        self._git('init', '-q')
+        self.create_file("main.py", "x = 1\n")
+        self._commit_all()
+        with self.assertRaises(GitError):
+            Analyzer(self.project_path, since='no-such-ref')
+
+    # --- watch ---
+    def test_watch_session_updates_incrementally(self):
+        block = "".join(f"value_{i} = compute({i})\n" for i in range(10))
+        self.create_file("mod_a.py", "import mod_b\n" + block)
+        path_b = self.create_file("mod_b.py", "x = 1\n")
+        analyzer = Analyzer(self.project_path)
+        session = WatchSession(analyzer)
+        self.assertFalse(any("Circular" in i['message'] or "Duplicate" in i['message'] for i in session.issues))
+
+        stamps = snapshot(analyzer.python_files)
+        self.create_file("mod_b.py", "import mod_a\n" + block)
+        path_c = self.create_file("mod_c.py", "y = 2\n")
+        stamps, changed, removed = poll_changes(analyzer, stamps)
+        self.assertEqual((sorted(changed), removed), ([path_b, path_c], []))
+        added, resolved = session.update(changed, removed)
+        kinds = {i['message'].split(':')[0] for i in added}
+        self.assertLessEqual({"Circular import detected", "Duplicate code block (lines 2-11) also found in"}, kinds)
+        self.assertEqual(session.issues, Analyzer(self.project_path).run()['issues'])
+
+        os.remove(path_b)
+        stamps, changed, removed = poll_changes(analyzer, stamps)
+        added, resolved = session.update(changed, removed)
+        kinds = {i['message'].split(':')[0] for i in resolved}
+        self.assertLessEqual({"Circular import detected", "Duplicate code block (lines 2-11) also found in"}, kinds)
+        self.assertEqual(session.issues, Analyzer(self.project_path).run()['issues'])
+
+    def test_watch_session_rematches_copies_of_a_changed_file(self):
+        block = "".join(f"value_{i} = compute({i})\n" for i in range(10))
+        path_a = self.create_file("a.py", block)
+        self.create_file("b.py", "x = 1\n" + block)
+        self.create_file("c.py", "y = 2\n" + block)
+        session = WatchSession(Analyzer(self.project_path))
+        pairs = lambda issues: sorted((os.path.basename(i['file']), os.path.basename(i['message'].split(': ')[1].split(' (')[0]))
+                                      for i in issues if i['detector'] == 'duplicate_code')
+        self.assertEqual(pairs(session.issues), [('a.py', 'b.py'), ('a.py', 'c.py')])
+
+        # b.py and c.py were only matched against a.py, so dropping its copy matches them with each other.
+        self.create_file("a.py", "z = 3\n")
+        added, resolved = session.update([path_a])
+        self.assertEqual(pairs(added), [('b.py', 'c.py')])
+        self.assertEqual(pairs(resolved), [('a.py', 'b.py'), ('a.py', 'c.py')])
+        self.assertEqual(session.issues, Analyzer(self.project_path).run()['issues'])
+
+        self.create_file("a.py", block)
+        added, resolved = session.update([path_a])
+        self.assertEqual(pairs(added), [('a.py', 'b.py'), ('a.py', 'c.py')])
+        self.assertEqual(pairs(resolved), [('b.py', 'c.py')])
+        self.assertEqual(session.issues, Analyzer(self.project_path).run()['issues'])
+
+    def test_watch_session_rechecks_definitions_used_elsewhere(self):
+        path_a = self.create_file("lib.py", "def helper():\n    return 1\n\ndef other():\n    return 2\n")
+        path_b = self.create_file("app.py", "x = 1\n")
+        thresholds = {'dead_code': {'min_confidence': 60}}
+        session = WatchSession(Analyzer(self.project_path, thresholds))
+        dead = lambda issues: sorted(i['name'] for i in issues if i['detector'] == 'dead_code')
+        self.assertEqual(dead(session.issues), ['helper', 'other', 'x'])
+
+        # Only app.py changes, yet lib.py's `helper` stops being dead code.
+        self.create_file("app.py", "from lib import helper\nhelper()\n")
+        added, resolved = session.update([path_b])
+        self.assertEqual(dead(resolved), ['helper', 'x'])
+        self.assertEqual(dead(added), [])
+        self.assertEqual(session.issues, Analyzer(self.project_path, thresholds).run()['issues'])
+
+        self.create_file("app.py", "x = 1\n")
+        added, resolved = session.update([path_b])
+        self.assertEqual(dead(added), ['helper', 'x'])
+        self.assertEqual(session.issues, Analyzer(self.project_path, thresholds).run()['issues'])
+        self.assertIn(path_a, {i['file'] for i in added})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+import os
+import unittest
+
+from base import BaseTestCase
+from projectdoctor import bench
+from projectdoctor.analyzer import Analyzer
+
+class TestBench(BaseTestCase):
+    def test_generate_project_shapes_workload(self):
+        bench.generate_project(self.project_path, files=20, function_lines=60, import_shape='cycles', duplicate_ratio=1.0)
+        modules = [f for f in os.listdir(os.path.join(self.project_path, 'synthetic')) if f.startswith('mod_')]
+        self.assertEqual(len(modules), 20)
+
+        messages = [i['message'] for i in Analyzer(self.project_path).run()['issues']]
+        self.assertEqual(sum("Circular import" in m for m in messages), 4)
+        self.assertTrue(any("is too long" in m for m in messages))
+        self.assertTrue(any("Duplicate code block" in m for m in messages))
+        self.assertFalse(any("missing a" in m for m in messages))
+
+    def test_generate_project_is_repeatable(self):
+        other = os.path.join(self.project_path, 'other')
+        bench.generate_project(os.path.join(self.project_path, 'one'), files=5, seed=3)
+        bench.generate_project(other, files=5, seed=3)
+        for name in ('mod_000000.py', 'mod_000004.py'):
+            with open(os.path.join(self.project_path, 'one', 'synthetic', name)) as a, open(os.path.join(other, 'synthetic', name)) as b:
+                self.assertEqual(a.read(), b.read())
+
+    def test_run_benchmark_and_compare(self):
+        bench.generate_project(self.project_path, files=10)
+        results = bench.run_benchmark(self.project_path, targets=['file_size', 'analyzer'])
+        self.assertEqual(set(results), {'file_size', 'analyzer'})
+        self.assertEqual(results['analyzer']['files'], 11)
+        self.assertGreater(results['analyzer']['wall_seconds'], 0)
+
+        baseline = bench.make_baseline(results, files=10)
+        self.assertEqual(bench.compare(baseline, results), [])
+        slower = {'analyzer': dict(results['analyzer'], wall_seconds=results['analyzer']['wall_seconds'] * 2)}
+        self.assertEqual([r[:2] for r in bench.compare(baseline, slower)], [('analyzer', 'wall_seconds')])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -54,6 +54,48 @@ class TestDetectors(BaseTestCase):
         self.assertEqual(len(issues), 1)
         self.assertIn("high cyclomatic complexity", issues[0]['message'])
 
+    def test_complexity_counts_like_radon(self):
+        source = (
+            "def branchy(a, b=[x for x in range(3) if x]):\n"
+            "    assert a and b\n"
+            "    for i in a:\n"
+            "        if i or b and a: continue\n"
+            "    else:\n"
+            "        pass\n"
+            "    try:\n"
+            "        y = [j for j in a if j if j > 1]\n"
+            "    except ValueError:\n"
+            "        pass\n"
+            "    except KeyError:\n"
+            "        pass\n"
+            "    else:\n"
+            "        y = 1 if a else 2\n"
+            "    def inner():\n"
+            "        if a: return 1\n"
+            "    while a:\n"
+            "        match a:\n"
+            "            case 1: pass\n"
+            "            case _: pass\n"
+            "    return inner\n"
+            "\n"
+            "class Box:\n"
+            "    def method(self):\n"
+            "        return 1 if self else 0\n"
+        )
+        f1 = self.create_file("branchy.py", source)
+        issues = complexity.analyze(self.project_path, {'complexity': {'max_complexity': 1}}, [f1])
+        messages = [i['message'] for i in issues]
+        self.assertEqual(messages, [
+            "Function 'branchy' on line 1 has high cyclomatic complexity (16).",
+            "Function 'method' on line 24 has high cyclomatic complexity (2).",
+        ])
+        try:
+            from radon.complexity import cc_visit
+        except ImportError:
+            return
+        expected = {(r.name, r.complexity) for r in cc_visit(source) if hasattr(r, 'is_method')}
+        self.assertEqual(expected, {('branchy', 16), ('method', 2)})
+
     # --- duplicate_code ---
     def test_duplicate_code_detector(self):
         common_block = "print('this is common code')\n" * 10
@@ -64,6 +106,68 @@ class TestDetectors(BaseTestCase):
         self.assertEqual(len(issues), 1)
         self.assertIn("Duplicate code block", issues[0]['message'])
 
+    def test_duplicate_code_merges_windows_into_clone_region(self):
+        block = "".join(f"value_{i} = compute({i})\n" for i in range(20))
+        f1 = self.create_file("a.py", "import os\n\n" + block)
+        f2 = self.create_file("b.py", block + "\nprint('done')\n")
+
+        issues = duplicate_code.analyze(self.project_path, {}, [f1, f2])
+        self.assertEqual(len(issues), 1)
+        self.assertEqual(issues[0]['file'], f1)
+        self.assertIn("(lines 3-22) also found in:", issues[0]['message'])
+        self.assertTrue(issues[0]['message'].endswith(f"{f2} (lines 1-20)."))
+
+    def test_duplicate_code_reports_each_clone_region(self):
+        first = "".join(f"first_{i} = {i}\n" for i in range(10))
+        second = "".join(f"second_{i} = {i}\n" for i in range(10))
+        f1 = self.create_file("a.py", first + "x = 'a'\n" + second)
+        f2 = self.create_file("b.py", second + "y = 'b'\n" + first)
+
+        issues = duplicate_code.analyze(self.project_path, {}, [f1, f2])
+        messages = sorted(i['message'] for i in issues)
+        self.assertEqual(len(messages), 2)
+        self.assertIn("(lines 1-10) also found in:", messages[0])
+        self.assertIn("(lines 12-21) also found in:", messages[1])
+
+    def test_duplicate_code_ignores_short_and_same_file_repeats(self):
+        block = "".join(f"value_{i} = {i}\n" for i in range(10))
+        f1 = self.create_file("a.py", block + block)
+        f2 = self.create_file("b.py", "".join(f"value_{i} = {i}\n" for i in range(5)))
+
+        issues = duplicate_code.analyze(self.project_path, {}, [f1, f2])
+        self.assertEqual(len(issues), 0)
+
+    def test_duplicate_code_tokens_mode_finds_renamed_copies(self):
+        body = ("def process(items, limit=10):\n    total = 0\n    for item in items:\n"
+                "        if item.value > limit:\n            total += item.value * 2\n        else:\n            total -= 1\n"
+                "    result = {'total': total, 'count': len(items)}\n    print('done', result)\n    return result\n")
+        renamed = body.replace('items', 'records').replace('item', 'rec').replace('total', 'acc').replace('10', '25').replace('done', 'finished')
+        f1 = self.create_file("a.py", "import os\n\n" + body)
+        f2 = self.create_file("b.py", "x = 1\n" + renamed)
+        f3 = self.create_file("c.py", "def other(x):\n    return [y for y in x if y]\n")
+
+        self.assertEqual(duplicate_code.analyze(self.project_path, {}, [f1, f2, f3]), [])
+        issues = duplicate_code.analyze(self.project_path, {'duplicate_code': {'mode': 'tokens'}}, [f1, f2, f3])
+        self.assertEqual(len(issues), 1)
+        self.assertEqual(issues[0]['file'], f1)
+        self.assertIn(f"also found in: {f2}", issues[0]['message'])
+
+    def test_duplicate_code_tokens_mode_finds_copies_of_exactly_min_tokens(self):
+        body = ("def scale(values, factor):\n    out = []\n    for v in values:\n        if v > 0:\n"
+                "            out.append(v * factor)\n    out.sort()\n    return out\n")
+        renamed = ("def scale(items, k):\n    res = []\n    for x in items:\n        if x > 7:\n"
+                   "            res.append(x * k)\n    res.sort()\n    return res\n")
+        self.assertEqual(len(list(duplicate_code._normalized_tokens(body))), 50)
+        f1 = self.create_file("a.py", body + "while True:\n    break\n")
+        f2 = self.create_file("b.py", renamed + "class B:\n    pass\n")
+
+        thresholds = {'duplicate_code': {'mode': 'tokens', 'min_tokens': 50}}
+        issues = duplicate_code.analyze(self.project_path, thresholds, [f1, f2])
+        self.assertEqual(len(issues), 1)
+        self.assertIn(f"also found in: {f2}", issues[0]['message'])
+        thresholds['duplicate_code']['min_tokens'] = 100
+        self.assertEqual(duplicate_code.analyze(self.project_path, thresholds, [f1, f2]), [])
+
     # --- structure ---
     def test_structure_detector_no_tests(self):
         self.create_file("some_code.py")
@@ -127,6 +231,22 @@ main()
         # Ensure the used function is NOT in the list
         self.assertFalse(any("'public_api_function'" in m for m in messages), "Incorrectly flagged a used function as dead")
 
+    def test_dead_code_issues_are_structured(self):
+        f = self.create_file("odd:dir/mod.py", "import os\n\ndef used():\n    return 1\n\nused()\n")
+        issues = dead_code.analyze(self.project_path, {}, [f])
+        self.assertEqual(len(issues), 1)
+        issue = issues[0]
+        self.assertEqual(issue['file'], f)
+        self.assertEqual((issue['line'], issue['name'], issue['type'], issue['confidence']), (1, 'os', 'import', 90))
+        self.assertEqual(issue['message'], "Potential dead code on line 1: unused import 'os' (90% confidence)")
+
+    def test_dead_code_honours_type_comments_and_vulture_whitelists(self):
+        f = self.create_file("mod.py", (
+            "import threading\nfrom typing import List\n\n\nclass Foo:\n    pass\n\n\n"
+            "def run(items):\n    # type: (List[Foo]) -> None\n"
+            "    t = threading.Thread(target=print)\n    t.daemon = True\n    t.start()\n    return items\n\n\nrun([])\n"))
+        self.assertEqual(dead_code.analyze(self.project_path, {'dead_code': {'min_confidence': 0}}, [f]), [])
+
     # --- circular_import ---
     def test_circular_import_detector_direct(self):
         f_a = self.create_file("mod_a.py", "import mod_b")
@@ -146,6 +266,31 @@ main()
         self.assertEqual(len(issues), 1)
         self.assertIn("mod_x -> mod_y -> mod_z -> mod_x", issues[0]['message'])
 
+    def test_circular_import_detector_relative(self):
+        f_a = self.create_file("pkg/a.py", "from .b import helper")
+        f_b = self.create_file("pkg/b.py", "from pkg.a import other")
+
+        issues = circular_import.analyze(self.project_path, {}, [f_a, f_b])
+        self.assertEqual(len(issues), 1)
+
+    def test_circular_import_detector_one_issue_per_component(self):
+        f_a = self.create_file("mod_a.py", "import mod_b\nimport mod_c")
+        f_b = self.create_file("mod_b.py", "import mod_a\nimport mod_c")
+        f_c = self.create_file("mod_c.py", "import mod_a")
+        f_s = self.create_file("mod_s.py", "import mod_s")
+
+        issues = circular_import.analyze(self.project_path, {}, [f_a, f_b, f_c, f_s])
+        messages = sorted(i['message'] for i in issues)
+        self.assertEqual(len(messages), 2)
+        self.assertIn("mod_a -> mod_b -> mod_a (3 modules are tangled in this cycle: mod_a, mod_b, mod_c)", messages[0])
+        self.assertIn("mod_s -> mod_s", messages[1])
+
+    def test_circular_import_detector_long_chain(self):
+        files = [self.create_file(f"m{i:05}.py", f"import m{(i + 1) % 3000:05}") for i in range(3000)]
+        issues = circular_import.analyze(self.project_path, {}, files)
+        self.assertEqual(len(issues), 1)
+        self.assertTrue(issues[0]['message'].startswith("Circular import detected: m00000 -> m00001 -> "))
+
     def test_circular_import_detector_no_cycle(self):
         f_a = self.create_file("app/main.py", "from app.utils import helper")
         f_b = self.create_file("app/utils.py", "import os")
@@ -0,0 +1,49 @@
+import os
+import subprocess
+import unittest
+
+from base import BaseTestCase
+from projectdoctor import discovery
+from projectdoctor.analyzer import Analyzer
+
+class TestDiscovery(BaseTestCase):
+    def _layout(self):
+        for path in ("main.py", "pkg/__init__.py", "pkg/core.py", "pkg/gen/out.py", "pkg/gen/keep.py",
+                     "build/lib/main.py", "venv/lib/site.py", "vendor/lib.py", "docs/conf.py", "a.txt"):
+            self.create_file(path, "x = 1\n")
+        self.create_file(".gitignore", "# generated\n/docs/\n")
+        self.create_file("pkg/.gitignore", "gen/*\n!gen/keep.py\n")
+
+    def _relative(self, python_files):
+        return [os.path.relpath(path, self.project_path).replace(os.sep, '/') for path in python_files]
+
+    def test_walk_honours_gitignore_and_excludes(self):
+        self._layout()
+        found = self._relative(discovery.discover(self.project_path, ['vendor/'], use_git=False))
+        self.assertEqual(found, ["main.py", "pkg/__init__.py", "pkg/core.py", "pkg/gen/keep.py"])
+
+    def test_negated_exclude_reincludes_default(self):
+        self._layout()
+        found = self._relative(discovery.discover(self.project_path, ['!build/'], use_git=False))
+        self.assertIn("build/lib/main.py", found)
+
+    def test_git_listing_matches_walk(self):
+        self._layout()
+        try:
+            subprocess.run(['git', 'init', '-q'], cwd=self.project_path, check=True, capture_output=True)
+        except (OSError, subprocess.CalledProcessError):
+            self.skipTest("git is not available")
+        self.create_file("pkg/tracked_then_deleted.py")
+        subprocess.run(['git', 'add', 'main.py', 'pkg/tracked_then_deleted.py'], cwd=self.project_path, check=True)
+        os.remove(os.path.join(self.project_path, "pkg/tracked_then_deleted.py"))
+        walked = discovery.walk_python_files(self.project_path, discovery.parse_patterns(discovery.DEFAULT_EXCLUDES + ('vendor/',)))
+        self.assertEqual(discovery.discover(self.project_path, ['vendor/']), walked)
+
+    def test_pyproject_excludes(self):
+        self._layout()
+        self.create_file("pyproject.toml", "[tool.projectdoctor]\nexclude = [\"pkg/core.py\"]\n")
+        found = self._relative(Analyzer(self.project_path, exclude=['vendor']).python_files)
+        self.assertEqual(found, ["main.py", "pkg/__init__.py", "pkg/gen/keep.py"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+
+from base import BaseTestCase
+from projectdoctor.analyzer import Analyzer
+from projectdoctor.estimate import estimate_score
+from projectdoctor.reporter import Reporter
+
+PER_FILE = ['file_size', 'long_function', 'complexity', 'structure']
+
+class TestEstimate(BaseTestCase):
+    def _project(self):
+        for package in ('api', 'core', 'utils'):
+            for i in range(20):
+                body = "def f():\n" + "    x = 1\n" * (70 if i % 4 == 0 else 10)
+                self.create_file(f"{package}/mod_{i}.py", body + "y = 2\n" * (i * 15))
+        self.create_file("tests/test_x.py", "x = 1\n")
+        self.create_file("pyproject.toml", "")
+
+    def test_full_sample_matches_exact_score(self):
+        self._project()
+        exact = Reporter(Analyzer(self.project_path, only=PER_FILE).run()).score
+        result = estimate_score(Analyzer(self.project_path, only=PER_FILE), tolerance=0)
+        self.assertEqual(result['sampled_files'], result['total_files'])
+        self.assertEqual(result['score'], exact)
+        self.assertEqual(result['interval'], [exact, exact])
+
+    def test_estimate_stops_early_and_covers_exact_score(self):
+        self._project()
+        exact = Reporter(Analyzer(self.project_path, only=PER_FILE).run()).score
+        result = estimate_score(Analyzer(self.project_path), tolerance=30)
+        self.assertLess(result['sampled_files'], result['total_files'])
+        low, high = result['interval']
+        self.assertLessEqual(low, exact + 1)
+        self.assertGreaterEqual(high, exact - 1)
+        self.assertEqual(result['skipped_detectors'], ['duplicate_code', 'circular_import', 'dead_code'])
+
+    def test_many_directories_do_not_force_a_full_sample(self):
+        for i in range(120):
+            body = "def f():\n" + "    x = 1\n" * (60 if i % 10 == 0 else 10)
+            self.create_file(f"pkg_{i // 2}/mod_{i % 2}.py", body + "y = 2\n" * 700)
+        exact = Reporter(Analyzer(self.project_path, only=PER_FILE).run()).score
+        result = estimate_score(Analyzer(self.project_path, only=PER_FILE))
+        self.assertLess(result['sampled_files'], result['total_files'])
+        low, high = result['interval']
+        self.assertLessEqual(low, exact)
+        self.assertGreaterEqual(high, exact)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+import json
+import unittest
+
+from base import BaseTestCase
+from projectdoctor.analyzer import Analyzer
+from projectdoctor.issue import Issue, Severity, merge_issues
+from projectdoctor.reporter import Reporter
+
+class TestIssue(BaseTestCase):
+    def test_issue_reads_like_a_dict(self):
+        issue = Issue('long_function', Severity.MEDIUM, 'a.py', "Function '{}' on line {} is too long ({} lines).", ('f', 3, 61), 3, 61)
+        self.assertEqual(issue['severity'], 'MEDIUM')
+        self.assertEqual(issue['message'], "Function 'f' on line 3 is too long (61 lines).")
+        self.assertEqual((issue['line'], issue.get('value'), issue.get('name', '-')), (3, 61, '-'))
+        self.assertEqual(issue.to_dict(), {'file': 'a.py', 'severity': 'MEDIUM', 'message': issue.message,
+                                           'detector': 'long_function', 'line': 3, 'value': 61})
+        self.assertEqual(Issue.from_dict(issue.to_dict()), issue)
+
+    def test_from_dict_accepts_any_case_and_unknown_severities(self):
+        self.assertEqual(Issue.from_dict({'severity': 'high', 'message': "m"}, 'plugin').severity, Severity.HIGH)
+        self.assertEqual(Issue.from_dict({'severity': 'Medium', 'message': "m"}).severity, Severity.MEDIUM)
+        issue = Issue.from_dict({'severity': 'INFO', 'message': "m", 'file': 'a.py'}, 'plugin')
+        self.assertEqual((issue['severity'], issue.file, issue.detector), ('LOW', 'a.py', 'plugin'))
+
+    def test_merge_issues_orders_by_severity_then_file(self):
+        low = Issue('x', Severity.LOW, 'a.py', "low")
+        high_b = Issue('x', Severity.HIGH, 'b.py', "high b")
+        high_a = Issue('y', Severity.HIGH, 'a.py', "high a")
+        merged = list(merge_issues([[low, high_b], [high_a]]))
+        self.assertEqual([i.message for i in merged], ["high a", "high b", "low"])
+
+    def test_json_report_exposes_line_and_metric(self):
+        self.create_file("mod.py", "def f():\n" + "    x = 1\n" * 60)
+        report = json.loads(Reporter(Analyzer(self.project_path).run()).to_json())
+        issue = next(i for i in report['issues'] if i.get('detector') == 'long_function')
+        self.assertEqual((issue['line'], issue['value']), (1, 61))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import os
+import subprocess
+import sys
+import unittest
+
+from base import BaseTestCase
+from projectdoctor.analyzer import Analyzer
+from projectdoctor.partial import PartialError, merge_partials, parse_shard, write_partial
+from projectdoctor.reporter import Reporter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class TestPartial(BaseTestCase):
+    def _project(self):
+        common_block = "print('this is common code')\n" * 10
+        for i in range(9):
+            self.create_file(f"pkg/mod_{i}.py", f"import pkg.mod_{(i + 1) % 9}\n" + common_block + f"def unused_{i}():\n" + "    x = 1\n" * 60)
+        self.create_file("pkg/__init__.py")
+
+    def test_shards_partition_the_files(self):
+        self._project()
+        every = Analyzer(self.project_path).python_files
+        shards = [Analyzer(self.project_path, shard=(i, 3)).python_files for i in (1, 2, 3)]
+        self.assertEqual(sorted(sum(shards, [])), sorted(every))
+        self.assertEqual(len(set(sum(shards, []))), len(every))
+
+    def test_merged_shards_match_single_run(self):
+        self._project()
+        out_dir = os.path.join(self.project_path, 'partials')
+        os.makedirs(out_dir)
+        # Each shard runs in its own process, standing in for a separate machine.
+        nodes = [subprocess.Popen([sys.executable, '-m', 'projectdoctor.cli', 'analyze', self.project_path, '--no-cache',
+                                   '--shard', f'{i}/3', '--emit-partial', os.path.join(out_dir, f'{i}.pdpart')],
+                                  cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL) for i in (1, 2, 3)]
+        self.assertEqual([node.wait() for node in nodes], [0, 0, 0])
+
+        merged = merge_partials([os.path.join(out_dir, f'{i}.pdpart') for i in (3, 1, 2)])
+        single = Analyzer(self.project_path).run()
+        self.assertEqual(merged['issues'], single['issues'])
+        self.assertEqual(Reporter(merged).score, Reporter(single).score)
+        self.assertTrue(any("Circular import" in i['message'] for i in merged['issues']))
+
+    def test_missing_shard_is_an_error(self):
+        self._project()
+        filename = os.path.join(self.project_path, '1.pdpart')
+        write_partial(Analyzer(self.project_path, shard=(1, 2)), filename)
+        with self.assertRaisesRegex(PartialError, r"missing \[2\]"):
+            merge_partials([filename])
+
+    def test_parse_shard(self):
+        self.assertEqual(parse_shard('2/4'), (2, 4))
+        for value in ('0/4', '5/4', 'x'):
+            with self.assertRaises(ValueError):
+                parse_shard(value)
+
+if __name__ == '__main__':
+    unittest.main()
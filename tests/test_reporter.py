@@ -0,0 +1,75 @@
+import io
+import json
+import unittest
+
+from base import BaseTestCase
+from projectdoctor.analyzer import Analyzer
+from projectdoctor.gate import Gate
+from projectdoctor.reporter import Reporter
+
+class TestReporter(BaseTestCase):
+    def _project_with_issues(self):
+        self.create_file("mod_a.py", "import mod_b\n" + "a = 1\n" * 900)
+        self.create_file("mod_b.py", "import mod_a\n\ndef f():\n" + "    print('line')\n" * 60)
+
+    def test_stream_matches_run(self):
+        self._project_with_issues()
+        results = Analyzer(self.project_path).run()
+        streamed = Analyzer(self.project_path).stream()
+        self.assertEqual(list(streamed['issues']), results['issues'])
+        self.assertEqual(sum(streamed['severity_counts'].values()), len(results['issues']))
+        self.assertEqual([i['severity'] for i in results['issues']][:2], ['HIGH', 'MEDIUM'])
+
+    def test_streamed_json_matches_buffered_json(self):
+        self._project_with_issues()
+        buffered = Reporter(Analyzer(self.project_path).run())
+        streamed = Reporter(Analyzer(self.project_path).stream())
+        out = io.StringIO()
+        streamed.write_json(out)
+        self.assertEqual(out.getvalue(), buffered.to_json())
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['issue_count'], len(report['issues']))
+        self.assertEqual(report['maintainability_score'], buffered.score)
+
+    def test_jsonl_output(self):
+        self._project_with_issues()
+        reporter = Reporter(Analyzer(self.project_path).stream())
+        out = io.StringIO()
+        reporter.write_jsonl(out)
+        lines = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(lines[-1], {'maintainability_score': reporter.score, 'issue_count': reporter.issue_count})
+        self.assertEqual(len(lines) - 1, reporter.issue_count)
+        self.assertTrue(all('message' in issue for issue in lines[:-1]))
+
+    def test_profile_timings_in_json_and_cli(self):
+        self._project_with_issues()
+        results = Analyzer(self.project_path, profile=True).run()
+        out = io.StringIO()
+        Reporter(results).write_json(out)
+        self.assertEqual(json.loads(out.getvalue())['timings'], results['timings'])
+        out = io.StringIO()
+        Reporter(results).write_cli(out)
+        self.assertIn("duplicate_code.collect", out.getvalue())
+        self.assertIn("cache misses", out.getvalue())
+
+    def test_gate_verdict_in_reports(self):
+        self._project_with_issues()
+        reporter = Reporter(Analyzer(self.project_path).stream(Gate(max_issues={'HIGH': 0})))
+        out = io.StringIO()
+        reporter.write_json(out)
+        gate = json.loads(out.getvalue())['gate']
+        self.assertFalse(gate['passed'])
+        self.assertIn('dead_code', gate['skipped_detectors'])
+        out = io.StringIO()
+        Reporter(Analyzer(self.project_path).stream(Gate(fail_under=0))).write_cli(out)
+        self.assertIn("Gate passed.", out.getvalue())
+
+    def test_empty_report(self):
+        reporter = Reporter({'issues': iter(()), 'python_files': [], 'total_loc': 0, 'severity_counts': {}})
+        out = io.StringIO()
+        reporter.write_cli(out)
+        self.assertIn("No issues detected", out.getvalue())
+        self.assertIn("100/100", out.getvalue())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import io
+import json
+import unittest
+
+from base import BaseTestCase
+from projectdoctor.analyzer import Analyzer
+from projectdoctor.server import METHOD_NOT_FOUND, Server, serve
+
+LONG_FUNCTION = "def f():\n" + "    x = 1\n" * 60
+
+class TestServer(BaseTestCase):
+    def _request(self, server, method, **params):
+        response = server.handle({'jsonrpc': '2.0', 'id': 1, 'method': method, 'params': params})
+        self.assertNotIn('error', response)
+        return response['result']
+
+    def test_analyze_buffer_uses_unsaved_text(self):
+        path = self.create_file("pkg/mod.py", "x = 1\n")
+        self.create_file("other.py", "y = 2\n")
+        server = Server(Analyzer(self.project_path))
+        self.assertEqual(self._request(server, 'issues', path='pkg/mod.py')['issues'], [])
+
+        result = self._request(server, 'analyze_buffer', path='pkg/mod.py', text=LONG_FUNCTION)
+        self.assertEqual([(i['file'], i['detector']) for i in result['issues']], [(path, 'long_function')])
+        self.assertEqual(self._request(server, 'score', package='pkg')['issue_count'], 1)
+        with open(path) as f:
+            self.assertEqual(f.read(), "x = 1\n") # Nothing was written to disk.
+
+        self._request(server, 'close_buffer', path='pkg/mod.py')
+        self.assertEqual(self._request(server, 'issues', path='pkg')['issues'], [])
+
+    def test_buffer_for_file_not_on_disk(self):
+        self.create_file("mod.py", "x = 1\n")
+        server = Server(Analyzer(self.project_path))
+        result = self._request(server, 'analyze_buffer', path='new.py', text=LONG_FUNCTION)
+        self.assertEqual(len(result['issues']), 1)
+        self._request(server, 'close_buffer', path='new.py')
+        self.assertEqual(self._request(server, 'score')['files'], 1)
+
+    def test_serve_answers_lines_and_framed_messages(self):
+        self.create_file("mod.py", "x = 1\n")
+        server = Server(Analyzer(self.project_path))
+        framed = json.dumps({'jsonrpc': '2.0', 'id': 2, 'method': 'nope'}).encode()
+        stdin = io.BytesIO(b'{"jsonrpc": "2.0", "id": 1, "method": "score"}\n'
+                           + b'Content-Length: %d\r\n\r\n' % len(framed) + framed
+                           + b'{"jsonrpc": "2.0", "method": "shutdown"}\n'
+                           + b'{"jsonrpc": "2.0", "id": 3, "method": "score"}\n')
+        stdout = io.BytesIO()
+        serve(server, stdin, stdout)
+
+        first, rest = stdout.getvalue().split(b'\n', 1)
+        self.assertEqual(json.loads(first)['result']['files'], 1)
+        header, body = rest.split(b'\r\n\r\n')
+        self.assertEqual(header, b'Content-Length: %d' % len(body))
+        self.assertEqual(json.loads(body)['error']['code'], METHOD_NOT_FOUND)
+
+if __name__ == '__main__':
+    unittest.main()
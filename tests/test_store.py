@@ -0,0 +1,70 @@
+import os
+import unittest
+
+from base import BaseTestCase
+from projectdoctor.analyzer import Analyzer
+from projectdoctor.reporter import Reporter
+from projectdoctor.store import ResultStore, StoreError
+
+class TestStore(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.store = ResultStore(os.path.join(self.project_path, 'results.db'))
+
+    def tearDown(self):
+        self.store.close()
+        super().tearDown()
+
+    def _record(self):
+        run_id, results = self.store.record(Analyzer(self.project_path).stream())
+        return run_id, Reporter(results)
+
+    def test_records_runs_while_streaming(self):
+        self.create_file("mod.py", "def f():\n" + "    x = 1\n" * 60)
+        run_id, reporter = self._record()
+        with open(os.devnull, 'w') as devnull:
+            reporter.write_cli(devnull)
+        run, = self.store.runs()
+        self.assertEqual((run['id'], run['score'], run['issue_count']), (run_id, reporter.score, reporter.issue_count))
+        self.assertEqual(run['high'] + run['medium'] + run['low'], run['issue_count'])
+        self.assertEqual(self.store.file_history('mod.py'), [{'run_id': run_id, 'created_at': run['created_at'], 'loc': 61, 'issue_count': 1}])
+
+    def test_diff_lists_new_and_fixed_issues(self):
+        self.create_file("mod.py", "def f():\n" + "    x = 1\n" * 60)
+        first, reporter = self._record()
+        list(reporter.issues)
+        self.create_file("mod.py", "def f():\n    return 1\n")
+        self.create_file("other.py", "import os\n")
+        second, reporter = self._record()
+        list(reporter.issues)
+
+        added, fixed = self.store.diff(first, second)
+        self.assertEqual([(i['file'], i['detector']) for i in fixed], [('mod.py', 'long_function')])
+        self.assertEqual([(i['file'], i['detector']) for i in added], [('other.py', 'dead_code')])
+        self.assertEqual(self.store.diff(first, second, 'HIGH'), ([], []))
+        with self.assertRaises(StoreError):
+            self.store.diff(first, 99)
+
+    def test_run_without_issues_is_committed(self):
+        self.create_file("tests/test_mod.py", "")
+        self.create_file("pyproject.toml", "")
+        run_id, reporter = self._record()
+        self.assertEqual(reporter.issue_count, 0)
+        with open(os.devnull, 'w') as devnull:
+            reporter.write_cli(devnull)
+        self.store.close()
+        self.store = ResultStore(os.path.join(self.project_path, 'results.db'))
+        self.assertEqual([run['id'] for run in self.store.runs()], [run_id])
+
+    def test_messages_store_project_relative_paths(self):
+        block = "".join(f"value_{i} = compute({i})\n" for i in range(10))
+        self.create_file("pkg/a.py", block)
+        self.create_file("pkg/b.py", block)
+        run_id, reporter = self._record()
+        list(reporter.issues)
+        messages = [row['message'] for row in self.store.connection.execute("SELECT message FROM issues WHERE detector = 'duplicate_code'")]
+        self.assertTrue(messages)
+        self.assertTrue(all(self.project_path not in message and 'pkg/' in message for message in messages))
+
+if __name__ == '__main__':
+    unittest.main()
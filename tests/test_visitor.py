@@ -0,0 +1,65 @@
+import ast
+import unittest
+from unittest import mock
+
+from base import BaseTestCase
+from projectdoctor import visitor
+from projectdoctor.analyzer import Analyzer
+from projectdoctor.corpus import Corpus
+from projectdoctor.detectors import long_function, circular_import, complexity, collect_record
+
+class TodoPlugin(visitor.Plugin):
+    NAME = 'todo_calls'
+
+    def begin(self, source, thresholds):
+        self.lines = []
+
+    def enter_Call(self, node):
+        if isinstance(node.func, ast.Name) and node.func.id == 'todo':
+            self.lines.append(node.lineno)
+
+    def result(self):
+        return self.lines
+
+    @staticmethod
+    def reduce(project_path, thresholds, records):
+        return [{'file': path, 'severity': 'LOW', 'message': f"todo() call on line {line}."}
+                for path, record in records.items() for line in record.get(TodoPlugin.NAME, ())]
+
+class TestVisitor(BaseTestCase):
+    def test_walk_calls_enter_and_leave_in_order(self):
+        events = []
+
+        class Recorder(visitor.Plugin):
+            def enter_FunctionDef(self, node): events.append(('enter', node.name))
+            def leave_FunctionDef(self, node): events.append(('leave', node.name))
+
+        visitor.walk(ast.parse("def a():\n    def b(): pass\ndef c(): pass\n"), [Recorder()])
+        self.assertEqual(events, [('enter', 'a'), ('enter', 'b'), ('leave', 'b'), ('leave', 'a'), ('enter', 'c'), ('leave', 'c')])
+
+    def test_plugins_share_one_traversal(self):
+        path = self.create_file("mod.py", "import os\n\ndef f():\n" + "    x = 1\n" * 60)
+        corpus = Corpus()
+        collectors = {d.NAME: d.collect for d in (long_function, circular_import, complexity)}
+        with mock.patch.object(visitor, 'walk', wraps=visitor.walk) as walk:
+            record = collect_record(collectors, corpus, path, {})
+        self.assertEqual(walk.call_count, 1)
+        self.assertEqual(record[circular_import.NAME], ['os'])
+        self.assertEqual(record[long_function.NAME], [['f', 3, 61]])
+        self.assertEqual(record[complexity.NAME], [])
+
+    def test_syntax_errors_skip_plugin_results(self):
+        path = self.create_file("broken.py", "def (:\n")
+        record = collect_record({long_function.NAME: long_function.collect}, Corpus(), path, {})
+        self.assertEqual(record, {'loc': 1})
+
+    def test_entry_point_plugin_detector(self):
+        self.create_file("mod.py", "todo()\nprint(1)\ntodo()\n")
+        entry_point = mock.Mock(load=mock.Mock(return_value=TodoPlugin))
+        with mock.patch('projectdoctor.detectors._entry_points', return_value={'todo_calls': entry_point}):
+            issues = Analyzer(self.project_path).run()['issues']
+        self.assertEqual([i['message'] for i in issues if 'todo()' in i['message']],
+                         ["todo() call on line 1.", "todo() call on line 3."])
+
+if __name__ == '__main__':
+    unittest.main()